@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized forecast and anomaly detection on daily cost series
+
+Runs the full analysis on synthetic services x days series, compares the
+scoring step with a per-service Python loop computing the same z-scores, and fails
+when the vectorized stage exceeds the time or memory budget.
+
+Usage:
+    python benchmarks/anomaly_detection.py [--services 100 500 2000] [--days 90]
+"""
+import argparse
+import math
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import fakes  # noqa: F401 (puts lambda_function on sys.path)
+from anomaly import analyze_daily_costs, build_cost_matrix, detect_anomalies
+
+
+def synthetic_series(services: int, days: int, today: date, spikes: int) -> List[Dict[str, Any]]:
+    """
+    Build daily rows with noisy per-service baselines and a spike on yesterday for a few services
+    """
+    generator = random.Random(42)
+    start_date = today - timedelta(days=days - 1)
+    spiked = set(generator.sample(range(services), min(spikes, services)))
+    rows = []
+    for service in range(services):
+        baseline = generator.uniform(1.0, 500.0)
+        for day in range(days):
+            cost = max(0.0, generator.gauss(baseline, baseline * 0.05))
+            if service in spiked and day == days - 2:
+                cost *= 4
+            rows.append({
+                'usage_date': start_date + timedelta(days=day),
+                'service_name': f"Service {service:04d}",
+                'gross_cost': cost,
+                'credits_total': -cost * 0.1,
+                'currency': 'USD'
+            })
+    return rows
+
+
+def pivot_series(rows: List[Dict[str, Any]], today: date, days: int) -> Dict[str, List[float]]:
+    """
+    Pivot rows into one list of daily costs per service
+    """
+    start_date = today - timedelta(days=days - 1)
+    series: Dict[str, List[float]] = {}
+    for row in rows:
+        costs = series.setdefault(row['service_name'], [0.0] * days)
+        costs[(row['usage_date'] - start_date).days] += row['gross_cost'] + row['credits_total']
+    return series
+
+
+def loop_flagged(series: Dict[str, List[float]], days: int, window: int, z_threshold: float,
+                 min_delta: float) -> set:
+    """
+    Reference implementation: z-score of yesterday per service with plain Python loops
+    """
+    flagged = set()
+    for name, costs in series.items():
+        history = costs[days - 2 - window:days - 2]
+        mean = sum(history) / window
+        std = math.sqrt(sum((cost - mean) ** 2 for cost in history) / (window - 1))
+        delta = costs[days - 2] - mean
+        z = delta / std if std > 0 else (math.inf if delta else 0.0)
+        if abs(z) >= z_threshold and abs(delta) >= min_delta:
+            flagged.add(name)
+    return flagged
+
+
+def measure(function: Callable[[], Any]) -> Tuple[Any, float, float]:
+    """
+    Run function and report its result, wall time in ms and peak traced memory in MiB
+
+    Time and memory are measured in separate runs, since tracing slows Python code down.
+    """
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed * 1000, peak / (1024 * 1024)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--services', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--window', type=int, default=14)
+    parser.add_argument('--max-ms', type=float, default=2000.0, help='Time budget of the vectorized stage')
+    parser.add_argument('--max-mib', type=float, default=128.0, help='Memory budget of the vectorized stage')
+    args = parser.parse_args()
+
+    today = date(2025, 6, 20)
+    z_threshold, min_delta = 3.0, 1.0
+    print(f"{'services':>9} {'rows':>8} {'analyze ms':>11} {'detect ms':>10} {'peak MiB':>9} "
+          f"{'loop ms':>8} {'anomalies':>10}")
+    failed = False
+    for services in args.services:
+        rows = synthetic_series(services, args.days, today, spikes=5)
+
+        analysis, analyze_ms, peak_mib = measure(
+            lambda: analyze_daily_costs(rows, today, args.days, args.window, z_threshold, min_delta)
+        )
+        _, matrix, _ = build_cost_matrix(rows, today - timedelta(days=args.days - 1), args.days)
+        _, detect_ms, _ = measure(lambda: detect_anomalies(matrix, args.days - 2, args.window, z_threshold, min_delta))
+        series = pivot_series(rows, today, args.days)
+        expected, loop_ms, _ = measure(
+            lambda: loop_flagged(series, args.days, args.window, z_threshold, min_delta)
+        )
+
+        flagged = {anomaly['name'] for anomaly in analysis['anomalies']}
+        if flagged != expected:
+            print(f"FAIL: vectorized anomalies differ from the loop reference for {services} services")
+            failed = True
+        if analyze_ms > args.max_ms or peak_mib > args.max_mib:
+            print(f"FAIL: {services} services exceeded the budget of {args.max_ms} ms / {args.max_mib} MiB")
+            failed = True
+        print(f"{services:>9} {len(rows):>8} {analyze_ms:>11.1f} {detect_ms:>10.2f} {peak_mib:>9.2f} "
+              f"{loop_ms:>8.1f} {len(flagged):>10}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Compare end-to-end latency of lambda_handler and the asyncio handler against local stubs
+
+BigQuery jobs take --query-ms to finish, the exchange rate API answers
+after --rates-ms and the Discord webhook after --discord-ms. The current
+month report runs its report and analysis queries, looks up rates and
+posts to Discord. The sync handler pays for each step in turn; the async
+handler should take about one query plus the final post.
+
+Usage:
+    python benchmarks/async_pipeline.py [--query-ms 500] [--rates-ms 200] [--discord-ms 300] [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+import fakes
+import client_cache
+
+RATES = {'USD': {'JPY': 151.25, 'USD': 1.0}}
+
+
+def report_rows(count: int) -> List[Dict[str, Any]]:
+    """
+    Per-service rows usable by both the report and the daily analysis query
+    """
+    yesterday = date.today() - timedelta(days=1)
+    return [dict(row, usage_date=yesterday) for row in fakes.generate_service_rows(count)]
+
+
+def expire_rates() -> None:
+    """
+    Drop the cached exchange rates, as on the first invocation after their TTL
+    """
+    provider, _ = client_cache.get_rate_provider()
+    provider._memory.clear()
+
+
+def measure(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]], runs: int) -> List[float]:
+    """
+    Time warm invocations of handler after one untimed warm-up call
+
+    Returns:
+        Wall times in ms
+    """
+    event = {'use_current_month': True}
+    response = handler(event, None)
+    if response['statusCode'] != 200:
+        raise SystemExit(f"Handler failed: {response}")
+    timings = []
+    for _ in range(runs):
+        expire_rates()
+        started = time.perf_counter()
+        response = handler(event, None)
+        timings.append((time.perf_counter() - started) * 1000)
+        if response['statusCode'] != 200:
+            raise SystemExit(f"Handler failed: {response}")
+    return timings
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--query-ms', type=float, default=500.0, help='Execution time of every BigQuery job')
+    parser.add_argument('--rates-ms', type=float, default=200.0, help='Response time of the exchange rate API')
+    # Above the tolerance, so a warm-up that does not overlap the query exceeds the budget
+    parser.add_argument('--discord-ms', type=float, default=300.0, help='Response time of the Discord webhook')
+    parser.add_argument('--runs', type=int, default=3, help='Timed warm invocations per handler')
+    parser.add_argument('--tolerance-ms', type=float, default=150.0,
+                        help='Allowed async latency above one query plus one post')
+    args = parser.parse_args()
+
+    os.environ.update({
+        'GCP_BILLING_ACCOUNT_ID': 'BENCH-ACCOUNT',
+        'BIGQUERY_PROJECT_ID': 'benchmark-project',
+        'BIGQUERY_TABLE_ID': 'gcp_billing_export_v1_BENCH',
+        'ANOMALY_DETECTION': 'true',
+        'DISPLAY_CURRENCIES': 'JPY',
+        'EXCHANGE_RATE_CACHE_PATH': '',
+        'METRICS_ENABLED': 'false',
+        'LOG_LEVEL': 'WARNING'
+    })
+    os.environ.pop('GCP_CREDENTIALS', None)
+    os.environ.pop('BILLING_ACCOUNTS', None)
+
+    from google.auth.credentials import AnonymousCredentials
+    import main as lambda_main
+
+    fake_bigquery = fakes.FakeBigQueryClient(report_rows(30), latency=args.query_ms / 1000)
+    client_cache.configure_gcp_clients(credentials=AnonymousCredentials(), bigquery_client=fake_bigquery)
+
+    discord_response = {'status': 204, 'delay': args.discord_ms / 1000}
+    with fakes.FakeRateServer(RATES, delay=args.rates_ms / 1000) as rate_server, \
+            fakes.FakeWebhookServer(discord_response) as webhook:
+        os.environ['EXCHANGE_RATE_URL'] = rate_server.url
+        os.environ['DISCORD_WEBHOOK_URL'] = webhook.url
+        sync_ms = measure(lambda_main.lambda_handler, args.runs)
+        async_ms = measure(lambda_main.async_entry_point, args.runs)
+        posts = sum(1 for request in webhook.requests if request['method'] == 'POST')
+        discord_client, _ = client_cache.get_async_discord_client()
+        lambda_main._event_loop.run_until_complete(discord_client.close())
+
+    sync_median = statistics.median(sync_ms)
+    async_median = statistics.median(async_ms)
+    budget_ms = args.query_ms + args.discord_ms + args.tolerance_ms
+    print(f"sync handler:  median {sync_median:8.1f} ms  runs {', '.join(f'{t:.1f}' for t in sync_ms)}")
+    print(f"async handler: median {async_median:8.1f} ms  runs {', '.join(f'{t:.1f}' for t in async_ms)}")
+    print(f"speedup: {sync_median / async_median:.2f}x, messages posted: {posts}")
+
+    passed = async_median <= budget_ms
+    print(f"{'PASS' if passed else 'FAIL'} async latency {async_median:.1f} ms within "
+          f"query + post + tolerance ({budget_ms:.0f} ms)")
+    if not passed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
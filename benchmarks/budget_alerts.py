@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Check budget threshold alerts end to end on the local BigQuery stand-in
+
+The alert mode of lambda_handler runs against a billing export of this
+month in DuckDB, a local file state store and a fake Discord webhook.
+Thresholds are set relative to the month-to-date cost. Checked are: a
+failed notification marks nothing as notified, the next run reports each
+crossed threshold once, a repeat run reports nothing, late rows keep the
+running totals equal to a full scan and report a threshold they push the
+cost over, and the thresholds re-arm when the month rolls over.
+
+Usage:
+    python benchmarks/budget_alerts.py [--rows 100] [--late-days 3]
+"""
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import fakes
+import client_cache
+import local_bigquery
+from alerts import ThresholdAlerter, parse_thresholds
+from gcp_client import GCPBillingClient
+from google.auth.credentials import AnonymousCredentials
+from state_store import LocalFileStateStore
+
+ACCOUNT_ID = 'LOCAL-ACCOUNT'
+TABLE_ID = 'gcp_billing_export_v1_LOCAL'
+SERVICE = 'Service 000000'
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'PASS' if ok else 'FAIL'} {name:<52} {detail}")
+    return ok
+
+
+def posts(webhook: fakes.FakeWebhookServer) -> List[Dict[str, Any]]:
+    """
+    Messages posted to the webhook since the last clear
+    """
+    return [request for request in webhook.requests if request['method'] == 'POST']
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100, help='Service/SKU pairs per usage day')
+    parser.add_argument('--late-days', type=int, default=3, help='Late-arrival window of the running totals')
+    args = parser.parse_args()
+
+    # The handler checks the current month, so the export covers this month up to today
+    today = datetime.now().date()
+    month_start = today.replace(day=1)
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+    local_client = local_bigquery.LocalBigQueryClient()
+    local_client.create_export_table(TABLE_ID, args.rows, days=today.day, start_date=month_start)
+    full = GCPBillingClient(ACCOUNT_ID, 'local-project', TABLE_ID, credentials=AnonymousCredentials(),
+                            bigquery_client=local_client)
+
+    def full_scan(start, end) -> Dict[str, Any]:
+        summary = full.get_costs_for_periods([('period', start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))])
+        return summary['period']
+
+    month_to_date = full_scan(month_start, today + timedelta(days=1))
+    service_cost = next(service['cost'] for service in month_to_date['services'] if service['name'] == SERVICE)
+    total = month_to_date['total_cost']
+    # Crossed now: two total thresholds and one of the service; the last two only after the late rows
+    late_cost = total * 0.1
+    thresholds = {
+        'total': [round(total * 0.25, 2), round(total * 0.5, 2), round(total + late_cost / 2, 2)],
+        'services': {SERVICE: [round(service_cost / 2, 2), round(service_cost + late_cost / 2, 2)]}
+    }
+    expected = {('total', thresholds['total'][0]), ('total', thresholds['total'][1]),
+                (SERVICE, thresholds['services'][SERVICE][0])}
+
+    results = []
+    with fakes.FakeWebhookServer() as webhook, tempfile.TemporaryDirectory() as state_dir:
+        os.environ.update({
+            'GCP_BILLING_ACCOUNT_ID': ACCOUNT_ID,
+            'BIGQUERY_PROJECT_ID': 'local-project',
+            'BIGQUERY_TABLE_ID': TABLE_ID,
+            'DISCORD_WEBHOOK_URL': webhook.url,
+            'STATE_STORE_URL': state_dir,
+            'ALERT_THRESHOLDS': json.dumps(thresholds),
+            'LATE_ARRIVAL_DAYS': str(args.late_days),
+            'DISPLAY_CURRENCIES': 'USD',
+            'EXCHANGE_RATE_CACHE_PATH': '',
+            'METRICS_ENABLED': 'false',
+            'LOG_LEVEL': 'WARNING'
+        })
+        os.environ.pop('GCP_CREDENTIALS', None)
+        os.environ.pop('BILLING_ACCOUNTS', None)
+        client_cache.configure_gcp_clients(credentials=AnonymousCredentials(), bigquery_client=local_client)
+        import main as lambda_main
+
+        store = LocalFileStateStore(state_dir)
+        alerter = ThresholdAlerter(store, parse_thresholds(thresholds), args.late_days)
+        gcp_client, _ = client_cache.get_gcp_client()
+        key = f"alerts/{ACCOUNT_ID}/{TABLE_ID}/{month_start.strftime('%Y-%m')}"
+
+        def notified() -> List[str]:
+            return (store.get(key) or {}).get('notified', [])
+
+        def handle() -> Dict[str, Any]:
+            webhook.requests.clear()
+            response = lambda_main.lambda_handler({'alert': True}, None)
+            return dict(json.loads(response['body']), statusCode=response['statusCode'])
+
+        webhook.responses.append({'status': 400, 'body': {'message': 'Invalid Form Body', 'code': 50035}})
+        response = handle()
+        results.append(check("failed delivery marks nothing notified",
+                             response['statusCode'] == 500 and len(posts(webhook)) == 1 and not notified(),
+                             f"{response['crossings']} crossings, status {response['statusCode']}"))
+
+        response = handle()
+        crossed = {(crossing['scope'], crossing['threshold']) for crossing in alerter.check(gcp_client)['crossings']}
+        fields = posts(webhook)[0]['body']['embeds'][0]['fields'] if posts(webhook) else []
+        results.append(check("next run reports each crossing once",
+                             response['statusCode'] == 200 and response['crossings'] == len(expected)
+                             and len(fields) == len(expected) and len(notified()) == len(expected)
+                             and not crossed,
+                             f"{len(fields)} thresholds in 1 message, notified {notified()}"))
+
+        response = handle()
+        results.append(check("repeat run reports nothing",
+                             response['statusCode'] == 200 and response['crossings'] == 0 and not webhook.requests,
+                             f"{len(webhook.requests)} webhook requests"))
+
+        # Late line items inside the window raise the total and the service's cost by late_cost
+        window_start = max(month_start, today - timedelta(days=args.late_days))
+        late_days = [window_start + timedelta(days=offset) for offset in range((today - window_start).days + 1)]
+        for usage_date in late_days:
+            local_client.insert_line_item(TABLE_ID, usage_date, SERVICE, late_cost / len(late_days), exported=today)
+        alert = alerter.check(gcp_client)
+        month_to_date = full_scan(month_start, today + timedelta(days=1))
+        service_total = next(service['cost'] for service in month_to_date['services'] if service['name'] == SERVICE)
+        state = store.get(key)
+        finalized = today - timedelta(days=args.late_days + 1)
+        results.append(check("running totals match the full scan after late rows",
+                             round(alert['total_cost'], 2) == round(month_to_date['total_cost'], 2)
+                             and round(alert['services'][SERVICE], 2) == round(service_total, 2)
+                             and state['finalized_through'] == (
+                                 finalized.strftime('%Y-%m-%d') if finalized >= month_start else None),
+                             f"total {total:,.2f} -> {alert['total_cost']:,.2f}, "
+                             f"finalized through {state['finalized_through']}"))
+        results.append(check("late rows report the thresholds they cross",
+                             {(crossing['scope'], crossing['threshold']) for crossing in alert['crossings']} ==
+                             {('total', thresholds['total'][2]), (SERVICE, thresholds['services'][SERVICE][1])},
+                             f"{len(alert['crossings'])} crossings"))
+        alerter.mark_notified(alert)
+
+        # First day of the next month, costing more than every threshold
+        local_client.insert_line_item(TABLE_ID, next_month_start, SERVICE, total * 2)
+        alert = alerter.check(gcp_client, today=next_month_start)
+        results.append(check("thresholds re-arm in the next month",
+                             len(alert['crossings']) == len(thresholds['total']) + len(thresholds['services'][SERVICE])
+                             and alert['key'] != key and len(notified()) == len(expected) + 2,
+                             f"{len(alert['crossings'])} crossings in {alert['year']}-{alert['month']:02d}"))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark import time and the first lambda_handler call
+
+Each run happens in a fresh interpreter so module caches do not hide the
+cold start cost. BigQuery and Discord are replaced by local stand-ins.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHILD_SCRIPT = r"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, BENCHMARK_DIR)
+import fakes  # noqa: E402  (stdlib only, sets up sys.path for the Lambda modules)
+
+started = time.perf_counter()
+import main  # noqa: E402
+import_main_ms = (time.perf_counter() - started) * 1000
+
+# Backend stand-ins are installed outside the timed regions
+from google.auth.credentials import AnonymousCredentials
+import client_cache
+
+fake_bigquery = fakes.FakeBigQueryClient(fakes.generate_service_rows(30))
+client_cache.configure_gcp_clients(credentials=AnonymousCredentials(), bigquery_client=fake_bigquery)
+
+with fakes.FakeWebhookServer() as webhook:
+    os.environ['DISCORD_WEBHOOK_URL'] = webhook.url
+    started = time.perf_counter()
+    first = main.lambda_handler({'use_current_month': True}, None)
+    first_call_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    second = main.lambda_handler({'use_current_month': True}, None)
+    warm_call_ms = (time.perf_counter() - started) * 1000
+
+started = time.perf_counter()
+from google.cloud import bigquery  # noqa: E402,F401
+import_bigquery_ms = (time.perf_counter() - started) * 1000
+
+print(json.dumps({
+    'import_main_ms': import_main_ms,
+    'first_call_ms': first_call_ms,
+    'warm_call_ms': warm_call_ms,
+    'lazy_import_bigquery_ms': import_bigquery_ms,
+    'status_codes': [first['statusCode'], second['statusCode']]
+}))
+"""
+
+
+def run_once() -> dict:
+    """
+    Run one cold start measurement in a fresh interpreter
+
+    Returns:
+        Dictionary of timings in milliseconds
+    """
+    env = dict(os.environ)
+    env.update({
+        'GCP_BILLING_ACCOUNT_ID': 'BENCH-ACCOUNT',
+        'BIGQUERY_PROJECT_ID': 'benchmark-project',
+        'BIGQUERY_TABLE_ID': 'gcp_billing_export_v1_BENCH',
+        'DISCORD_WEBHOOK_URL': 'http://127.0.0.1:9/unused',
+        'LOG_LEVEL': 'WARNING'
+    })
+    env.pop('GCP_CREDENTIALS', None)
+    script = f"BENCHMARK_DIR = {BENCHMARK_DIR!r}\n" + CHILD_SCRIPT
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to measure')
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    for key in ('import_main_ms', 'first_call_ms', 'warm_call_ms', 'lazy_import_bigquery_ms'):
+        values = [result[key] for result in results]
+        print(f"{key:>24}: median {statistics.median(values):8.1f}  min {min(values):8.1f}  max {max(values):8.1f}")
+    print(f"{'status_codes':>24}: {results[-1]['status_codes']}")
+
+
+if __name__ == '__main__':
+    main()
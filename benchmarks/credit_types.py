@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Check the per-type credit breakdown on the local BigQuery stand-in
+
+Line items carry credits of listed types (CREDIT_TYPES) and of a type the
+client does not know. Every credit must land in a bucket, the unknown one
+in OTHER, so the breakdown adds up to the credits total, both in the
+report and in the rendered Discord embed.
+
+Usage:
+    python benchmarks/credit_types.py
+"""
+from datetime import datetime, timedelta
+
+import fakes  # noqa: F401 (puts lambda_function/ on sys.path)
+import local_bigquery
+from formatter import DiscordMessageFormatter
+from gcp_client import CREDIT_TYPES, GCPBillingClient
+from google.auth.credentials import AnonymousCredentials
+
+TABLE_ID = 'gcp_billing_export_v1_LOCAL'
+UNLISTED_TYPE = 'PARTNER_CREDIT'
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'PASS' if ok else 'FAIL'} {name:<52} {detail}")
+    return ok
+
+
+def main():
+    """Main function"""
+    assert UNLISTED_TYPE not in CREDIT_TYPES
+    today = datetime.now().date()
+    local_client = local_bigquery.LocalBigQueryClient()
+    local_client.create_export_table(TABLE_ID, 0, days=1, start_date=today)
+    local_client.insert_line_item(TABLE_ID, today, 'Compute Engine', 100.0, exported=today, credits=-10.0)
+    local_client.insert_line_item(TABLE_ID, today, 'Compute Engine', 50.0, exported=today, credits=-7.5,
+                                  credit_type=UNLISTED_TYPE)
+    local_client.insert_line_item(TABLE_ID, today, 'BigQuery', 20.0, exported=today, credits=-2.0,
+                                  credit_type='PROMOTION')
+
+    client = GCPBillingClient('LOCAL-ACCOUNT', 'local-project', TABLE_ID, credentials=AnonymousCredentials(),
+                              bigquery_client=local_client)
+    periods = [('range', today.strftime('%Y-%m-%d'), (today + timedelta(days=1)).strftime('%Y-%m-%d'))]
+    billing_data = client.get_costs_for_periods(periods)['range']
+    credits = billing_data['credits']
+
+    results = [
+        check("listed credit types keep their buckets",
+              round(credits.get('FREE_TIER', 0.0), 2) == -10.0 and round(credits.get('PROMOTION', 0.0), 2) == -2.0,
+              f"{credits}"),
+        check("unlisted credit type is reported as OTHER",
+              round(credits.get('OTHER', 0.0), 2) == -7.5, f"OTHER {credits.get('OTHER')}"),
+        check("breakdown adds up to the credits total",
+              round(sum(credits.values()), 2) == round(billing_data['credits_total'], 2) == -19.5,
+              f"credits total {billing_data['credits_total']}"),
+    ]
+
+    billing_data.update({'year': today.year, 'month': today.month})
+    description = DiscordMessageFormatter().format_billing_data(billing_data)['description']
+    results.append(check("embed lists the OTHER bucket", '└ Other: ' in description,
+                         description.replace('\n', ' | ')))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
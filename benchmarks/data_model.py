@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory and time of the billing summary data model
+
+Compares the previous dict pipeline (nested [cost, {children}] lists
+converted into new dicts per service and drill-down entry) with the
+__slots__ records of billing_model on drill-down rows (service, project
+and SKU). Several periods are summarized from the same rows, as one
+multi-period scan does, and kept alive together, as a backfill or a
+forecast does. Reported are the memory retained by the summaries, the
+peak while building them, and the time to build them and to serialize
+them to JSON (the best of --json-repeat runs). Fails when the records
+serialize more than --json-factor times slower than the dicts.
+
+Usage:
+    python benchmarks/data_model.py [--services 50] [--projects 20] [--skus 40] [--periods 6]
+        [--json-repeat 5] [--json-factor 1.5]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List
+
+import fakes  # noqa: F401 (puts lambda_function on sys.path)
+from billing_model import json_default
+from gcp_client import _CostAccumulator, row_costs
+
+
+class DictAccumulator:
+    """
+    The previous accumulator: lists while accumulating, converted into new dicts in summary()
+    """
+    def __init__(self, dimension_columns: List[str]):
+        self.dimension_columns = dimension_columns
+        self.total_cost = 0.0
+        self.costs_by_service: Dict[str, List[float]] = {}
+        self.children_by_service: Dict[str, Dict[Any, list]] = {}
+
+    def add(self, row: Any) -> None:
+        service_name = row.get('service_name') or 'Unknown Service'
+        gross_cost, credits = row_costs(row)
+        net_cost = gross_cost + credits
+        path = []
+        for column in self.dimension_columns:
+            if row.get(f"grouping_{column}", 1):
+                break
+            path.append(row.get(column))
+        if path:
+            children = self.children_by_service.setdefault(service_name, {})
+            for value in path[:-1]:
+                children = children.setdefault(value, [0.0, {}])[1]
+            children.setdefault(path[-1], [0.0, {}])[0] += net_cost
+            return
+        self.total_cost += net_cost
+        costs = self.costs_by_service.setdefault(service_name, [0.0, 0.0, 0.0])
+        costs[0] += net_cost
+        costs[1] += gross_cost
+        costs[2] += credits
+
+    def summary(self) -> Dict[str, Any]:
+        services = []
+        for service_name, (net_cost, gross_cost, credits) in sorted(
+                self.costs_by_service.items(), key=lambda x: x[1][0], reverse=True):
+            service = {'name': service_name, 'cost': net_cost, 'gross_cost': gross_cost, 'credits': credits}
+            if service_name in self.children_by_service:
+                service['children'] = _children_summary(self.children_by_service[service_name])
+            services.append(service)
+        return {'total_cost': self.total_cost, 'services': services}
+
+
+def _children_summary(children: Dict[Any, list]) -> List[Dict[str, Any]]:
+    result = []
+    for value, (cost, grandchildren) in sorted(children.items(), key=lambda x: x[1][0], reverse=True):
+        child = {'name': '(none)' if value is None else str(value), 'cost': cost}
+        if grandchildren:
+            child['children'] = _children_summary(grandchildren)
+        result.append(child)
+    return result
+
+
+def drilldown_rows(services: int, projects: int, skus: int) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the ROLLUP rows of a service > project > SKU drill-down, as BigQuery returns them
+
+    Dimension values are built per row, like the values decoded from a result page.
+    """
+    for s in range(services):
+        service_name = f"Service {s:04d}"
+        yield {'service_name': service_name, 'gross_cost': float(s + 1), 'credits_total': -0.5,
+               'grouping_project_id': 1, 'grouping_sku': 1}
+        for p in range(projects):
+            project_id = f"project-{p:04d}"
+            yield {'service_name': service_name, 'gross_cost': float(p + 1), 'credits_total': 0.0,
+                   'project_id': project_id, 'grouping_project_id': 0, 'grouping_sku': 1}
+            for k in range(skus):
+                yield {'service_name': service_name, 'gross_cost': float((s + p + k) % 97) / 10.0,
+                       'credits_total': 0.0, 'project_id': project_id, 'sku': f"SKU {s:04d}-{k:04d}",
+                       'grouping_project_id': 0, 'grouping_sku': 0}
+
+
+def measure(build: Callable[[], List[Dict[str, Any]]], json_repeat: int) -> Dict[str, Any]:
+    """
+    Build the summaries and report retained and peak traced memory, build time and best JSON time
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    summaries = build()
+    elapsed = time.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    json_times = []
+    for _ in range(json_repeat):
+        started = time.perf_counter()
+        encoded = json.dumps(summaries, default=json_default)
+        json_times.append(time.perf_counter() - started)
+    return {
+        'retained_mib': retained / (1024 * 1024),
+        'peak_mib': peak / (1024 * 1024),
+        'build_s': elapsed,
+        'json_s': min(json_times),
+        'json': encoded
+    }
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--services', type=int, default=50)
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--skus', type=int, default=40)
+    parser.add_argument('--periods', type=int, default=6)
+    parser.add_argument('--json-repeat', type=int, default=5, help='JSON serializations timed per data model')
+    parser.add_argument('--json-factor', type=float, default=1.5,
+                        help='Largest allowed ratio of the records JSON time to the dicts JSON time')
+    args = parser.parse_args()
+
+    def build(accumulator_class):
+        def run():
+            summaries = []
+            for _ in range(args.periods):
+                accumulator = accumulator_class(['project_id', 'sku'])
+                for row in drilldown_rows(args.services, args.projects, args.skus):
+                    accumulator.add(row)
+                summaries.append(accumulator.summary())
+            return summaries
+        return run
+
+    entries = args.periods * args.services * (1 + args.projects * (1 + args.skus))
+    print(f"{args.periods} periods x {args.services} services x {args.projects} projects x {args.skus} SKUs "
+          f"({entries:,} entries)")
+    before = measure(build(DictAccumulator), args.json_repeat)
+    after = measure(build(_CostAccumulator), args.json_repeat)
+    # Same services, drill-down trees and costs (the dict pipeline has no credits or totals beyond these)
+    for old, new in zip(json.loads(before['json']), json.loads(after['json'])):
+        assert old['total_cost'] == new['total_cost']
+        assert [service['children'] for service in old['services']] == \
+            [service['children'] for service in new['services']]
+
+    print(f"{'':>8} {'retained MiB':>13} {'peak MiB':>9} {'build s':>8} {'json s':>7}")
+    for label, result in (('dicts', before), ('records', after)):
+        print(f"{label:>8} {result['retained_mib']:>13.2f} {result['peak_mib']:>9.2f} "
+              f"{result['build_s']:>8.3f} {result['json_s']:>7.3f}")
+    print(f"retained memory: {before['retained_mib'] / after['retained_mib']:.2f}x smaller")
+    json_ratio = after['json_s'] / before['json_s']
+    passed = json_ratio <= args.json_factor
+    print(f"{'PASS' if passed else 'FAIL'} records JSON time {json_ratio:.2f}x of the dicts "
+          f"(limit {args.json_factor:.2f}x)")
+    if not passed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
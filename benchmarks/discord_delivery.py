@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Exercise Discord delivery against a local fake webhook server
+
+Runs rate limit, server error and deadline scenarios and reports the
+number of requests made and the time taken by each.
+
+Usage:
+    python benchmarks/discord_delivery.py [--messages 50]
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List
+
+import fakes
+from discord_client import DiscordClient
+
+
+class FakeContext:
+    """
+    Lambda context with a fixed remaining time
+    """
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+def run_scenario(name: str, responses: List[Dict[str, Any]], send: Callable[[DiscordClient], bool],
+                 expected: bool, context: Any = None) -> bool:
+    """
+    Run one scenario and print its outcome
+
+    Returns:
+        True if the send result matched the expectation
+    """
+    with fakes.FakeWebhookServer() as webhook:
+        webhook.responses.extend(responses)
+        client = DiscordClient(webhook.url)
+        client.start_run(context)
+        started = time.perf_counter()
+        result = send(client)
+        elapsed = time.perf_counter() - started
+        ok = result == expected
+        print(f"{'PASS' if ok else 'FAIL'} {name:<40} requests={len(webhook.requests):<4} {elapsed * 1000:8.1f} ms")
+        return ok
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50, help='Messages sent in the keep-alive scenario')
+    args = parser.parse_args()
+
+    embed = {'title': 'Benchmark', 'description': 'Total amount: **¥0**'}
+    rate_limited = {'status': 429, 'body': {'retry_after': 0.2, 'global': False}, 'headers': {'Retry-After': '1'}}
+    server_error = {'status': 503}
+    exhausted_bucket = {'status': 204, 'headers': {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '0.3'}}
+
+    results = [
+        run_scenario(
+            f"{args.messages} messages on one session", [],
+            lambda client: all(client.send_message(f"message {i}", embed) for i in range(args.messages)), True
+        ),
+        run_scenario("429 then success", [rate_limited], lambda client: client.send_message('m', embed), True),
+        run_scenario(
+            "503 twice then success", [server_error, server_error],
+            lambda client: client.send_message('m', embed), True
+        ),
+        run_scenario(
+            "exhausted bucket waits for reset", [exhausted_bucket],
+            lambda client: client.send_message('a', embed) and client.send_message('b', embed), True
+        ),
+        run_scenario(
+            "25 embeds in 3 messages", [],
+            lambda client: client.send_embeds('m', [embed] * 25), True
+        ),
+        run_scenario(
+            "429 past the Lambda deadline gives up",
+            [{'status': 429, 'body': {'retry_after': 5.0}}],
+            lambda client: client.send_message('m', embed), False, context=FakeContext(2000)
+        ),
+        run_scenario("400 is not retried", [{'status': 400, 'body': {'message': 'bad'}}],
+                     lambda client: client.send_message('m', embed), False),
+    ]
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Exercise the exchange rate providers against a local fake rate server
+
+Checks that warm lookups never refetch, that a new container reuses the
+on-disk cache, that failures fall back to the last cached rates, and
+times multi-currency formatting of a large services list.
+
+Usage:
+    python benchmarks/exchange_rates.py [--services 1000]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+import fakes
+from exchange_rate import CachedRateProvider, HttpRateProvider
+from formatter import DiscordMessageFormatter
+
+RATES = {'USD': {'JPY': 151.25, 'EUR': 0.92, 'USD': 1.0}}
+
+
+def check(name: str, condition: bool, results: List[bool]) -> None:
+    """
+    Print and record the outcome of one check
+    """
+    print(f"{'PASS' if condition else 'FAIL'} {name}")
+    results.append(condition)
+
+
+def timed(function: Callable[[], object]) -> float:
+    """
+    Run function and return its wall time in ms
+    """
+    started = time.perf_counter()
+    function()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--services', type=int, default=1000, help='Services in the formatting benchmark')
+    args = parser.parse_args()
+
+    results: List[bool] = []
+    with tempfile.TemporaryDirectory() as tmp_dir, fakes.FakeRateServer(RATES) as server:
+        cache_path = os.path.join(tmp_dir, 'exchange_rates.json')
+        provider = CachedRateProvider(HttpRateProvider(server.url), ttl_seconds=3600, cache_path=cache_path)
+
+        cold_ms = timed(lambda: provider.get_rates('USD'))
+        warm_ms = timed(lambda: [provider.get_rates('USD') for _ in range(100)])
+        check(f"first lookup fetches once ({cold_ms:.1f} ms)", len(server.requests) == 1, results)
+        check(f"100 warm lookups make no request ({warm_ms:.2f} ms)", len(server.requests) == 1, results)
+
+        restarted = CachedRateProvider(HttpRateProvider(server.url), ttl_seconds=3600, cache_path=cache_path)
+        check("new container reuses the on-disk cache",
+              restarted.get_rates('USD') == RATES['USD'] and len(server.requests) == 1, results)
+
+        expired = CachedRateProvider(HttpRateProvider(server.url), ttl_seconds=0, cache_path=cache_path)
+        server.responses.append({'status': 503})
+        check("failed refresh falls back to the cached rates",
+              expired.get_rates('USD') == RATES['USD'] and len(server.requests) == 2, results)
+
+        uncached = CachedRateProvider(HttpRateProvider(server.url), cache_path=None)
+        server.responses.append({'status': 503})
+        formatter = DiscordMessageFormatter(rate_provider=uncached)
+        check("no cached rates falls back to the fixed JPY rate",
+              formatter._conversions('USD') == [('JPY', 150.0)], results)
+
+        formatter = DiscordMessageFormatter(rate_provider=provider, currencies=['JPY', 'EUR'])
+        services = [{'name': f"Service {i:04d}", 'cost': float(i)} for i in range(args.services)]
+        billing_data = {
+            'year': 2025, 'month': 6, 'total_cost': sum(s['cost'] for s in services),
+            'currency': 'USD', 'services': services
+        }
+        requests_before = len(server.requests)
+        pages = []
+        format_ms = timed(lambda: pages.extend(formatter.format_billing_data_pages(billing_data)))
+        first_field = pages[0][0]['fields'][0]['value']
+        check(f"{args.services} services in JPY and EUR with one rate lookup ({format_ms:.1f} ms): {first_field}",
+              first_field == "¥0 (€0.00)" and len(server.requests) == requests_before, results)
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for BigQuery and the Discord webhook used by the benchmark scripts
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+# Make the Lambda modules importable the same way local_test.py does
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda_function')
+if LAMBDA_DIR not in sys.path:
+    sys.path.insert(0, LAMBDA_DIR)
+
+
+class FakeRow(dict):
+    """
+    Result row supporting the parts of google.cloud.bigquery.Row used by the client
+    """
+
+
+RowSource = Union[List[Dict[str, Any]], Callable[[], Iterable[Dict[str, Any]]]]
+
+
+class FakeQueryJob:
+    """
+    Query job returning canned rows once latency seconds have passed
+    """
+    def __init__(self, query: str, rows: RowSource, job_config: Any = None, latency: float = 0.0):
+        self.query = query
+        self.job_config = job_config
+        self._rows = rows
+        self.latency = latency
+        self.total_bytes_processed = 0
+        self.total_bytes_billed = 0
+        self.slot_millis = 0
+
+    def result(self, page_size: Optional[int] = None, **kwargs) -> Iterable[FakeRow]:
+        if self.latency:
+            time.sleep(self.latency)  # Job execution time
+        if callable(self._rows):
+            # Generated lazily, like pages fetched from the REST API
+            return (FakeRow(row) for row in self._rows())
+        return [FakeRow(row) for row in self._rows]
+
+
+class FakeBigQueryClient:
+    """
+    BigQuery client answering every query with the same rows
+
+    rows may be a list, or a function returning a fresh iterator for every query;
+    latency is the seconds every job takes to finish
+    """
+    def __init__(self, rows: Optional[RowSource] = None, latency: float = 0.0):
+        self.rows = rows if rows is not None else []
+        self.latency = latency
+        self.queries: List[str] = []
+
+    def query(self, query: str, job_config: Any = None, **kwargs) -> FakeQueryJob:
+        self.queries.append(query)
+        return FakeQueryJob(query, self.rows, job_config, self.latency)
+
+
+def generate_service_rows(count: int, currency: str = 'USD') -> List[Dict[str, Any]]:
+    """
+    Generate synthetic per-service rows shaped like the billing query output
+
+    Args:
+        count: Number of rows
+        currency: Currency code of every row
+
+    Returns:
+        List of row dictionaries
+    """
+    return [
+        {
+            'period_index': 0,
+            'service_name': f"Service {i:06d}",
+            'total_cost': float((i * 7919) % 100000) / 100.0,
+            'currency': currency
+        }
+        for i in range(count)
+    ]
+
+
+class FakeWebhookServer:
+    """
+    Local HTTP server accepting Discord webhook calls and recording their payloads
+    """
+    def __init__(self, default_response: Union[Dict[str, Any], Callable, None] = None):
+        """
+        Args:
+            default_response: Response when none is queued in responses, or a function
+                               building it from the request (default: empty 204).
+                               A response's optional 'delay' is slept before answering.
+        """
+        self.requests: List[Dict[str, Any]] = []
+        self.responses: List[Dict[str, Any]] = []
+        self.default_response = default_response or {'status': 204}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                request = {
+                    'method': self.command,
+                    'path': self.path,
+                    'headers': dict(self.headers),
+                    'body': json.loads(body) if body else None
+                }
+                server.requests.append(request)
+                if server.responses:
+                    response = server.responses.pop(0)
+                elif callable(server.default_response):
+                    response = server.default_response(request)
+                else:
+                    response = server.default_response
+                if response.get('delay'):
+                    time.sleep(response['delay'])
+                payload = response.get('body')
+                data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(response['status'])
+                for name, value in response.get('headers', {}).items():
+                    self.send_header(name, str(value))
+                if data:
+                    self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if data:
+                    self.wfile.write(data)
+
+            do_POST = _handle
+            do_PATCH = _handle
+            do_GET = _handle
+            do_DELETE = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/webhooks/0/fake-token"
+
+    def __enter__(self) -> 'FakeWebhookServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeRateServer(FakeWebhookServer):
+    """
+    Local HTTP server answering exchange rate requests for /latest/<base> with fixed rates
+    after delay seconds
+    """
+    def __init__(self, rates: Dict[str, Dict[str, float]], delay: float = 0.0):
+        def respond(request: Dict[str, Any]) -> Dict[str, Any]:
+            base = request['path'].rsplit('/', 1)[-1]
+            if base not in rates:
+                return {'status': 404, 'body': {'error': 'unsupported base'}, 'delay': delay}
+            return {'status': 200, 'body': {'base': base, 'rates': rates[base]}, 'delay': delay}
+
+        super().__init__(respond)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/latest/{{base}}"
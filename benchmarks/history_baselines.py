@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Check which earlier runs the run history compares reports against
+
+Runs of the previous month are recorded on fixed dates, before and after
+it closed, in both history stores (SQLite and a local state store). A
+month-to-date report must compare with the previous month's run on the
+same day of the month or earlier, and a closed month only with the
+previous month's latest run made after it closed, which covers the whole
+month.
+
+Usage:
+    python benchmarks/history_baselines.py
+"""
+import os
+import tempfile
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Optional
+
+import fakes  # noqa: F401 (puts lambda_function/ on sys.path)
+from run_history import compare_with_history, create_run_history, run_record
+
+ACCOUNT_ID = 'LOCAL-ACCOUNT'
+
+
+def billing_data(year: int, month: int, total_cost: float) -> Dict[str, Any]:
+    """
+    Minimal report of one service
+    """
+    return {
+        'year': year, 'month': month, 'start_date': f"{year}-{month:02d}-01", 'end_date': '',
+        'currency': 'USD', 'total_cost': total_cost, 'services': [{'name': 'BigQuery', 'cost': total_cost}]
+    }
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'PASS' if ok else 'FAIL'} {name:<68} {detail}")
+    return ok
+
+
+def baseline_date(comparisons: Dict[str, Any]) -> Optional[str]:
+    return comparisons.get('previous_month', {}).get('run_date')
+
+
+def main():
+    """Main function"""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for url in (f"sqlite://{os.path.join(directory, 'history.db')}", os.path.join(directory, 'store')):
+            store = 'sqlite' if url.startswith('sqlite') else 'state store'
+            history = create_run_history(url)
+            # Month-to-date runs of September; runs after it closed are added below
+            for run_date, total_cost in ((date(2025, 9, 10), 40.0), (date(2025, 9, 17), 70.0),
+                                         (date(2025, 9, 30), 120.0)):
+                history.append(run_record(ACCOUNT_ID, billing_data(2025, 9, total_cost), 0,
+                                          datetime(run_date.year, run_date.month, run_date.day, 9, tzinfo=timezone.utc)))
+
+            comparisons = compare_with_history(history, ACCOUNT_ID, billing_data(2025, 10, 90.0), date(2025, 10, 17))
+            results.append(check(f"{store}: month-to-date uses the same day of last month",
+                                 baseline_date(comparisons) == '2025-09-17'
+                                 and comparisons['previous_month']['delta'] == 20.0,
+                                 f"baseline {baseline_date(comparisons)}"))
+
+            comparisons = compare_with_history(history, ACCOUNT_ID, billing_data(2025, 10, 150.0), date(2025, 11, 5))
+            results.append(check(f"{store}: closed month ignores runs from before last month closed",
+                                 baseline_date(comparisons) is None, f"baseline {baseline_date(comparisons)}"))
+
+            for run_date, total_cost in ((date(2025, 10, 2), 124.0), (date(2025, 10, 4), 125.0)):
+                history.append(run_record(ACCOUNT_ID, billing_data(2025, 9, total_cost), 0,
+                                          datetime(run_date.year, run_date.month, run_date.day, 9, tzinfo=timezone.utc)))
+            comparisons = compare_with_history(history, ACCOUNT_ID, billing_data(2025, 10, 150.0), date(2025, 11, 5))
+            results.append(check(f"{store}: closed month uses the latest run after last month closed",
+                                 baseline_date(comparisons) == '2025-10-04'
+                                 and comparisons['previous_month']['delta'] == 25.0,
+                                 f"baseline {baseline_date(comparisons)}"))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Check incremental month-to-date reports against full scans on the local BigQuery stand-in
+
+A billing export covering this month up to today is generated in DuckDB.
+One client reads it through the daily aggregate cache (a local file state
+store), another scans the whole month on every run. After the first run,
+late line items are inserted for usage days inside the late-arrival
+window, plus a service first seen today; the second run must re-read
+those days and again match the full scan. A line item added to a
+finalized day is not re-read, as the window is meant to exclude it.
+
+Usage:
+    python benchmarks/incremental_month.py [--rows 200] [--late-days 3]
+"""
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+import fakes  # noqa: F401 (puts lambda_function on sys.path)
+import local_bigquery
+from daily_cache import DailyAggregateCache
+from gcp_client import QUERY_VERSION, GCPBillingClient
+from google.auth.credentials import AnonymousCredentials
+from state_store import LocalFileStateStore
+
+TABLE_ID = 'gcp_billing_export_v1_LOCAL'
+
+
+def totals(billing_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Totals and per-service costs of a report, rounded to cents
+    """
+    return {
+        'total_cost': round(billing_data['total_cost'], 2),
+        'credits_total': round(billing_data['credits_total'], 2),
+        'services': {service['name']: round(service['cost'], 2) for service in billing_data['services']}
+    }
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'PASS' if ok else 'FAIL'} {name:<52} {detail}")
+    return ok
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200, help='Service/SKU pairs per usage day')
+    parser.add_argument('--late-days', type=int, default=3, help='Late-arrival window of the daily cache')
+    args = parser.parse_args()
+
+    # The client dates its reports with datetime.now(), so the export covers this month up to today
+    today = datetime.now().date()
+    month_start = today.replace(day=1)
+    local_client = local_bigquery.LocalBigQueryClient()
+    local_client.create_export_table(TABLE_ID, args.rows, days=today.day, start_date=month_start)
+
+    def billing_client(daily_cache=None) -> GCPBillingClient:
+        return GCPBillingClient('LOCAL-ACCOUNT', 'local-project', TABLE_ID, credentials=AnonymousCredentials(),
+                                bigquery_client=local_client, daily_cache=daily_cache)
+
+    results = []
+    with tempfile.TemporaryDirectory() as state_dir:
+        daily_cache = DailyAggregateCache(LocalFileStateStore(state_dir), args.late_days)
+        incremental = billing_client(daily_cache)
+        full = billing_client()
+
+        def state() -> Dict[str, Any]:
+            return daily_cache.load('LOCAL-ACCOUNT', TABLE_ID, month_start, f"v{QUERY_VERSION}")
+
+        finalized = today - timedelta(days=args.late_days + 1)
+        expected_finalized = finalized.strftime('%Y-%m-%d') if finalized >= month_start else None
+
+        first = incremental.get_cost_for_current_month_to_date()
+        results.append(check("first run matches the full scan",
+                             totals(first) == totals(full.get_cost_for_current_month_to_date()),
+                             f"{len(first['services'])} services, total {first['total_cost']:,.2f}"))
+        results.append(check("finalized through today - late days - 1",
+                             state()['finalized_through'] == expected_finalized,
+                             f"finalized through {state()['finalized_through']}"))
+
+        # Late line items: one for each usage day of the window, exported today, and a new service
+        window_start = max(month_start, finalized + timedelta(days=1))
+        late_days = [window_start + timedelta(days=offset) for offset in range((today - window_start).days + 1)]
+        for usage_date in late_days:
+            local_client.insert_line_item(TABLE_ID, usage_date, 'Service 000000', 12.5, exported=today,
+                                          credits=-1.25)
+        local_client.insert_line_item(TABLE_ID, today, 'Late Service', 3.75, exported=today)
+
+        before = state()['days']
+        second = incremental.get_cost_for_current_month_to_date()
+        after = state()['days']
+        window = {usage_date.strftime('%Y-%m-%d') for usage_date in late_days}
+        results.append(check("second run with late rows matches the full scan",
+                             totals(second) == totals(full.get_cost_for_current_month_to_date()),
+                             f"total {first['total_cost']:,.2f} -> {second['total_cost']:,.2f}"))
+        results.append(check("late window is re-read, finalized days are not",
+                             all(after[day] == rows for day, rows in before.items() if day not in window)
+                             and all(after[day] != before.get(day) for day in window),
+                             f"{len(late_days)} days re-read from {window_start}"))
+
+        if expected_finalized is not None:
+            # A line item for a finalized day is outside the window and stays out of the cached total
+            local_client.insert_line_item(TABLE_ID, finalized, 'Service 000000', 100.0, exported=today)
+            third = incremental.get_cost_for_current_month_to_date()
+            results.append(check("finalized day is served from the cache",
+                                 totals(third) == totals(second)
+                                 and totals(full.get_cost_for_current_month_to_date()) != totals(third),
+                                 f"row for {finalized} not re-read"))
+        else:
+            print(f"SKIP finalized day is served from the cache (no day before {month_start} is final yet)")
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Local BigQuery stand-in running the client's SQL on DuckDB over a generated billing export
+
+The queries built by GCPBillingClient are translated to DuckDB's dialect
+(table references, @parameters, UNNEST of repeated records, timestamp
+functions) and executed against an in-memory table with the columns of
+the Cloud Billing export, so the aggregation SQL itself is exercised
+without GCP access. Requires the duckdb package.
+"""
+import math
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import fakes
+
+# Bytes reported per scanned row: roughly a billing export row without labels,
+# and a row of any other table (e.g. the daily summary table)
+ESTIMATED_ROW_BYTES = 300
+DEFAULT_ROW_BYTES = 120
+
+EXPORT_TABLE_SCHEMA = """
+    billing_account_id VARCHAR,
+    service STRUCT(id VARCHAR, description VARCHAR),
+    sku STRUCT(id VARCHAR, description VARCHAR),
+    usage_start_time TIMESTAMPTZ,
+    usage_end_time TIMESTAMPTZ,
+    project STRUCT(id VARCHAR, name VARCHAR),
+    labels STRUCT(key VARCHAR, value VARCHAR)[],
+    location STRUCT(location VARCHAR, country VARCHAR, region VARCHAR, zone VARCHAR),
+    cost DOUBLE,
+    currency VARCHAR,
+    credits STRUCT(name VARCHAR, amount DOUBLE, full_name VARCHAR, id VARCHAR, type VARCHAR)[],
+    _PARTITIONTIME TIMESTAMPTZ
+"""
+
+_TABLE_REFERENCE = re.compile(r"`(?:[^`]*\.)?([^`.]+)`")
+
+# BigQuery constructs and their DuckDB equivalents, applied in order
+_TRANSLATIONS = [
+    # DDL: column types, and table options DuckDB has no equivalent for
+    (re.compile(r"\bSTRING\b"), "VARCHAR"),
+    (re.compile(r"\bFLOAT64\b"), "DOUBLE"),
+    (re.compile(r"\bTIMESTAMP\b(?!\()"), "TIMESTAMPTZ"),
+    (re.compile(r"\bPARTITION BY \w+\s*CLUSTER BY [\w, ]+"), ""),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(\)"), "current_timestamp"),
+    # `project.dataset.table` -> "table"
+    (_TABLE_REFERENCE, r'"\1"'),
+    # Repeated records become derived tables whose struct fields are columns
+    (re.compile(r"UNNEST\((@?\w+)\) AS (\w+)"), r"(SELECT UNNEST(\1, recursive := true)) AS \2"),
+    (re.compile(r"TIMESTAMP_TRUNC\(([^,()]+), DAY\)"), r"date_trunc('day', \1)"),
+    (re.compile(r"TIMESTAMP_ADD\(([^,()]+), INTERVAL (\d+) DAY\)"), r"(\1 + INTERVAL \2 DAY)"),
+    (re.compile(r"\bDATE\(([^()]+)\)"), r"CAST(\1 AS DATE)"),
+    (re.compile(r"@(\w+)"), r"$\1"),
+]
+
+
+def translate_sql(query: str) -> str:
+    """
+    Translate a query of GCPBillingClient from BigQuery to DuckDB SQL
+
+    Args:
+        query: BigQuery Standard SQL
+
+    Returns:
+        DuckDB SQL
+    """
+    for pattern, replacement in _TRANSLATIONS:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+def _parameter_value(parameter: Any) -> Any:
+    """
+    Convert a google.cloud.bigquery query parameter to a DuckDB parameter value
+    """
+    if hasattr(parameter, 'struct_values'):
+        return {name: value for name, value in parameter.struct_values.items()}
+    if hasattr(parameter, 'values'):
+        return [_parameter_value(value) if hasattr(value, 'to_api_repr') else value for value in parameter.values]
+    return parameter.value
+
+
+class LocalQueryJob:
+    """
+    Finished query job over the local export table
+    """
+    def __init__(self, cursor: Any, total_bytes_processed: int, slot_millis: int):
+        self._cursor = cursor
+        self.total_bytes_processed = total_bytes_processed
+        self.total_bytes_billed = total_bytes_processed
+        self.slot_millis = slot_millis
+
+    def result(self, page_size: Optional[int] = None, **kwargs) -> Iterator[fakes.FakeRow]:
+        """
+        Iterate over the result rows, fetched one page at a time
+        """
+        if self._cursor is None:
+            return iter([])
+        return self._pages(page_size or 10000)
+
+    def _pages(self, page_size: int) -> Iterator[fakes.FakeRow]:
+        if self._cursor.description is None:
+            return
+        columns = [column[0] for column in self._cursor.description]
+        while True:
+            page = self._cursor.fetchmany(page_size)
+            if not page:
+                return
+            for values in page:
+                yield fakes.FakeRow(zip(columns, values))
+
+
+class LocalBigQueryClient:
+    """
+    BigQuery client executing queries on an in-memory DuckDB database
+
+    Dry runs report the bytes a scan of every referenced table would
+    process and, like BigQuery, fail with NotFound when a referenced table
+    does not exist (except for the table a CREATE statement creates);
+    executed queries report the same and their wall time as slot
+    milliseconds. DDL and MERGE statements run as well.
+    """
+    def __init__(self):
+        import duckdb
+
+        self.connection = duckdb.connect(':memory:')
+        self.connection.execute("SET TimeZone = 'UTC'")
+        self.queries: List[str] = []
+        self.row_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def create_export_table(self, table_id: str, rows: int, days: int = 3,
+                            start_date: Optional[date] = None, currency: str = 'USD',
+                            account_id: str = 'LOCAL-ACCOUNT') -> int:
+        """
+        Generate a billing export table with rows distinct service/SKU pairs, each used on every day
+
+        Services get about sqrt(rows) SKUs each. Every fifth SKU has a free tier
+        credit, and rows are spread over 10 projects and two 'env' label values.
+
+        Args:
+            table_id: Table name (the last part of BIGQUERY_TABLE_ID)
+            rows: Distinct service/SKU pairs
+            days: Usage days, one line item per pair and day
+            start_date: First usage day (default: days - 1 days before today, UTC)
+            currency: Currency of every line item
+            account_id: Billing account ID of every line item
+
+        Returns:
+            Number of line items in the table
+        """
+        if start_date is None:
+            start_date = datetime.now(timezone.utc).date().toordinal() - (days - 1)
+            start_date = date.fromordinal(start_date)
+        skus_per_service = max(1, math.ceil(math.sqrt(rows)))
+        self.connection.execute(f'DROP TABLE IF EXISTS "{table_id}"')
+        self.connection.execute(f'CREATE TABLE "{table_id}" ({EXPORT_TABLE_SCHEMA})')
+        self.connection.execute(f"""
+            INSERT INTO "{table_id}"
+            SELECT
+              $account_id,
+              {{'id': 'service-' || (g.range // $skus), 'description': 'Service ' || lpad(CAST(g.range // $skus AS VARCHAR), 6, '0')}},
+              {{'id': 'sku-' || g.range, 'description': 'SKU ' || lpad(CAST(g.range AS VARCHAR), 8, '0')}},
+              CAST($start AS TIMESTAMPTZ) + to_days(CAST(d.range AS INTEGER)) + to_hours(CAST(g.range % 24 AS INTEGER)),
+              CAST($start AS TIMESTAMPTZ) + to_days(CAST(d.range AS INTEGER)) + to_hours(CAST(g.range % 24 AS INTEGER) + 1),
+              {{'id': 'project-' || (g.range % 10), 'name': 'Project ' || (g.range % 10)}},
+              [{{'key': 'env', 'value': CASE WHEN g.range % 2 = 0 THEN 'prod' ELSE 'dev' END}}],
+              {{'location': 'us-central1', 'country': 'US', 'region': 'us-central1', 'zone': NULL}},
+              ((g.range * 7919 + d.range * 104729) % 10000) / 100.0,
+              $currency,
+              CASE WHEN g.range % 5 = 0
+                THEN [{{'name': 'Free tier', 'amount': -0.25, 'full_name': NULL, 'id': 'free-tier', 'type': 'FREE_TIER'}}]
+                ELSE [] END,
+              -- Line items are exported on the day after their usage
+              CAST($start AS TIMESTAMPTZ) + to_days(CAST(d.range AS INTEGER) + 1)
+            FROM range(CAST($rows AS BIGINT)) g, range(CAST($days AS BIGINT)) d
+        """, {
+            'account_id': account_id, 'skus': skus_per_service, 'start': start_date.isoformat(),
+            'currency': currency, 'rows': rows, 'days': days
+        })
+        self.row_bytes[table_id] = ESTIMATED_ROW_BYTES
+        return rows * days
+
+    def insert_line_item(self, table_id: str, usage_date: date, service: str, cost: float,
+                         exported: Optional[date] = None, currency: str = 'USD', credits: float = 0.0,
+                         account_id: str = 'LOCAL-ACCOUNT', credit_type: str = 'FREE_TIER') -> None:
+        """
+        Add one line item to an export table, e.g. a row arriving late for an earlier usage day
+
+        Args:
+            table_id: Table name (the last part of BIGQUERY_TABLE_ID)
+            usage_date: Usage day of the line item
+            service: Service description
+            cost: Gross cost
+            exported: Day the line item was exported, its partition (default: the day after usage)
+            currency: Currency of the line item
+            credits: Credit amount, negative (optional)
+            account_id: Billing account ID of the line item
+            credit_type: Type of the credit
+        """
+        exported = exported or date.fromordinal(usage_date.toordinal() + 1)
+        self.connection.execute(f"""
+            INSERT INTO "{table_id}"
+            SELECT
+              $account_id,
+              {{'id': $service, 'description': $service}},
+              {{'id': 'sku-late', 'description': 'Late SKU'}},
+              CAST($usage AS TIMESTAMPTZ) + INTERVAL 12 HOUR,
+              CAST($usage AS TIMESTAMPTZ) + INTERVAL 13 HOUR,
+              {{'id': 'project-0', 'name': 'Project 0'}},
+              [],
+              {{'location': 'us-central1', 'country': 'US', 'region': 'us-central1', 'zone': NULL}},
+              $cost,
+              $currency,
+              CASE WHEN $credits < 0
+                THEN [{{'name': $credit_type, 'amount': $credits, 'full_name': NULL, 'id': lower($credit_type), 'type': $credit_type}}]
+                ELSE [] END,
+              CAST($exported AS TIMESTAMPTZ)
+        """, {
+            'account_id': account_id, 'service': service, 'usage': usage_date.isoformat(), 'cost': cost,
+            'currency': currency, 'credits': credits, 'exported': exported.isoformat(), 'credit_type': credit_type
+        })
+
+    def query(self, query: str, job_config: Any = None, **kwargs) -> LocalQueryJob:
+        """
+        Run a BigQuery query on the local database
+
+        Args:
+            query: BigQuery Standard SQL
+            job_config: QueryJobConfig with query_parameters and dry_run (optional)
+
+        Returns:
+            LocalQueryJob
+        """
+        with self._lock:
+            self.queries.append(query)
+        parameters = {
+            parameter.name: _parameter_value(parameter)
+            for parameter in getattr(job_config, 'query_parameters', None) or []
+        }
+        table_ids = set(_TABLE_REFERENCE.findall(query))
+        scanned_bytes = sum(self._table_bytes(table_id) for table_id in table_ids)
+        if getattr(job_config, 'dry_run', False):
+            if not query.lstrip().upper().startswith('CREATE'):
+                for table_id in sorted(table_ids):
+                    self._check_table_exists(table_id)
+            return LocalQueryJob(None, scanned_bytes, 0)
+
+        started = time.perf_counter()
+        # One cursor per query, so queries from several threads do not share a result set
+        cursor = self.connection.cursor()
+        cursor.execute(translate_sql(query), parameters)
+        return LocalQueryJob(cursor, scanned_bytes, int((time.perf_counter() - started) * 1000))
+
+    def get_table(self, table: str) -> Any:
+        """
+        Get a table by 'project.dataset.table' or name, raising NotFound like BigQuery when it does not exist
+        """
+        table_id = table.split('.')[-1]
+        self._check_table_exists(table_id)
+        return fakes.FakeRow({'table_id': table_id})
+
+    def _check_table_exists(self, table_id: str) -> None:
+        from google.api_core.exceptions import NotFound
+
+        if not self._table_exists(table_id):
+            raise NotFound(f"Not found: Table {table_id}")
+
+    def _table_exists(self, table_id: str) -> bool:
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = $name", {'name': table_id})
+        return bool(cursor.fetchone()[0])
+
+    def _table_bytes(self, table_id: str) -> int:
+        """
+        Estimated size of a table in bytes, 0 if it does not exist
+        """
+        if not self._table_exists(table_id):
+            return 0
+        cursor = self.connection.cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM "{table_id}"')
+        return cursor.fetchone()[0] * self.row_bytes.get(table_id, DEFAULT_ROW_BYTES)
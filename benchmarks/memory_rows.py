@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark peak memory of summarizing large billing result sets
+
+Compares materializing every row as a dict (the previous pipeline) with
+folding rows into the summary as they are paged in. Rows are synthetic
+SKU-level rows spread over a fixed number of services, so the summary size
+stays constant while the row count grows.
+
+Usage:
+    python benchmarks/memory_rows.py [--rows 10000 100000 1000000] [--services 200]
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator
+
+import fakes
+from gcp_client import GCPBillingClient
+
+# Imported up front so the library itself is not counted in the traced peaks
+from google.cloud import bigquery  # noqa: E402,F401
+
+
+def synthetic_rows(count: int, services: int) -> Callable[[], Iterator[Dict[str, Any]]]:
+    """
+    Build a row source yielding count rows spread over the given number of services
+    """
+    def generate() -> Iterator[Dict[str, Any]]:
+        for i in range(count):
+            yield {
+                'period_index': 0,
+                'service_name': f"Service {i % services:04d}",
+                'sku_description': f"SKU {i:08d}",
+                'total_cost': float(i % 1000) / 10.0,
+                'currency': 'USD'
+            }
+    return generate
+
+
+def measure(function: Callable[[], Any]) -> Dict[str, float]:
+    """
+    Run function and report its peak traced memory and wall time
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'peak_mib': peak / (1024 * 1024), 'seconds': elapsed, 'total_cost': result['total_cost']}
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--services', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'materialized MiB':>17} {'streaming MiB':>14} {'materialized s':>15} {'streaming s':>12}")
+    for count in args.rows:
+        client = GCPBillingClient(
+            'BENCH-ACCOUNT', 'benchmark-project', 'gcp_billing_export_v1_BENCH', credentials=object(),
+            bigquery_client=fakes.FakeBigQueryClient(synthetic_rows(count, args.services))
+        )
+        periods = [('month', '2025-06-01', '2025-07-01')]
+
+        def materialized():
+            # Previous pipeline: list of dicts first, then a second pass to summarize
+            rows = [dict(row.items()) for _, row in client._stream_billing_rows([p[1:] for p in periods])]
+            return client._summarize_billing_data(rows)
+
+        def streaming():
+            return client.get_costs_for_periods(periods)['month']
+
+        before = measure(materialized)
+        after = measure(streaming)
+        assert abs(before['total_cost'] - after['total_cost']) < 1e-6 * max(1.0, before['total_cost'])
+        print(
+            f"{count:>10} {before['peak_mib']:>17.2f} {after['peak_mib']:>14.2f} "
+            f"{before['seconds']:>15.3f} {after['seconds']:>12.3f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
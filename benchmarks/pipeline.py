@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark the report pipeline stage by stage against local stand-ins, with regression thresholds
+
+For each scale, a billing export with that many service/SKU pairs is
+generated in the local BigQuery stand-in (DuckDB), and a SKU drill-down
+report is run through query assembly, query execution, summarization,
+formatting and delivery to a fake Discord webhook. Each stage's median
+time must stay below its threshold.
+
+Usage:
+    python benchmarks/pipeline.py [--rows 10 1000 100000] [--repeat 3] [--threshold-factor 1.0]
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, Tuple
+
+import fakes
+import local_bigquery
+from discord_client import DiscordClient
+from formatter import DiscordMessageFormatter
+from gcp_client import GCPBillingClient
+from google.auth.credentials import AnonymousCredentials
+
+# Imported up front so the library import is not timed as query assembly
+from google.cloud import bigquery  # noqa: E402,F401
+
+TABLE_ID = 'gcp_billing_export_v1_LOCAL'
+STAGES = ('query_assembly', 'query_execution', 'summarization', 'formatting', 'delivery')
+
+# Median milliseconds per stage and scale, 3-10x the times measured on a
+# 2-vCPU development VM; raise --threshold-factor on slower machines
+THRESHOLDS_MS = {
+    10: {'query_assembly': 5, 'query_execution': 100, 'summarization': 5, 'formatting': 5, 'delivery': 50},
+    1000: {'query_assembly': 5, 'query_execution': 150, 'summarization': 10, 'formatting': 5, 'delivery': 50},
+    100000: {'query_assembly': 5, 'query_execution': 3000, 'summarization': 1000, 'formatting': 50,
+             'delivery': 100},
+}
+
+
+def median_ms(function: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    """
+    Run function repeat times
+
+    Returns:
+        Tuple of (median wall time in ms, result of the last run)
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def run_scale(rows: int, repeat: int, webhook: fakes.FakeWebhookServer) -> Dict[str, Any]:
+    """
+    Time every pipeline stage for one scale
+
+    Args:
+        rows: Service/SKU pairs in the generated export
+        repeat: Runs per stage
+        webhook: Fake Discord webhook server
+
+    Returns:
+        Dictionary with stage timings in ms and the report's shape
+    """
+    local_client = local_bigquery.LocalBigQueryClient()
+    local_client.create_export_table(TABLE_ID, rows, days=1)
+    periods = [('2000-01-01', '2100-01-01')]
+
+    def billing_client(bigquery_client: Any) -> GCPBillingClient:
+        return GCPBillingClient(
+            'LOCAL-ACCOUNT', 'local-project', TABLE_ID, credentials=AnonymousCredentials(),
+            bigquery_client=bigquery_client, dimensions=['sku']
+        )
+
+    # Query assembly: the full call against a client returning no rows
+    assembling_client = billing_client(fakes.FakeBigQueryClient([]))
+    timings = {}
+    timings['query_assembly'], _ = median_ms(
+        lambda: assembling_client.get_costs_for_periods([('month', *periods[0])]), repeat
+    )
+
+    client = billing_client(local_client)
+    timings['query_execution'], result_rows = median_ms(
+        lambda: client._fetch_billing_data_for_periods(periods)[0], repeat
+    )
+    timings['summarization'], summary = median_ms(lambda: client._summarize_billing_data(result_rows), repeat)
+    billing_data = {'year': 2025, 'month': 6, 'start_date': '2025-06-01', 'end_date': '2025-07-01', **summary}
+
+    formatter = DiscordMessageFormatter(exchange_rate=150.0)
+    timings['formatting'], pages = median_ms(lambda: formatter.format_billing_data_pages(billing_data), repeat)
+
+    discord_client = DiscordClient(webhook.url)
+    timings['delivery'], _ = median_ms(lambda: discord_client.send_embed_pages('Benchmark', pages), repeat)
+    return {
+        'timings': timings,
+        'result_rows': len(result_rows),
+        'services': len(billing_data['services']),
+        'messages': len(pages)
+    }
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=sorted(THRESHOLDS_MS),
+                        help='Service/SKU pairs per scale')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage')
+    parser.add_argument('--threshold-factor', type=float, default=1.0, help='Multiplier of every threshold')
+    args = parser.parse_args()
+
+    failures = []
+    with fakes.FakeWebhookServer() as webhook:
+        for rows in args.rows:
+            result = run_scale(rows, args.repeat, webhook)
+            print(f"{rows:>8} rows: {result['result_rows']} result rows, {result['services']} services, "
+                  f"{result['messages']} messages")
+            thresholds = THRESHOLDS_MS.get(rows, {})
+            for stage in STAGES:
+                elapsed = result['timings'][stage]
+                limit = thresholds.get(stage)
+                if limit is None:
+                    status = '    '
+                elif elapsed <= limit * args.threshold_factor:
+                    status = 'PASS'
+                else:
+                    status = 'FAIL'
+                    failures.append(f"{stage} at {rows} rows")
+                limit_text = f"(limit {limit * args.threshold_factor:.0f} ms)" if limit is not None else ''
+                print(f"    {status} {stage:<16} {elapsed:10.2f} ms {limit_text}")
+
+    if failures:
+        print(f"Regressions: {', '.join(failures)}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Check the shape of the client's BigQuery SQL on the local BigQuery stand-in
+
+DuckDB accepts some constructs BigQuery rejects, so running the queries
+locally does not prove they are valid BigQuery SQL. This script runs
+reports over every kind of drill-down (export and summary table sources,
+daily and monthly grouping) and checks the generated SQL itself:
+GROUPING() must only take columns of the FROM clause, since BigQuery
+does not resolve aliases of the same SELECT list there.
+
+Usage:
+    python benchmarks/query_shapes.py
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+import fakes  # noqa: F401 (puts lambda_function/ on sys.path)
+import local_bigquery
+from gcp_client import GCPBillingClient
+from google.auth.credentials import AnonymousCredentials
+
+TABLE_ID = 'gcp_billing_export_v1_LOCAL'
+SUMMARY_TABLE_ID = 'billing_daily_summary'
+
+_GROUPING = re.compile(r"\bGROUPING\((\w+)\)")
+
+
+def grouping_alias_errors(query: str) -> List[str]:
+    """
+    GROUPING() arguments that are aliases of the same SELECT list, or not columns of its FROM clause
+
+    Args:
+        query: BigQuery SQL
+
+    Returns:
+        Descriptions of the offending arguments
+    """
+    errors = []
+    for match in _GROUPING.finditer(query):
+        column = match.group(1)
+        select_start = query.rfind('SELECT', 0, match.start())
+        from_start = query.find('FROM', match.end())
+        select_list = query[select_start:from_start]
+        alias = re.compile(rf"\bas {column}\b", re.IGNORECASE)
+        if alias.search(select_list):
+            errors.append(f"GROUPING({column}) refers to an alias of its own SELECT list")
+        elif not alias.search(query[from_start:]):
+            errors.append(f"GROUPING({column}) is not a column projected by its FROM subquery")
+    return errors
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'PASS' if ok else 'FAIL'} {name:<52} {detail}")
+    return ok
+
+
+def main():
+    """Main function"""
+    local_client = local_bigquery.LocalBigQueryClient()
+    local_client.create_export_table(TABLE_ID, 100, days=3)
+
+    def billing_client(dimensions: List[str], summary_start: Optional[str] = None) -> GCPBillingClient:
+        return GCPBillingClient(
+            'LOCAL-ACCOUNT', 'local-project', TABLE_ID, credentials=AnonymousCredentials(),
+            bigquery_client=local_client, dimensions=dimensions,
+            summary_table_id=SUMMARY_TABLE_ID if summary_start else None, summary_start=summary_start
+        )
+
+    results = []
+    cases: List[Dict[str, Any]] = [
+        {'name': "service only", 'dimensions': []},
+        {'name': "service > project", 'dimensions': ['project']},
+        {'name': "service > project > SKU", 'dimensions': ['project', 'sku']},
+        {'name': "service > label > location", 'dimensions': ['label:env', 'location']},
+        {'name': "service > project from the summary table", 'dimensions': ['project'], 'summary_start': '2000-01-01'},
+    ]
+    for case in cases:
+        client = billing_client(case['dimensions'], case.get('summary_start'))
+        for daily in (False, True):
+            local_client.queries.clear()
+            client._fetch_billing_data_for_periods([('2000-01-01', '2100-01-01')], daily=daily)
+            report_queries = [query for query in local_client.queries if 'UNNEST(@periods)' in query]
+            errors = [error for query in report_queries for error in grouping_alias_errors(query)]
+            groupings = sum(len(_GROUPING.findall(query)) for query in report_queries)
+            results.append(check(f"{case['name']}{', daily' if daily else ''}",
+                                 bool(report_queries) and not errors,
+                                 '; '.join(errors) or f"{groupings} GROUPING() over subquery columns"))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
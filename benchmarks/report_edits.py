@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Exercise edit-in-place Discord reports against a local fake webhook server
+
+Simulates a month of daily use_current_month reports and compares the
+webhook requests of posting a new message every day with editing the
+month's message in place, then runs the edge cases: unchanged reports,
+changes below DISCORD_MIN_UPDATE_DELTA, a change of the message text
+alone, a message deleted in Discord, a report shrinking to fewer pages,
+a delivery failing after its first page and the next month.
+
+Usage:
+    python benchmarks/report_edits.py [--days 30] [--services 40] [--min-delta 100]
+"""
+import argparse
+import tempfile
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+import fakes
+from discord_client import DiscordClient
+from formatter import DiscordMessageFormatter
+from report_messages import ReportMessageEditor
+from state_store import LocalFileStateStore
+
+ACCOUNT_ID = 'BENCH-ACCOUNT'
+
+
+def webhook_responses() -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Build a fake webhook answering like Discord: created messages get increasing IDs
+    """
+    created = []
+
+    def respond(request: Dict[str, Any]) -> Dict[str, Any]:
+        if request['method'] == 'POST' and 'wait=true' in request['path']:
+            created.append(str(1000 + len(created)))
+            return {'status': 200, 'body': {'id': created[-1]}}
+        if request['method'] == 'PATCH':
+            return {'status': 200, 'body': {'id': request['path'].split('/messages/')[1].split('?')[0]}}
+        return {'status': 204}
+    return respond
+
+
+def billing_data(day: int, services: int, month: int = 6, step: float = 1000.0) -> Dict[str, Any]:
+    """
+    Month-to-date billing information after the given number of days, growing by step per day
+    """
+    service_list = [
+        {'name': f"Service {i:03d}", 'cost': day * step / (i + 1), 'gross_cost': day * step / (i + 1), 'credits': 0.0}
+        for i in range(services)
+    ]
+    return {
+        'year': 2025, 'month': month, 'start_date': f"2025-{month:02d}-01", 'end_date': f"2025-{month:02d}-{day:02d}",
+        'currency': 'JPY', 'total_cost': sum(service['cost'] for service in service_list),
+        'gross_cost': sum(service['cost'] for service in service_list), 'credits_total': 0.0, 'credits': {},
+        'services': service_list
+    }
+
+
+def methods(requests: List[Dict[str, Any]]) -> str:
+    counts = Counter(request['method'] for request in requests)
+    return ', '.join(f"{method} {count}" for method, count in sorted(counts.items())) or 'none'
+
+
+def check(name: str, ok: bool, requests: List[Dict[str, Any]]) -> bool:
+    print(f"{'PASS' if ok else 'FAIL'} {name:<46} {methods(requests)}")
+    return ok
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--services', type=int, default=40)
+    parser.add_argument('--min-delta', type=float, default=100.0)
+    args = parser.parse_args()
+
+    formatter = DiscordMessageFormatter()
+
+    def send(client: DiscordClient, editor: ReportMessageEditor, data: Dict[str, Any], message=None) -> bool:
+        pages = formatter.format_billing_data_pages(data)
+        return editor.send(client, ACCOUNT_ID, message or f"{data['year']}年{data['month']}月", pages, data)
+
+    def methods_sent(requests: List[Dict[str, Any]]) -> List[str]:
+        return [request['method'] for request in requests]
+
+    results = []
+    with fakes.FakeWebhookServer(webhook_responses()) as webhook, tempfile.TemporaryDirectory() as state_dir:
+        client = DiscordClient(webhook.url)
+        editor = ReportMessageEditor(LocalFileStateStore(state_dir), args.min_delta)
+
+        for day in range(1, args.days + 1):
+            data = billing_data(day, args.services)
+            client.send_embed_pages('report', formatter.format_billing_data_pages(data))
+        posted = list(webhook.requests)
+        webhook.requests.clear()
+
+        results.append(check(f"{args.days} daily reports, edit in place",
+                             all(send(client, editor, billing_data(day, args.services))
+                                 for day in range(1, args.days + 1)), webhook.requests))
+        edited = list(webhook.requests)
+        print(f"     new message per day: {methods(posted)}; message IDs kept: "
+              f"{editor.store.get(editor.key(ACCOUNT_ID, webhook.url, 2025, 6))['message_ids']}")
+        results[-1] = results[-1] and all('wait=true' in request['path'] for request in edited[:1]) and \
+            sum(request['method'] == 'POST' for request in edited) == 1
+
+        webhook.requests.clear()
+        results.append(check("unchanged report sends nothing",
+                             send(client, editor, billing_data(args.days, args.services)) and not webhook.requests,
+                             webhook.requests))
+
+        webhook.requests.clear()
+        small = billing_data(args.days, args.services)
+        small['services'][0]['cost'] += args.min_delta / 2
+        small['total_cost'] += args.min_delta / 2
+        results.append(check("change below the minimum delta sends nothing",
+                             send(client, editor, small) and not webhook.requests, webhook.requests))
+
+        webhook.requests.clear()
+        # Without a minimum delta, only the hash of the message text and embeds decides
+        ok = send(client, ReportMessageEditor(editor.store), small, message='message text changed')
+        results.append(check("change of the message text alone edits",
+                             ok and methods_sent(webhook.requests) == ['PATCH'], webhook.requests))
+
+        webhook.requests.clear()
+        webhook.responses.append({'status': 404, 'body': {'message': 'Unknown Message', 'code': 10008}})
+        ok = send(client, editor, billing_data(args.days + 1, args.services))
+        results.append(check("deleted message is posted again",
+                             ok and methods_sent(webhook.requests) == ['PATCH', 'POST'],
+                             webhook.requests))
+
+        webhook.requests.clear()
+        many = billing_data(args.days + 2, 300)
+        ok = send(client, editor, many)
+        pages = len(editor.store.get(editor.key(ACCOUNT_ID, webhook.url, 2025, 6))['message_ids'])
+        webhook.requests.clear()
+        ok = ok and send(client, editor, billing_data(args.days + 3, 3))
+        results.append(check(f"report shrinking from {pages} pages deletes the rest",
+                             ok and pages > 1 and
+                             sum(request['method'] == 'DELETE' for request in webhook.requests) == pages - 1,
+                             webhook.requests))
+
+        webhook.requests.clear()
+        # The first page of a new month is posted, the second is rejected
+        webhook.responses.extend([{'status': 200, 'body': {'id': '2000'}}, {'status': 400, 'body': {'message': 'bad'}}])
+        failed = not send(client, editor, billing_data(1, 300, month=8))
+        kept = editor.store.get(editor.key(ACCOUNT_ID, webhook.url, 2025, 8))['message_ids']
+        webhook.requests.clear()
+        ok = failed and kept == ['2000'] and send(client, editor, billing_data(1, 300, month=8))
+        results.append(check("failed delivery keeps posted pages, retry edits",
+                             ok and methods_sent(webhook.requests) == ['PATCH', 'POST'], webhook.requests))
+
+        webhook.requests.clear()
+        ok = send(client, editor, billing_data(1, args.services, month=7))
+        results.append(check("next month starts a new message",
+                             ok and methods_sent(webhook.requests) == ['POST'],
+                             webhook.requests))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Check the daily summary table lifecycle on the local BigQuery stand-in
+
+Covers a first deployment run in dry run mode (the table does not exist
+and a dry run must not need it), the setup that fills the table, reports
+read from it matching the export, and dry runs once it exists. Dry runs
+fail with NotFound on missing tables in the stand-in, as in BigQuery.
+
+Usage:
+    python benchmarks/summary_table.py [--rows 100] [--days 5]
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import fakes  # noqa: F401 (puts lambda_function/ on sys.path)
+import local_bigquery
+from gcp_client import GCPBillingClient
+from google.auth.credentials import AnonymousCredentials
+
+TABLE_ID = 'gcp_billing_export_v1_LOCAL'
+SUMMARY_TABLE_ID = f"{TABLE_ID}_daily_summary"
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'PASS' if ok else 'FAIL'} {name:<52} {detail}")
+    return ok
+
+
+def totals(billing_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Total and per-service costs rounded to cents
+    """
+    return {
+        'total_cost': round(billing_data['total_cost'], 2),
+        'services': {service['name']: round(service['cost'], 2) for service in billing_data['services']}
+    }
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100, help='Service/SKU pairs per usage day')
+    parser.add_argument('--days', type=int, default=5, help='Usage days up to today')
+    args = parser.parse_args()
+
+    today = datetime.now().date()
+    start = today - timedelta(days=args.days - 1)
+    local_client = local_bigquery.LocalBigQueryClient()
+    local_client.create_export_table(TABLE_ID, args.rows, days=args.days, start_date=start)
+    periods = [('range', start.strftime('%Y-%m-%d'), (today + timedelta(days=1)).strftime('%Y-%m-%d'))]
+
+    def billing_client(summary: bool = True) -> GCPBillingClient:
+        return GCPBillingClient(
+            'LOCAL-ACCOUNT', 'local-project', TABLE_ID, credentials=AnonymousCredentials(),
+            bigquery_client=local_client, dimensions=['project'],
+            summary_table_id=SUMMARY_TABLE_ID if summary else None, summary_start=start.strftime('%Y-%m-%d')
+        )
+
+    def summary_queries() -> List[str]:
+        return [query for query in local_client.queries if SUMMARY_TABLE_ID in query]
+
+    results = []
+
+    # First deployment, dry run: neither the report nor the setup may touch the missing table
+    client = billing_client()
+    client.start_run(dry_run=True)
+    local_client.queries.clear()
+    error = None
+    try:
+        client.get_costs_for_periods(periods)
+        client.refresh_summary_table()
+    except Exception as e:
+        error = e
+    created = local_client._table_exists(SUMMARY_TABLE_ID)
+    results.append(check("dry run before the summary table exists",
+                         error is None and not created and client.query_stats['estimated_bytes'] > 0
+                         and all(query.lstrip().startswith('CREATE') for query in summary_queries()),
+                         f"{error!r}" if error else f"estimated {client.query_stats['estimated_bytes']:,} bytes"))
+
+    # Setup, then a report from the summary table
+    client = billing_client()
+    client.start_run()
+    client.refresh_summary_table()
+    local_client.queries.clear()
+    from_summary = client.get_costs_for_periods(periods)['range']
+    read_summary = any('UNNEST(@periods)' in query for query in summary_queries())
+    from_export = billing_client(summary=False).get_costs_for_periods(periods)['range']
+    results.append(check("report from the summary table matches the export",
+                         read_summary and totals(from_summary) == totals(from_export),
+                         f"total {from_summary['total_cost']:,.2f}"))
+
+    # Dry run once the table exists estimates the refresh and the summary read
+    client = billing_client()
+    client.start_run(dry_run=True)
+    local_client.queries.clear()
+    client.get_costs_for_periods(periods)
+    results.append(check("dry run after setup reads the summary table",
+                         any('UNNEST(@periods)' in query for query in summary_queries())
+                         and any(query.lstrip().startswith('MERGE') for query in summary_queries()),
+                         f"{len(local_client.queries)} statements estimated"))
+
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Configuration and concurrent processing of multiple billing accounts
+"""
+import json
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_CONCURRENCY = 8
+DEFAULT_DELIVERY_CONCURRENCY = 4
+
+
+def load_account_configs_from_env() -> Optional[List[Dict[str, Any]]]:
+    """
+    Load the list of billing accounts from the BILLING_ACCOUNTS environment variable
+
+    BILLING_ACCOUNTS is a JSON list of objects with 'billing_account_id' and
+    'bigquery_table_id', and optionally 'name', 'bigquery_project_id'
+    (BIGQUERY_PROJECT_ID otherwise), 'discord_webhook_url'
+    (DISCORD_WEBHOOK_URL otherwise) and 'alert_thresholds' (ALERT_THRESHOLDS otherwise).
+
+    Returns:
+        List of account configurations, or None if BILLING_ACCOUNTS is not set
+    """
+    accounts_json = os.environ.get('BILLING_ACCOUNTS')
+    if not accounts_json:
+        return None
+
+    try:
+        accounts = json.loads(accounts_json)
+    except json.JSONDecodeError:
+        raise ValueError("Invalid BILLING_ACCOUNTS JSON in environment variable")
+    if not isinstance(accounts, list) or not accounts:
+        raise ValueError("BILLING_ACCOUNTS must be a non-empty JSON list")
+
+    names = set()
+    for account in accounts:
+        if not isinstance(account, dict):
+            raise ValueError("Each BILLING_ACCOUNTS entry must be a JSON object")
+        for key in ('billing_account_id', 'bigquery_table_id'):
+            if not account.get(key):
+                raise ValueError(f"BILLING_ACCOUNTS entry is missing '{key}'")
+        account.setdefault('name', account['billing_account_id'])
+        if account['name'] in names:
+            raise ValueError(f"Duplicate account name in BILLING_ACCOUNTS: {account['name']}")
+        names.add(account['name'])
+    return accounts
+
+
+def fan_out(accounts: List[Dict[str, Any]],
+            fetch: Callable[[Dict[str, Any]], Any],
+            deliver: Callable[[Dict[str, Any], Any], Dict[str, Any]],
+            query_concurrency: int = DEFAULT_QUERY_CONCURRENCY,
+            delivery_concurrency: int = DEFAULT_DELIVERY_CONCURRENCY) -> List[Dict[str, Any]]:
+    """
+    Fetch every account concurrently and deliver each result as soon as it is ready
+
+    Queries run on one thread pool and deliveries on a second, smaller one,
+    so total time is close to the slowest account rather than the sum.
+
+    Args:
+        accounts: Account configurations
+        fetch: Function returning the billing data of an account
+        deliver: Function sending an account's billing data, returning its result
+        query_concurrency: Maximum concurrent fetches
+        delivery_concurrency: Maximum concurrent deliveries
+
+    Returns:
+        One result per account, in the order of accounts; failed accounts
+        have 'success' False and an 'error' message
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(query_concurrency, len(accounts)))) as query_pool, \
+            ThreadPoolExecutor(max_workers=max(1, min(delivery_concurrency, len(accounts)))) as delivery_pool:
+        fetches: Dict[Future, Dict[str, Any]] = {
+            query_pool.submit(fetch, account): account for account in accounts
+        }
+        deliveries: Dict[Future, Dict[str, Any]] = {}
+
+        for future in as_completed(fetches):
+            account = fetches[future]
+            try:
+                billing_data = future.result()
+            except Exception as e:
+                logger.error(f"Failed to fetch billing data for account {account['name']}: {str(e)}")
+                results[account['name']] = {'account': account['name'], 'success': False, 'error': str(e)}
+                continue
+            deliveries[delivery_pool.submit(deliver, account, billing_data)] = account
+
+        for future in as_completed(deliveries):
+            account = deliveries[future]
+            try:
+                results[account['name']] = dict(future.result(), account=account['name'])
+            except Exception as e:
+                logger.error(f"Failed to deliver billing data for account {account['name']}: {str(e)}")
+                results[account['name']] = {'account': account['name'], 'success': False, 'error': str(e)}
+
+    return [results[account['name']] for account in accounts]
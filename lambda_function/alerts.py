@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Budget threshold alerts checked with a cheap incremental query and deduplicated in the state store
+"""
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from state_store import StateStore, create_state_store_from_env
+
+logger = logging.getLogger(__name__)
+
+
+def parse_thresholds(thresholds: Any) -> Dict[str, Any]:
+    """
+    Validate threshold configuration
+
+    Args:
+        thresholds: Dictionary with optional 'total' (list of amounts) and
+                    'services' (service name -> list of amounts), in the billing currency
+
+    Returns:
+        Dictionary with 'total' and 'services', amounts sorted ascending
+    """
+    if not isinstance(thresholds, dict):
+        raise ValueError("Alert thresholds must be a JSON object with 'total' and/or 'services'")
+
+    def amounts(value: Any, scope: str) -> List[float]:
+        values = value if isinstance(value, list) else [value]
+        try:
+            return sorted(float(amount) for amount in values)
+        except (TypeError, ValueError):
+            raise ValueError(f"Alert thresholds for {scope} must be numbers")
+
+    services = thresholds.get('services') or {}
+    if not isinstance(services, dict):
+        raise ValueError("Alert thresholds 'services' must map service names to amounts")
+    parsed = {
+        'total': amounts(thresholds.get('total') or [], 'total'),
+        'services': {name: amounts(value, name) for name, value in services.items()}
+    }
+    if not parsed['total'] and not any(parsed['services'].values()):
+        raise ValueError("No alert thresholds configured")
+    return parsed
+
+
+def load_thresholds_from_env(account: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Load thresholds of an account ('alert_thresholds' in BILLING_ACCOUNTS) or from ALERT_THRESHOLDS
+
+    Args:
+        account: Account configuration (optional)
+
+    Returns:
+        Parsed thresholds
+    """
+    if account and account.get('alert_thresholds'):
+        return parse_thresholds(account['alert_thresholds'])
+
+    thresholds_json = os.environ.get('ALERT_THRESHOLDS')
+    if not thresholds_json:
+        raise ValueError("Environment variable 'ALERT_THRESHOLDS' is not set")
+    try:
+        thresholds = json.loads(thresholds_json)
+    except json.JSONDecodeError:
+        raise ValueError("Invalid ALERT_THRESHOLDS JSON in environment variable")
+    return parse_thresholds(thresholds)
+
+
+class ThresholdAlerter:
+    """
+    Checks month-to-date costs against thresholds and reports each crossing once
+
+    Per account and month, the state store keeps the totals of usage days
+    older than the late-arrival window together with the thresholds already
+    notified. Each check then only queries the newest days (and partitions),
+    in one query returning a single row.
+    """
+    def __init__(self, store: StateStore, thresholds: Dict[str, Any], late_arrival_days: int = 3):
+        """
+        Initialize
+
+        Args:
+            store: State store holding the running totals and notified thresholds
+            thresholds: Thresholds from parse_thresholds
+            late_arrival_days: Days during which exported rows may still arrive for a usage day
+        """
+        self.store = store
+        self.thresholds = thresholds
+        self.late_arrival_days = late_arrival_days
+
+    def check(self, gcp_client: Any, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Query the month-to-date totals and find thresholds crossed but not notified yet
+
+        The running totals are saved right away; crossings are only recorded
+        as notified by mark_notified, once their notification was sent.
+
+        Args:
+            gcp_client: GCPBillingClient
+            today: Current date (optional)
+
+        Returns:
+            Dictionary with 'key' (state key), 'year', 'month', 'currency', 'total_cost',
+            'services' (service name -> cost) and 'crossings', a list of
+            {'scope', 'threshold', 'cost'} where scope is 'total' or a service name
+        """
+        today = today or datetime.now().date()
+        month_start = today.replace(day=1)
+        key = f"alerts/{gcp_client.billing_account_id}/{gcp_client.bigquery_table_id}/{month_start.strftime('%Y-%m')}"
+        services = sorted(name for name, amounts in self.thresholds['services'].items() if amounts)
+
+        state = self.store.get(key) or {'notified': []}
+        if state.get('tracked_services') != services:
+            # Running totals of newly configured services start from the beginning of the month
+            state = {
+                'finalized_through': None,
+                'finalized': {'total_cost': 0.0, 'services': {}},
+                'tracked_services': services,
+                'currency': None,
+                'notified': state.get('notified', [])
+            }
+
+        query_start = month_start
+        if state['finalized_through']:
+            query_start = datetime.strptime(state['finalized_through'], '%Y-%m-%d').date() + timedelta(days=1)
+        finalize_before = max(query_start, today - timedelta(days=self.late_arrival_days))
+
+        totals = gcp_client.get_cost_totals(
+            query_start.strftime('%Y-%m-%d'), finalize_before.strftime('%Y-%m-%d'),
+            (today + timedelta(days=1)).strftime('%Y-%m-%d'), services
+        )
+        if gcp_client.dry_run:
+            return {'key': key, 'year': today.year, 'month': today.month, 'currency': 'JPY',
+                    'total_cost': 0.0, 'services': {}, 'crossings': []}
+
+        finalized = state['finalized']
+        finalized['total_cost'] += totals['finalized']['total_cost']
+        for service in services:
+            finalized['services'][service] = (
+                finalized['services'].get(service, 0.0) + totals['finalized']['services'][service]
+            )
+        if finalize_before > query_start:
+            state['finalized_through'] = (finalize_before - timedelta(days=1)).strftime('%Y-%m-%d')
+        state['currency'] = totals['currency'] or state['currency']
+        self.store.put(key, state)
+
+        total_cost = finalized['total_cost'] + totals['open']['total_cost']
+        service_costs = {
+            service: finalized['services'].get(service, 0.0) + totals['open']['services'][service]
+            for service in services
+        }
+
+        crossings = []
+        notified = set(state['notified'])
+        scopes = [('total', total_cost, self.thresholds['total'])] + [
+            (service, service_costs[service], self.thresholds['services'][service]) for service in services
+        ]
+        for scope, cost, amounts in scopes:
+            for threshold in amounts:
+                if cost >= threshold and _threshold_key(scope, threshold) not in notified:
+                    crossings.append({'scope': scope, 'threshold': threshold, 'cost': cost})
+
+        logger.info(f"Month-to-date total {total_cost:,.2f}; {len(crossings)} thresholds newly crossed")
+        return {
+            'key': key,
+            'year': today.year,
+            'month': today.month,
+            'currency': state['currency'] or 'JPY',
+            'total_cost': total_cost,
+            'services': service_costs,
+            'crossings': crossings
+        }
+
+    def mark_notified(self, alert: Dict[str, Any]) -> None:
+        """
+        Record the crossings of an alert as notified so they are not reported again this month
+
+        Args:
+            alert: Result of check whose notification was sent
+        """
+        if not alert['crossings']:
+            return
+        state = self.store.get(alert['key']) or {}
+        notified = set(state.get('notified', []))
+        notified.update(_threshold_key(crossing['scope'], crossing['threshold']) for crossing in alert['crossings'])
+        state['notified'] = sorted(notified)
+        self.store.put(alert['key'], state)
+
+
+def _threshold_key(scope: str, threshold: float) -> str:
+    """
+    Identifier of a threshold in the notified list
+    """
+    return f"{scope}:{threshold:g}"
+
+
+def create_alerter_from_env(account: Optional[Dict[str, Any]] = None) -> ThresholdAlerter:
+    """
+    Create the threshold alerter from environment variables
+
+    Args:
+        account: Account configuration with optional 'alert_thresholds' (optional)
+
+    Returns:
+        ThresholdAlerter
+    """
+    store = create_state_store_from_env()
+    if store is None:
+        raise ValueError("Environment variable 'STATE_STORE_URL' is required for alert mode")
+    try:
+        late_arrival_days = int(os.environ.get('LATE_ARRIVAL_DAYS', 3))
+    except ValueError:
+        raise ValueError("Environment variable 'LATE_ARRIVAL_DAYS' must be an integer")
+    return ThresholdAlerter(store, load_thresholds_from_env(account), late_arrival_days)
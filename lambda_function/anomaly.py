@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Month-end forecast and per-service anomaly detection on daily cost series
+
+Daily costs are laid out as one services x days matrix so that every
+statistic is computed for all services at once with NumPy.
+"""
+import calendar
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from gcp_client import row_costs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOOKBACK_DAYS = 90
+DEFAULT_WINDOW_DAYS = 14
+DEFAULT_Z_THRESHOLD = 3.0
+DEFAULT_MIN_DELTA = 1.0
+DEFAULT_EWMA_ALPHA = 0.3
+METHODS = ('zscore', 'ewma')
+
+
+def build_cost_matrix(rows: Iterable[Dict[str, Any]], start_date: date,
+                      days: int) -> Tuple[List[str], np.ndarray, str]:
+    """
+    Lay out daily rows as a services x days matrix of net costs
+
+    Args:
+        rows: Rows with 'usage_date', 'service_name', cost columns and 'currency'
+        start_date: Date of the first column
+        days: Number of columns
+
+    Returns:
+        Tuple of (service names, matrix, currency); rows outside the range are ignored
+    """
+    service_index: Dict[str, int] = {}
+    service_indices: List[int] = []
+    day_indices: List[int] = []
+    costs: List[float] = []
+    currency = 'JPY'  # Default currency
+    for row in rows:
+        usage_date = row['usage_date']
+        if not isinstance(usage_date, date):
+            usage_date = date.fromisoformat(str(usage_date))
+        day = (usage_date - start_date).days
+        if not 0 <= day < days:
+            continue
+        name = row.get('service_name') or 'Unknown Service'
+        service_indices.append(service_index.setdefault(name, len(service_index)))
+        day_indices.append(day)
+        gross_cost, credits = row_costs(row)
+        costs.append(gross_cost + credits)
+        currency = row.get('currency') or currency
+
+    matrix = np.zeros((len(service_index), days))
+    np.add.at(matrix, (np.asarray(service_indices, dtype=np.intp), np.asarray(day_indices, dtype=np.intp)),
+              np.asarray(costs, dtype=np.float64))
+    return list(service_index), matrix, currency
+
+
+def ewma_weights(window: int, alpha: float) -> np.ndarray:
+    """
+    Normalized exponential weights of a trailing window, oldest day first
+    """
+    weights = alpha * (1.0 - alpha) ** np.arange(window - 1, -1, -1, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def detect_anomalies(matrix: np.ndarray, target_day: int, window: int = DEFAULT_WINDOW_DAYS,
+                     z_threshold: float = DEFAULT_Z_THRESHOLD, min_delta: float = DEFAULT_MIN_DELTA,
+                     method: str = 'zscore', alpha: float = DEFAULT_EWMA_ALPHA) -> Dict[str, np.ndarray]:
+    """
+    Score the cost of one day of every service against its trailing window
+
+    With 'zscore' the expected cost is the window mean and the scale its
+    standard deviation; with 'ewma' both are exponentially weighted towards
+    recent days. A service is flagged when |z| reaches z_threshold and the
+    cost moved by at least min_delta. Services with a flat history are
+    flagged on any move of at least min_delta.
+
+    Args:
+        matrix: Services x days matrix of costs
+        target_day: Column of the day being scored
+        window: Trailing days before target_day used as the baseline
+        z_threshold: Minimum absolute z-score
+        min_delta: Minimum absolute difference from the expected cost
+        method: 'zscore' or 'ewma'
+        alpha: EWMA smoothing factor
+
+    Returns:
+        Dictionary of per-service arrays: 'actual', 'expected', 'z', 'flagged'
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown anomaly method: {method}. Use one of {', '.join(METHODS)}")
+    window = min(window, target_day)
+    actual = matrix[:, target_day]
+    if window < 2:
+        # Not enough history to score anything
+        zeros = np.zeros_like(actual)
+        return {'actual': actual, 'expected': actual.copy(), 'z': zeros, 'flagged': zeros.astype(bool)}
+
+    history = matrix[:, target_day - window:target_day]
+    if method == 'ewma':
+        weights = ewma_weights(window, alpha)
+        expected = history @ weights
+        scale = np.sqrt(((history - expected[:, None]) ** 2) @ weights)
+    else:
+        expected = history.mean(axis=1)
+        scale = history.std(axis=1, ddof=1)
+
+    delta = actual - expected
+    z = np.divide(delta, scale, out=np.where(delta == 0, 0.0, np.copysign(np.inf, delta)), where=scale > 0)
+    flagged = (np.abs(z) >= z_threshold) & (np.abs(delta) >= min_delta)
+    return {'actual': actual, 'expected': expected, 'z': z, 'flagged': flagged}
+
+
+def forecast_month_end(matrix: np.ndarray, month_start_day: int, target_day: int, days_in_month: int,
+                       window: int = DEFAULT_WINDOW_DAYS, alpha: float = DEFAULT_EWMA_ALPHA) -> np.ndarray:
+    """
+    Forecast the month-end cost of every service
+
+    Costs of the complete days of the month so far are kept, and every
+    remaining day is assumed to cost the EWMA of the trailing window.
+
+    Args:
+        matrix: Services x days matrix of costs
+        month_start_day: Column of the first day of the month
+        target_day: Column of the last complete day
+        days_in_month: Number of days in the month
+        window: Trailing days used for the daily rate
+        alpha: EWMA smoothing factor
+
+    Returns:
+        Forecast month-end cost per service
+    """
+    complete_days = target_day - month_start_day + 1
+    month_to_date = matrix[:, month_start_day:target_day + 1].sum(axis=1)
+    window = max(1, min(window, target_day + 1))
+    daily_rate = matrix[:, target_day + 1 - window:target_day + 1] @ ewma_weights(window, alpha)
+    return month_to_date + daily_rate * max(0, days_in_month - complete_days)
+
+
+def analyze_daily_costs(rows: Iterable[Dict[str, Any]], today: date, days: int,
+                        window: int = DEFAULT_WINDOW_DAYS, z_threshold: float = DEFAULT_Z_THRESHOLD,
+                        min_delta: float = DEFAULT_MIN_DELTA, method: str = 'zscore',
+                        alpha: float = DEFAULT_EWMA_ALPHA) -> Dict[str, Any]:
+    """
+    Forecast the month-end cost and find anomalous services for yesterday
+
+    Today is still being exported, so yesterday is the last complete day.
+
+    Args:
+        rows: Daily rows from GCPBillingClient.get_daily_cost_series(days)
+        today: Current date
+        days: Number of days the series covers, including today
+        window: Trailing days used as the baseline
+        z_threshold: Minimum absolute z-score of an anomaly
+        min_delta: Minimum absolute cost difference of an anomaly
+        method: 'zscore' or 'ewma'
+        alpha: EWMA smoothing factor
+
+    Returns:
+        Dictionary with 'date' (scored day), 'currency', 'forecast'
+        ({'month', 'total', 'month_to_date'}) and 'anomalies', a list of
+        {'name', 'cost', 'expected', 'z'} sorted by absolute difference from the expected cost
+    """
+    start_date = today - timedelta(days=days - 1)
+    names, matrix, currency = build_cost_matrix(rows, start_date, days)
+    target_day = days - 2
+    target_date = today - timedelta(days=1)
+    month_start = target_date.replace(day=1)
+    month_start_day = max(0, (month_start - start_date).days)
+    days_in_month = calendar.monthrange(target_date.year, target_date.month)[1]
+
+    if not names:
+        return {
+            'date': target_date.strftime('%Y-%m-%d'),
+            'currency': currency,
+            'forecast': {'month': target_date.strftime('%Y-%m'), 'total': 0.0, 'month_to_date': 0.0},
+            'anomalies': []
+        }
+
+    scores = detect_anomalies(matrix, target_day, window, z_threshold, min_delta, method, alpha)
+    forecast = forecast_month_end(matrix, month_start_day, target_day, days_in_month, window, alpha)
+
+    flagged = np.flatnonzero(scores['flagged'])
+    order = flagged[np.argsort(-np.abs(scores['actual'][flagged] - scores['expected'][flagged]), kind='stable')]
+    anomalies = [
+        {
+            'name': names[index],
+            'cost': float(scores['actual'][index]),
+            'expected': float(scores['expected'][index]),
+            # None when the history was flat
+            'z': float(scores['z'][index]) if np.isfinite(scores['z'][index]) else None
+        }
+        for index in order
+    ]
+    if anomalies:
+        logger.info(f"{len(anomalies)} cost anomalies on {target_date} among {len(names)} services")
+
+    return {
+        'date': target_date.strftime('%Y-%m-%d'),
+        'currency': currency,
+        'forecast': {
+            'month': target_date.strftime('%Y-%m'),
+            'total': float(forecast.sum()),
+            'month_to_date': float(matrix[:, month_start_day:target_day + 1].sum())
+        },
+        'anomalies': anomalies
+    }
+
+
+class CostAnalyzer:
+    """
+    Pipeline stage adding a month-end forecast and cost anomalies to billing information
+    """
+    def __init__(self, lookback_days: int = DEFAULT_LOOKBACK_DAYS, window: int = DEFAULT_WINDOW_DAYS,
+                 z_threshold: float = DEFAULT_Z_THRESHOLD, min_delta: float = DEFAULT_MIN_DELTA,
+                 method: str = 'zscore', alpha: float = DEFAULT_EWMA_ALPHA):
+        """
+        Initialize
+
+        Args:
+            lookback_days: Days of daily costs queried, including today
+            window: Trailing days used as the baseline
+            z_threshold: Minimum absolute z-score of an anomaly
+            min_delta: Minimum absolute cost difference of an anomaly, in the billing currency
+            method: 'zscore' or 'ewma'
+            alpha: EWMA smoothing factor
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown anomaly method: {method}. Use one of {', '.join(METHODS)}")
+        if window < 2 or lookback_days < window + 2:
+            raise ValueError("Anomaly window must be at least 2 days and lookback at least window + 2 days")
+        self.lookback_days = lookback_days
+        self.window = window
+        self.z_threshold = z_threshold
+        self.min_delta = min_delta
+        self.method = method
+        self.alpha = alpha
+
+    def analyze(self, gcp_client: Any) -> Dict[str, Any]:
+        """
+        Query the daily cost series and analyze it
+
+        Args:
+            gcp_client: GCPBillingClient
+
+        Returns:
+            Analysis from analyze_daily_costs
+        """
+        rows = gcp_client.get_daily_cost_series(self.lookback_days)
+        return analyze_daily_costs(
+            rows, datetime.now().date(), self.lookback_days, self.window, self.z_threshold,
+            self.min_delta, self.method, self.alpha
+        )
+
+
+def create_cost_analyzer_from_env() -> Optional[CostAnalyzer]:
+    """
+    Create the cost analyzer from environment variables
+
+    Returns:
+        CostAnalyzer, or None unless ANOMALY_DETECTION is true
+    """
+    if os.environ.get('ANOMALY_DETECTION', '').lower() != 'true':
+        return None
+    try:
+        return CostAnalyzer(
+            lookback_days=int(os.environ.get('ANOMALY_LOOKBACK_DAYS', DEFAULT_LOOKBACK_DAYS)),
+            window=int(os.environ.get('ANOMALY_WINDOW_DAYS', DEFAULT_WINDOW_DAYS)),
+            z_threshold=float(os.environ.get('ANOMALY_Z_THRESHOLD', DEFAULT_Z_THRESHOLD)),
+            min_delta=float(os.environ.get('ANOMALY_MIN_DELTA', DEFAULT_MIN_DELTA)),
+            method=os.environ.get('ANOMALY_METHOD', 'zscore').lower()
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid anomaly detection configuration: {str(e)}")
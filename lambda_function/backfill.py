@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Backfill monthly billing reports for a range of closed months
+
+All pending months are computed with one grouped BigQuery query (or one
+per batch) and written to a report archive, one entry per month. Months
+already in the archive are skipped, so an interrupted backfill resumes
+where it stopped.
+
+Usage:
+    python lambda_function/backfill.py --start 2024-01 --end 2024-12 [--archive ./reports]
+        [--format json|parquet] [--batch-months 6] [--notify] [--force] [--dry-run]
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from billing_model import to_plain
+from state_store import StateStore, create_state_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_URL = '/tmp/billing_reports'  # Lambda's writable directory
+ARCHIVE_FORMATS = ('json', 'parquet')
+
+# Columns of the per-service rows of a Parquet report, in file order
+PARQUET_SERVICE_COLUMNS = ('service_name', 'cost', 'gross_cost', 'credits')
+
+
+class ReportArchive(ABC):
+    """
+    Storage of monthly reports, addressed by billing account and month
+    """
+    @abstractmethod
+    def exists(self, account_id: str, year: int, month: int) -> bool:
+        """
+        Check whether the report of a month is archived
+        """
+
+    @abstractmethod
+    def get(self, account_id: str, year: int, month: int) -> Optional[Dict[str, Any]]:
+        """
+        Read an archived report
+
+        Args:
+            account_id: Billing account ID
+            year: Year
+            month: Month
+
+        Returns:
+            Billing information, or None if the month is not archived
+        """
+
+    @abstractmethod
+    def put(self, account_id: str, billing_data: Dict[str, Any]) -> None:
+        """
+        Archive the report of a month, replacing any previous one
+
+        Args:
+            account_id: Billing account ID
+            billing_data: Billing information from GCPBillingClient.get_cost_for_months
+        """
+
+
+class JsonReportArchive(ReportArchive):
+    """
+    Reports as JSON documents in a state store (local directory or S3)
+    """
+    def __init__(self, store: StateStore):
+        """
+        Initialize
+
+        Args:
+            store: State store holding the documents
+        """
+        self.store = store
+
+    @staticmethod
+    def _key(account_id: str, year: int, month: int) -> str:
+        return f"reports/{account_id}/{year}-{month:02d}"
+
+    def exists(self, account_id: str, year: int, month: int) -> bool:
+        return self.get(account_id, year, month) is not None
+
+    def get(self, account_id: str, year: int, month: int) -> Optional[Dict[str, Any]]:
+        return self.store.get(self._key(account_id, year, month))
+
+    def put(self, account_id: str, billing_data: Dict[str, Any]) -> None:
+        self.store.put(self._key(account_id, billing_data['year'], billing_data['month']), to_plain(billing_data))
+
+
+class ParquetReportArchive(ReportArchive):
+    """
+    Reports as Parquet files in a local directory, one row per service (requires pyarrow)
+
+    Totals, credits and the period are kept in the file's key-value metadata;
+    drill-down children are not stored.
+    """
+    def __init__(self, root_dir: str):
+        """
+        Initialize
+
+        Args:
+            root_dir: Directory holding the files
+        """
+        self.root_dir = root_dir
+
+    def _path(self, account_id: str, year: int, month: int) -> str:
+        return os.path.join(self.root_dir, 'reports', account_id, f"{year}-{month:02d}.parquet")
+
+    def exists(self, account_id: str, year: int, month: int) -> bool:
+        return os.path.exists(self._path(account_id, year, month))
+
+    def get(self, account_id: str, year: int, month: int) -> Optional[Dict[str, Any]]:
+        import pyarrow.parquet as pq
+
+        path = self._path(account_id, year, month)
+        if not os.path.exists(path):
+            return None
+        table = pq.read_table(path)
+        billing_data = json.loads(table.schema.metadata[b'report'])
+        columns = table.to_pydict()
+        billing_data['services'] = [
+            {'name': name, 'cost': cost, 'gross_cost': gross_cost, 'credits': credits}
+            for name, cost, gross_cost, credits in zip(*(columns[column] for column in PARQUET_SERVICE_COLUMNS))
+        ]
+        return billing_data
+
+    def put(self, account_id: str, billing_data: Dict[str, Any]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        services = billing_data['services']
+        table = pa.table({
+            'service_name': pa.array([service['name'] for service in services], pa.string()),
+            'cost': pa.array([service['cost'] for service in services], pa.float64()),
+            'gross_cost': pa.array([service.get('gross_cost', service['cost']) for service in services], pa.float64()),
+            'credits': pa.array([service.get('credits', 0.0) for service in services], pa.float64())
+        })
+        report = {key: value for key, value in billing_data.items() if key not in ('services', 'analysis')}
+        table = table.replace_schema_metadata({'report': json.dumps(report, ensure_ascii=False)})
+
+        path = self._path(account_id, billing_data['year'], billing_data['month'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so an interrupted run never leaves a partial month behind
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+def create_report_archive(url: str, archive_format: str = 'json') -> ReportArchive:
+    """
+    Create a report archive
+
+    Args:
+        url: Local directory, or 's3://bucket/prefix' for JSON reports
+        archive_format: 'json' or 'parquet'
+
+    Returns:
+        ReportArchive
+    """
+    if archive_format == 'json':
+        return JsonReportArchive(create_state_store(url))
+    if archive_format == 'parquet':
+        if url.startswith('s3://'):
+            raise ValueError("Parquet report archives must be local directories")
+        return ParquetReportArchive(url[len('file://'):] if url.startswith('file://') else url)
+    raise ValueError(f"Unsupported report archive format: {archive_format} (use {' or '.join(ARCHIVE_FORMATS)})")
+
+
+def create_report_archive_from_env(url: Optional[str] = None,
+                                   archive_format: Optional[str] = None) -> ReportArchive:
+    """
+    Create the report archive from REPORT_ARCHIVE_URL and REPORT_ARCHIVE_FORMAT
+
+    Args:
+        url: Override of REPORT_ARCHIVE_URL (optional)
+        archive_format: Override of REPORT_ARCHIVE_FORMAT (optional)
+
+    Returns:
+        ReportArchive
+    """
+    return create_report_archive(
+        url or os.environ.get('REPORT_ARCHIVE_URL') or DEFAULT_ARCHIVE_URL,
+        archive_format or os.environ.get('REPORT_ARCHIVE_FORMAT') or 'json'
+    )
+
+
+def parse_month(value: str) -> Tuple[int, int]:
+    """
+    Parse 'YYYY-MM' into (year, month)
+    """
+    try:
+        parsed = datetime.strptime(str(value), '%Y-%m')
+    except ValueError:
+        raise ValueError(f"Invalid month '{value}', expected YYYY-MM")
+    return parsed.year, parsed.month
+
+
+def month_range(start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """
+    List the months from start to end, both inclusive
+
+    Args:
+        start: First (year, month)
+        end: Last (year, month)
+
+    Returns:
+        List of (year, month)
+    """
+    if end < start:
+        raise ValueError(f"Backfill end {end[0]}-{end[1]:02d} is before its start {start[0]}-{start[1]:02d}")
+    months = []
+    year, month = start
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def run_backfill(gcp_client: Any, archive: ReportArchive, start: Tuple[int, int], end: Tuple[int, int],
+                 batch_months: Optional[int] = None, force: bool = False,
+                 today: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Compute and archive the reports of every closed month in a range
+
+    Args:
+        gcp_client: GCPBillingClient (in dry run mode nothing is archived)
+        archive: Report archive
+        start: First (year, month)
+        end: Last (year, month), before the current month
+        batch_months: Months per query (optional, all pending months in one query otherwise)
+        force: Recompute months that are already archived
+        today: Current date (optional, for testing)
+
+    Returns:
+        Dictionary with 'months' (all months as 'YYYY-MM'), 'queried', 'skipped' and 'reports'
+        (billing information of every archived month in the range, oldest first)
+    """
+    today = today or datetime.now()
+    if end >= (today.year, today.month):
+        raise ValueError("Backfill covers closed months only; end must be before the current month")
+    if batch_months is not None and batch_months < 1:
+        raise ValueError("Backfill batch size must be at least one month")
+
+    account_id = gcp_client.billing_account_id
+    months = month_range(start, end)
+    pending = months if force else [m for m in months if not archive.exists(account_id, *m)]
+    logger.info(f"Backfilling {len(pending)} of {len(months)} months for {account_id}")
+
+    batch_size = batch_months or len(pending) or 1
+    for index in range(0, len(pending), batch_size):
+        batch = pending[index:index + batch_size]
+        batch_reports = gcp_client.get_cost_for_months(batch)
+        if gcp_client.dry_run:
+            continue
+        # Each month is archived on its own, so a rerun resumes from the first missing month
+        for billing_data in batch_reports:
+            archive.put(account_id, billing_data)
+        logger.info(f"Archived {batch[0][0]}-{batch[0][1]:02d} to {batch[-1][0]}-{batch[-1][1]:02d}")
+
+    pending_set = set(pending)
+    reports = [] if gcp_client.dry_run else [archive.get(account_id, *m) for m in months]
+    return {
+        'months': [f"{year}-{month:02d}" for year, month in months],
+        'queried': [f"{year}-{month:02d}" for year, month in pending],
+        'skipped': [f"{year}-{month:02d}" for year, month in months if (year, month) not in pending_set],
+        'reports': [report for report in reports if report is not None]
+    }
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--start', required=True, help='First month, YYYY-MM')
+    parser.add_argument('--end', required=True, help='Last month, YYYY-MM')
+    parser.add_argument('--archive', help=f"Archive directory or s3://bucket/prefix "
+                                          f"(default: REPORT_ARCHIVE_URL or {DEFAULT_ARCHIVE_URL})")
+    parser.add_argument('--format', choices=ARCHIVE_FORMATS, help='Archive format (default: REPORT_ARCHIVE_FORMAT or json)')
+    parser.add_argument('--batch-months', type=int, help='Months per query (default: all in one query)')
+    parser.add_argument('--notify', action='store_true', help='Post a summary embed to Discord')
+    parser.add_argument('--force', action='store_true', help='Recompute months already archived')
+    parser.add_argument('--dry-run', action='store_true', help='Only estimate the bytes the query would process')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from gcp_client import create_gcp_client_from_env
+
+    gcp_client = create_gcp_client_from_env()
+    gcp_client.start_run(dry_run=args.dry_run)
+    result = run_backfill(
+        gcp_client, create_report_archive_from_env(args.archive, args.format),
+        parse_month(args.start), parse_month(args.end), args.batch_months, args.force
+    )
+    print(f"Queried {len(result['queried'])} months, skipped {len(result['skipped'])} already archived. "
+          f"Bytes processed: {gcp_client.query_stats['bytes_processed']:,}, "
+          f"estimated: {gcp_client.query_stats['estimated_bytes']:,}")
+
+    if args.notify and result['reports']:
+        from discord_client import create_discord_client_from_env
+        from exchange_rate import create_rate_provider_from_env, parse_currencies
+        from formatter import create_formatter
+
+        message_formatter = create_formatter(
+            rate_provider=create_rate_provider_from_env(),
+            currencies=parse_currencies(os.environ.get('DISPLAY_CURRENCIES'))
+        )
+        embed = message_formatter.format_backfill_summary(result['reports'])
+        if not create_discord_client_from_env().send_message("GCP Billing Backfill", embed):
+            raise SystemExit("Failed to send the backfill summary to Discord")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Compact records for the services and drill-down trees of billing summaries
+
+Records keep their fields in __slots__ instead of a per-object dict, and
+drill-down leaves carry no empty children container. The accumulator's
+tree nodes become the report's records as they are, sorted once, without
+copying them into new dicts. Names are interned, so the periods of one
+query share a single copy of every service and drill-down name.
+
+Records implement the read-only mapping protocol, so code indexing
+services as dicts (service['cost'], child.get('children')) works
+unchanged. to_dict converts a whole subtree in one call, so json_default
+serializes a service with its drill-down tree without the encoder calling
+back per node; from_plain rebuilds them.
+"""
+import copy
+import json
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class CostNode(Mapping):
+    """
+    Drill-down entry: name, net cost and optional children
+
+    While rows are accumulated, children maps dimension values to nodes;
+    sort_children turns it into a list sorted by cost in descending order.
+    """
+    __slots__ = ('name', 'cost', 'children')
+    FIELDS = ('name', 'cost', 'children')
+
+    def __init__(self, name: str, cost: float = 0.0):
+        self.name = name
+        self.cost = cost
+        self.children: Any = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None or key != 'children':
+                return value
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if key != 'children' or self.children:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Plain dict of the node and its sorted children, recursively
+        """
+        if self.children:
+            return {'name': self.name, 'cost': self.cost, 'children': _children_dicts(self.children)}
+        return {'name': self.name, 'cost': self.cost}
+
+    def child(self, value: Any) -> 'CostNode':
+        """
+        Get the child node of a dimension value, creating it on first use
+        """
+        if self.children is None:
+            self.children = {}
+        node = self.children.get(value)
+        if node is None:
+            node = self.children[value] = CostNode(node_name(value))
+        return node
+
+
+class ServiceCost(CostNode):
+    """
+    Service entry of a summary: name, net cost, gross cost, credits and optional drill-down children
+    """
+    __slots__ = ('gross_cost', 'credits')
+    FIELDS = ('name', 'cost', 'gross_cost', 'credits', 'children')
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.gross_cost = 0.0
+        self.credits = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Plain dict of the service and its sorted drill-down children, recursively
+        """
+        service = {'name': self.name, 'cost': self.cost, 'gross_cost': self.gross_cost, 'credits': self.credits}
+        if self.children:
+            service['children'] = _children_dicts(self.children)
+        return service
+
+
+def _children_dicts(children: List[CostNode]) -> List[Dict[str, Any]]:
+    # Leaves, most of a drill-down tree, are built inline instead of through a call each
+    return [
+        child.to_dict() if child.children else {'name': child.name, 'cost': child.cost}
+        for child in children
+    ]
+
+
+def node_name(value: Any) -> str:
+    """
+    Display name of a dimension value, interned
+    """
+    return '(none)' if value is None else sys.intern(str(value))
+
+
+def sort_children(children: Optional[Dict[Any, CostNode]]) -> Optional[List[CostNode]]:
+    """
+    Turn an accumulated children map into lists sorted by cost in descending order, recursively
+
+    Args:
+        children: Dimension value -> node, or an already sorted list
+
+    Returns:
+        Sorted list of the same node objects, or None without children
+    """
+    if not children:
+        return None
+    if isinstance(children, list):
+        return children
+    nodes = sorted(children.values(), key=_cost, reverse=True)
+    for node in nodes:
+        node.children = sort_children(node.children)
+    return nodes
+
+
+def _cost(node: CostNode) -> float:
+    return node.cost
+
+
+def json_default(value: Any) -> Any:
+    """
+    json.dumps default serializing records as objects (use as json.dumps(data, default=json_default))
+    """
+    if isinstance(value, CostNode):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def to_plain(billing_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert billing information to plain dicts and lists, e.g. for a JSON state store
+    """
+    return json.loads(json.dumps(billing_data, default=json_default))
+
+
+def from_plain(billing_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rebuild the service records of billing information converted by to_plain
+
+    Args:
+        billing_data: Billing information with plain dict services, e.g. loaded from a state store
+
+    Returns:
+        Copy of the billing information with ServiceCost services and CostNode drill-down entries
+    """
+    result = {key: copy.deepcopy(value) for key, value in billing_data.items() if key != 'services'}
+    result['services'] = [_node_from_plain(service, ServiceCost) for service in billing_data['services']]
+    return result
+
+
+def _node_from_plain(entry: Dict[str, Any], node_class: type) -> CostNode:
+    node = node_class(sys.intern(entry['name']))
+    node.cost = entry['cost']
+    if node_class is ServiceCost:
+        node.gross_cost = entry['gross_cost']
+        node.credits = entry['credits']
+    if entry.get('children'):
+        node.children = [_node_from_plain(child, CostNode) for child in entry['children']]
+    return node
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Warm-container cache for clients reused across Lambda invocations
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+from discord_client import AsyncDiscordClient, DiscordClient, create_discord_client_from_env
+from exchange_rate import RateProvider, create_rate_provider_from_env
+from gcp_client import GCPBillingClient, create_gcp_client_from_env
+
+logger = logging.getLogger(__name__)
+
+# Environment variables that determine how each client is built
+GCP_CONFIG_ENV_VARS = (
+    'GCP_BILLING_ACCOUNT_ID',
+    'BIGQUERY_PROJECT_ID',
+    'BIGQUERY_TABLE_ID',
+    'GCP_CREDENTIALS',
+    'BIGQUERY_PARTITION_COLUMN',
+    'BIGQUERY_PARTITION_LATE_DAYS',
+    'BIGQUERY_MAX_BYTES_BILLED',
+    'INCREMENTAL_MONTH_TO_DATE',
+    'STATE_STORE_URL',
+    'STATE_STORE_S3_ENDPOINT_URL',
+    'LATE_ARRIVAL_DAYS',
+    'BIGQUERY_PAGE_SIZE',
+    'BIGQUERY_USE_STORAGE_API',
+    'GROUP_BY_DIMENSIONS',
+    'SUMMARY_TABLE',
+    'SUMMARY_TABLE_START',
+    'SUMMARY_TABLE_REFRESH',
+    'RESULT_CACHE',
+    'RESULT_CACHE_SIZE',
+)
+DISCORD_CONFIG_ENV_VARS = (
+    'DISCORD_WEBHOOK_URL',
+    'DISCORD_CONNECT_TIMEOUT',
+    'DISCORD_READ_TIMEOUT',
+    'DISCORD_MAX_RETRIES',
+)
+EXCHANGE_RATE_CONFIG_ENV_VARS = (
+    'EXCHANGE_RATES',
+    'EXCHANGE_RATE_FILE',
+    'EXCHANGE_RATE_URL',
+    'EXCHANGE_RATE_TTL',
+    'EXCHANGE_RATE_CACHE_PATH',
+)
+
+# Survives between invocations while the Lambda container stays warm
+_cache: Dict[str, Tuple[str, Any]] = {}
+
+# Keyword arguments passed to create_gcp_client_from_env (see configure_gcp_clients)
+_gcp_client_options: Dict[str, Any] = {}
+
+
+def _config_key(env_vars: Tuple[str, ...], extra: str = '') -> str:
+    """
+    Build a cache key from the current values of the given environment variables
+
+    Args:
+        env_vars: Names of the environment variables
+        extra: Additional configuration the client depends on
+
+    Returns:
+        Hex digest of the variable values
+    """
+    digest = hashlib.sha256(extra.encode('utf-8'))
+    for name in env_vars:
+        digest.update(name.encode('utf-8'))
+        digest.update(b'=')
+        digest.update(os.environ.get(name, '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _get_or_create(name: str, env_vars: Tuple[str, ...], factory: Callable[[], Any],
+                   extra: str = '') -> Tuple[Any, bool]:
+    """
+    Return the cached client for name, creating it when missing or when its config changed
+
+    Args:
+        name: Cache slot name
+        env_vars: Environment variables the client depends on
+        factory: Function building a new client
+        extra: Additional configuration the client depends on
+
+    Returns:
+        Tuple of (client, True if it was reused from the cache)
+    """
+    key = _config_key(env_vars, extra)
+    cached = _cache.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1], True
+
+    if cached is not None:
+        logger.info(f"Configuration for cached {name} client changed. Rebuilding.")
+    with metrics.span('client_construction'):
+        client = factory()
+    _cache[name] = (key, client)
+    return client, False
+
+
+def get_gcp_client(account: Optional[Dict[str, Any]] = None) -> Tuple[GCPBillingClient, bool]:
+    """
+    Get the GCPBillingClient for the current environment, reusing it on warm invocations
+
+    Args:
+        account: Account configuration from accounts.load_account_configs_from_env (optional)
+
+    Returns:
+        Tuple of (GCPBillingClient, True if it was reused from the cache)
+    """
+    if account is None:
+        name, extra = 'gcp', ''
+
+        def factory() -> GCPBillingClient:
+            return create_gcp_client_from_env(**_gcp_client_options)
+    else:
+        name = f"gcp:{account['name']}"
+        extra = json.dumps(account, sort_keys=True)
+
+        def factory() -> GCPBillingClient:
+            return create_gcp_client_from_env(
+                account['billing_account_id'], account.get('bigquery_project_id'), account['bigquery_table_id'],
+                **_gcp_client_options
+            )
+    client, reused = _get_or_create(name, GCP_CONFIG_ENV_VARS, factory, extra)
+    if reused:
+        client.refresh_credentials_if_expired()
+    return client, reused
+
+
+def configure_gcp_clients(credentials: Any = None, bigquery_client: Any = None) -> None:
+    """
+    Build GCP clients with the given credentials and BigQuery client, e.g. local stand-ins
+
+    Cached GCP clients are dropped, so the next invocation builds them with
+    the new settings. Call without arguments to go back to the environment.
+
+    Args:
+        credentials: GCP credentials object (optional)
+        bigquery_client: BigQuery client shared by every GCP client (optional)
+    """
+    _gcp_client_options.clear()
+    if credentials is not None:
+        _gcp_client_options['credentials'] = credentials
+    if bigquery_client is not None:
+        _gcp_client_options['bigquery_client'] = bigquery_client
+    for name in [name for name in _cache if name == 'gcp' or name.startswith('gcp:')]:
+        del _cache[name]
+
+
+def get_discord_client(webhook_url: Optional[str] = None) -> Tuple[DiscordClient, bool]:
+    """
+    Get the DiscordClient for the current environment, reusing its HTTP session on warm invocations
+
+    Args:
+        webhook_url: Discord webhook URL (optional, DISCORD_WEBHOOK_URL otherwise)
+
+    Returns:
+        Tuple of (DiscordClient, True if it was reused from the cache)
+    """
+    if not webhook_url:
+        return _get_or_create('discord', DISCORD_CONFIG_ENV_VARS, create_discord_client_from_env)
+    return _get_or_create(
+        f"discord:{hashlib.sha256(webhook_url.encode('utf-8')).hexdigest()}", DISCORD_CONFIG_ENV_VARS,
+        lambda: create_discord_client_from_env(webhook_url), webhook_url
+    )
+
+
+def get_async_discord_client() -> Tuple[AsyncDiscordClient, bool]:
+    """
+    Get the AsyncDiscordClient for the asyncio handler, reusing its aiohttp session on warm invocations
+
+    Returns:
+        Tuple of (AsyncDiscordClient, True if it was reused from the cache)
+    """
+    return _get_or_create(
+        'discord_async', DISCORD_CONFIG_ENV_VARS, lambda: create_discord_client_from_env(asynchronous=True)
+    )
+
+
+def get_rate_provider() -> Tuple[Optional[RateProvider], bool]:
+    """
+    Get the exchange rate provider, keeping its in-memory rate cache across warm invocations
+
+    Returns:
+        Tuple of (RateProvider or None if not configured, True if it was reused from the cache)
+    """
+    return _get_or_create('exchange_rate', EXCHANGE_RATE_CONFIG_ENV_VARS, create_rate_provider_from_env)
+
+
+def clear() -> None:
+    """
+    Drop every cached client
+    """
+    _cache.clear()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Cache of per-day, per-service billing aggregates for incremental month-to-date reports
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+
+class DailyAggregateCache:
+    """
+    Stores daily aggregates per month so that only days which can still change are queried
+
+    A day is finalized once it is older than the late-arrival window; its
+    aggregates are then reused as-is on every later run.
+    """
+    def __init__(self, store: StateStore, late_arrival_days: int = 3):
+        """
+        Initialize
+
+        Args:
+            store: State store holding the aggregates
+            late_arrival_days: Days during which exported rows may still arrive for a usage day
+        """
+        self.store = store
+        self.late_arrival_days = late_arrival_days
+
+    def _key(self, billing_account_id: str, table_id: str, month_start: date, variant: str) -> str:
+        month = month_start.strftime('%Y-%m')
+        if variant:
+            return f"daily/{billing_account_id}/{table_id}/{variant.replace('/', '_')}/{month}"
+        return f"daily/{billing_account_id}/{table_id}/{month}"
+
+    def load(self, billing_account_id: str, table_id: str, month_start: date, variant: str = '') -> Dict[str, Any]:
+        """
+        Load the cached aggregates of a month
+
+        Args:
+            billing_account_id: GCP billing account ID
+            table_id: BigQuery table ID
+            month_start: First day of the month
+            variant: Query shape the rows were produced with, e.g. the drill-down dimensions
+
+        Returns:
+            Dictionary with 'finalized_through' ('YYYY-MM-DD' or None) and
+            'days' mapping 'YYYY-MM-DD' to lists of rows
+        """
+        state = self.store.get(self._key(billing_account_id, table_id, month_start, variant))
+        if not state:
+            return {'finalized_through': None, 'days': {}}
+        return state
+
+    def first_day_to_query(self, state: Dict[str, Any], month_start: date) -> date:
+        """
+        Get the first day whose aggregates are not finalized yet
+
+        Args:
+            state: Cached month state from load()
+            month_start: First day of the month
+
+        Returns:
+            First day to query
+        """
+        finalized_through = state.get('finalized_through')
+        if not finalized_through:
+            return month_start
+        return max(month_start, datetime.strptime(finalized_through, '%Y-%m-%d').date() + timedelta(days=1))
+
+    def merge(self, state: Dict[str, Any], query_start: date, rows: List[Dict[str, Any]], today: date,
+              month_start: date) -> Dict[str, Any]:
+        """
+        Replace the aggregates from query_start on with freshly queried rows
+
+        Args:
+            state: Cached month state from load()
+            query_start: First day that was queried
+            rows: Queried rows with 'usage_date', 'service_name', cost and credit columns,
+                  'currency' and any drill-down columns
+            today: Current date
+            month_start: First day of the month
+
+        Returns:
+            Updated month state
+        """
+        query_start_str = query_start.strftime('%Y-%m-%d')
+        days = {day: day_rows for day, day_rows in state.get('days', {}).items() if day < query_start_str}
+        for row in rows:
+            usage_date = row['usage_date']
+            day = usage_date.strftime('%Y-%m-%d') if isinstance(usage_date, date) else str(usage_date)
+            cached_row = {key: value for key, value in row.items() if key not in ('period_index', 'usage_date')}
+            days.setdefault(day, []).append(cached_row)
+
+        finalized_through: Optional[date] = today - timedelta(days=self.late_arrival_days + 1)
+        if finalized_through < month_start:
+            finalized_through = None
+        return {
+            'finalized_through': finalized_through.strftime('%Y-%m-%d') if finalized_through else None,
+            'days': days
+        }
+
+    def save(self, billing_account_id: str, table_id: str, month_start: date, state: Dict[str, Any],
+             variant: str = '') -> None:
+        """
+        Save the aggregates of a month
+
+        Args:
+            billing_account_id: GCP billing account ID
+            table_id: BigQuery table ID
+            month_start: First day of the month
+            state: Month state from merge()
+            variant: Query shape the rows were produced with, e.g. the drill-down dimensions
+        """
+        self.store.put(self._key(billing_account_id, table_id, month_start, variant), state)
+
+    @staticmethod
+    def rows(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Flatten the cached days into one list of rows
+
+        Args:
+            state: Month state
+
+        Returns:
+            List of rows with 'service_name', cost and credit columns, 'currency' and any drill-down columns
+        """
+        return [row for day_rows in state.get('days', {}).values() for row in day_rows]
@@ -2,70 +2,528 @@
 """
 Client for sending messages to Discord
 """
+import asyncio
 import json
 import logging
 import os
-from typing import Any, Dict, Optional
+import random
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
 
 logger = logging.getLogger(__name__)
 
+# Discord allows at most 10 embeds per message
+MAX_EMBEDS_PER_MESSAGE = 10
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10.0
+DEFAULT_MAX_RETRIES = 5
+
+# Exponential backoff for 5xx responses and connection errors (seconds)
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+# Time kept in reserve before the Lambda deadline (seconds)
+DEADLINE_MARGIN = 1.0
+
+
 class DiscordClient:
     """
     Discord client class
     """
-    def __init__(self, webhook_url: str):
+    def __init__(self, webhook_url: str, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                 pool_size: int = 10):
         """
         Initialize
-        
+
         Args:
             webhook_url: Discord webhook URL
+            connect_timeout: Connect timeout in seconds
+            read_timeout: Read timeout in seconds
+            max_retries: Maximum retries of a rate limited or failed request
+            pool_size: Keep-alive connections kept for concurrent sends
         """
         self.webhook_url = webhook_url
-        
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        # Keep-alive session reused across warm Lambda invocations
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+        # Monotonic time after which no more retries are attempted
+        self.deadline: Optional[float] = None
+        # Rate limit bucket state from the last X-RateLimit-* headers
+        self._rate_limit_lock = threading.Lock()
+        self._rate_limit_remaining: Optional[int] = None
+        self._rate_limit_reset_at: Optional[float] = None
+
+    def start_run(self, context: Any = None) -> None:
+        """
+        Set the retry deadline for an invocation from the Lambda context
+
+        Args:
+            context: Lambda context (optional, no deadline without it)
+        """
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            self.deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000.0 - DEADLINE_MARGIN
+        else:
+            self.deadline = None
+
     def send_message(self, message: str, embed: Optional[Dict[str, Any]] = None) -> bool:
         """
         Send message to Discord
-        
+
         Args:
             message: Message to send
             embed: Embed message (optional)
-            
+
         Returns:
             True if successful, False if failed
         """
         payload = {
             'content': message
         }
-        
+
         if embed:
             payload['embeds'] = [embed]
-            
-        headers = {
-            'Content-Type': 'application/json'
-        }
-        
+
+        return self._post(payload)
+
+    def send_embeds(self, message: str, embeds: List[Dict[str, Any]]) -> bool:
+        """
+        Send embeds to Discord using as few messages as possible
+
+        Up to 10 embeds are sent per message; the message text is attached to the first one.
+
+        Args:
+            message: Message to send
+            embeds: Embed messages
+
+        Returns:
+            True if every message was sent, False if any failed
+        """
+        if not embeds:
+            return self.send_message(message)
+
+        for index in range(0, len(embeds), MAX_EMBEDS_PER_MESSAGE):
+            payload = {'embeds': embeds[index:index + MAX_EMBEDS_PER_MESSAGE]}
+            if index == 0:
+                payload['content'] = message
+            if not self._post(payload):
+                return False
+        return True
+
+    def send_embed_pages(self, message: str, pages: List[List[Dict[str, Any]]]) -> bool:
+        """
+        Send pre-packed messages of embeds, e.g. from DiscordMessageFormatter.format_billing_data_pages
+
+        Args:
+            message: Message to send with the first page
+            pages: List of messages, each a list of embeds within Discord's limits
+
+        Returns:
+            True if every message was sent, False if any failed
+        """
+        for payload in self.page_payloads(message, pages):
+            if not self._post(payload):
+                return False
+        return True
+
+    @staticmethod
+    def page_payloads(message: str, pages: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Build the webhook payloads of pre-packed pages, the message text attached to the first one
+        """
+        payloads = []
+        for index, embeds in enumerate(pages):
+            payload: Dict[str, Any] = {'embeds': embeds}
+            if index == 0:
+                payload['content'] = message
+            payloads.append(payload)
+        return payloads
+
+    def post_message(self, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        POST a payload with ?wait=true, so Discord returns the created message
+
+        Args:
+            payload: Webhook payload
+
+        Returns:
+            ID of the created message, or None if failed
+        """
+        response = self._request('POST', self._webhook_url(wait='true'), payload)
+        if response is None or not response.ok:
+            return None
+        try:
+            return str(response.json()['id'])
+        except (ValueError, KeyError, TypeError):
+            logger.error(f"Discord returned no message ID: {response.text}")
+            return None
+
+    def edit_message(self, message_id: str, payload: Dict[str, Any]) -> Optional[bool]:
+        """
+        Replace the content and embeds of a message sent through the webhook
+
+        Args:
+            message_id: ID from post_message
+            payload: Webhook payload
+
+        Returns:
+            True if edited, None if the message no longer exists, False if failed
+        """
+        response = self._request('PATCH', self._webhook_url(f"/messages/{message_id}"), payload,
+                                 missing_ok=True)
+        if response is not None and response.status_code == 404:
+            return None
+        return response is not None and response.ok
+
+    def delete_message(self, message_id: str) -> bool:
+        """
+        Delete a message sent through the webhook (a message that no longer exists counts as deleted)
+
+        Args:
+            message_id: ID from post_message
+
+        Returns:
+            True if successful, False if failed
+        """
+        response = self._request('DELETE', self._webhook_url(f"/messages/{message_id}"), missing_ok=True)
+        return response is not None and (response.ok or response.status_code == 404)
+
+    def _webhook_url(self, path: str = '', **params: str) -> str:
+        """
+        Webhook URL with a path appended and query parameters added, keeping e.g. thread_id
+        """
+        parts = urlsplit(self.webhook_url)
+        query = dict(parse_qsl(parts.query), **params)
+        return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip('/') + path, urlencode(query), ''))
+
+    def _post(self, payload: Dict[str, Any]) -> bool:
+        """
+        POST a payload to the webhook, honoring rate limits and retrying transient failures
+
+        Args:
+            payload: Webhook payload
+
+        Returns:
+            True if successful, False if failed
+        """
+        response = self._request('POST', self.webhook_url, payload)
+        return response is not None and response.ok
+
+    def _request(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None,
+                 missing_ok: bool = False) -> Optional[requests.Response]:
+        """
+        Send a webhook request, honoring rate limits and retrying transient failures
+
+        Args:
+            method: HTTP method
+            url: Webhook URL, or the URL of one of its messages
+            payload: Webhook payload (optional)
+            missing_ok: Return a 404 response without logging it as an error
+
+        Returns:
+            Final response (successful, or failed without retry), or None if no response was received
+        """
+        data = json.dumps(payload) if payload is not None else None
+        for attempt in range(self.max_retries + 1):
+            if not self._wait(self._rate_limit_delay()):
+                logger.error("Discord rate limit resets after the Lambda deadline. Giving up.")
+                return None
+
+            try:
+                with metrics.span('discord_post'):
+                    response = self.session.request(method, url, data=data, timeout=self.timeout)
+                metrics.add('discord_requests', 1)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Error sending message to Discord (attempt {attempt + 1}): {str(e)}")
+                if attempt < self.max_retries and self._wait(self._backoff_delay(attempt)):
+                    continue
+                logger.error(f"Error sending message to Discord: {str(e)}")
+                return None
+
+            self._update_rate_limit(response)
+
+            if response.status_code == 429:
+                retry_after = self._retry_after(response.text, response.headers)
+                logger.warning(f"Rate limited by Discord. Retrying after {retry_after:.2f}s")
+                if attempt < self.max_retries and self._wait(retry_after):
+                    continue
+            elif response.status_code >= 500:
+                logger.warning(f"Discord server error {response.status_code} (attempt {attempt + 1})")
+                if attempt < self.max_retries and self._wait(self._backoff_delay(attempt)):
+                    continue
+            elif response.ok:
+                logger.info(f"Message sent to Discord successfully ({method}). Status: {response.status_code}")
+                return response
+            elif response.status_code == 404 and missing_ok:
+                logger.warning(f"Discord message not found ({method} {urlsplit(url).path.rsplit('/', 1)[-1]})")
+                return response
+
+            logger.error(f"Error sending message to Discord. Status: {response.status_code}")
+            logger.error(f"Discord API response: {response.text}")
+            return response
+        return None
+
+    def _update_rate_limit(self, response: requests.Response) -> None:
+        """
+        Record the bucket state from X-RateLimit-* response headers
+        """
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset_after = response.headers.get('X-RateLimit-Reset-After')
+        if remaining is None or reset_after is None:
+            return
+        try:
+            remaining_count = int(remaining)
+            reset_at = time.monotonic() + float(reset_after)
+        except ValueError:
+            return
+        with self._rate_limit_lock:
+            self._rate_limit_remaining = remaining_count
+            self._rate_limit_reset_at = reset_at
+
+    def _rate_limit_delay(self) -> float:
+        """
+        Seconds to wait before the next request so the bucket is not exhausted
+        """
+        with self._rate_limit_lock:
+            if self._rate_limit_remaining is None or self._rate_limit_remaining > 0:
+                return 0.0
+            delay = self._rate_limit_reset_at - time.monotonic()
+            if delay <= 0:
+                self._rate_limit_remaining = None
+                return 0.0
+            return delay
+
+    @staticmethod
+    def _retry_after(body: str, headers: Mapping[str, str]) -> float:
+        """
+        Seconds to wait after a 429 response, from its body or Retry-After header
+        """
         try:
-            response = requests.post(self.webhook_url, data=json.dumps(payload), headers=headers)
-            response.raise_for_status()  # Raise exception for HTTP errors
-            logger.info(f"Message sent to Discord successfully. Status: {response.status_code}")
+            return float(json.loads(body)['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return float(headers.get('Retry-After', 1.0))
+        except ValueError:
+            return 1.0
+
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """
+        Exponential backoff with full jitter
+        """
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    def _wait(self, delay: float) -> bool:
+        """
+        Sleep for delay seconds unless that would pass the deadline
+
+        Returns:
+            True if it slept (or there was nothing to wait for), False if the deadline would be passed
+        """
+        if delay <= 0:
+            return True
+        if self.deadline is not None and time.monotonic() + delay > self.deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+
+class AsyncDiscordClient(DiscordClient):
+    """
+    Discord client sending through aiohttp for the asyncio handler
+
+    Shares the rate limit, retry and deadline handling of DiscordClient.
+    The aiohttp session is bound to the event loop it was opened on and is
+    kept alive across warm invocations that reuse that loop. Without aiohttp
+    installed, sends fall back to the requests session on a worker thread.
+    """
+    def __init__(self, webhook_url: str, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                 pool_size: int = 10):
+        super().__init__(webhook_url, connect_timeout, read_timeout, max_retries, pool_size)
+        self.pool_size = pool_size
+        self._async_session = None
+        self._async_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_async_session(self):
+        """
+        aiohttp session of the running event loop, opened on first use (None without aiohttp)
+        """
+        try:
+            import aiohttp
+        except ImportError:
+            return None
+
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_session.closed or self._async_session_loop is not loop:
+            connect_timeout, read_timeout = self.timeout
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+                headers={'Content-Type': 'application/json'}
+            )
+            self._async_session_loop = loop
+        return self._async_session
+
+    async def warm_up(self) -> None:
+        """
+        Open the keep-alive connection to the webhook host, e.g. while the billing query runs
+
+        Failures are only logged; the first send opens the connection instead. The GET
+        route has its own rate limit bucket, so its headers are not applied to sends.
+        """
+        session = self._get_async_session()
+        if session is None:
+            return
+        try:
+            with metrics.span('discord_warm_up'):
+                async with session.get(self.webhook_url) as response:
+                    await response.read()
+        except Exception as e:
+            logger.warning(f"Discord connection warm-up failed: {str(e)}")
+
+    async def send_message_async(self, message: str, embed: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Send message to Discord without blocking the event loop
+
+        Args:
+            message: Message to send
+            embed: Embed message (optional)
+
+        Returns:
+            True if successful, False if failed
+        """
+        payload: Dict[str, Any] = {'content': message}
+        if embed:
+            payload['embeds'] = [embed]
+        return await self._post_async(payload)
+
+    async def send_embed_pages_async(self, message: str, pages: List[List[Dict[str, Any]]]) -> bool:
+        """
+        Send pre-packed messages of embeds without blocking the event loop
+
+        Args:
+            message: Message to send with the first page
+            pages: List of messages, each a list of embeds within Discord's limits
+
+        Returns:
+            True if every message was sent, False if any failed
+        """
+        for payload in self.page_payloads(message, pages):
+            if not await self._post_async(payload):
+                return False
+        return True
+
+    async def close(self) -> None:
+        """
+        Close the aiohttp session
+        """
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+
+    async def _post_async(self, payload: Dict[str, Any]) -> bool:
+        """
+        Asynchronous counterpart of _post with the same retry semantics
+
+        Args:
+            payload: Webhook payload
+
+        Returns:
+            True if successful, False if failed
+        """
+        session = self._get_async_session()
+        if session is None:
+            return await asyncio.get_running_loop().run_in_executor(None, self._post, payload)
+
+        import aiohttp
+
+        data = json.dumps(payload)
+        for attempt in range(self.max_retries + 1):
+            if not await self._wait_async(self._rate_limit_delay()):
+                logger.error("Discord rate limit resets after the Lambda deadline. Giving up.")
+                return False
+
+            try:
+                with metrics.span('discord_post'):
+                    async with session.post(self.webhook_url, data=data) as response:
+                        status = response.status
+                        body = await response.text()
+                metrics.add('discord_requests', 1)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Error sending message to Discord (attempt {attempt + 1}): {str(e)}")
+                if attempt < self.max_retries and await self._wait_async(self._backoff_delay(attempt)):
+                    continue
+                logger.error(f"Error sending message to Discord: {str(e)}")
+                return False
+
+            self._update_rate_limit(response)
+
+            if status == 429:
+                retry_after = self._retry_after(body, response.headers)
+                logger.warning(f"Rate limited by Discord. Retrying after {retry_after:.2f}s")
+                if attempt < self.max_retries and await self._wait_async(retry_after):
+                    continue
+            elif status >= 500:
+                logger.warning(f"Discord server error {status} (attempt {attempt + 1})")
+                if attempt < self.max_retries and await self._wait_async(self._backoff_delay(attempt)):
+                    continue
+            elif status < 400:
+                logger.info(f"Message sent to Discord successfully. Status: {status}")
+                return True
+
+            logger.error(f"Error sending message to Discord. Status: {status}")
+            logger.error(f"Discord API response: {body}")
+            return False
+        return False
+
+    async def _wait_async(self, delay: float) -> bool:
+        """
+        Asynchronous counterpart of _wait, yielding to other tasks while it sleeps
+        """
+        if delay <= 0:
             return True
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error sending message to Discord: {str(e)}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"Discord API response: {e.response.text}")
+        if self.deadline is not None and time.monotonic() + delay > self.deadline:
             return False
+        await asyncio.sleep(delay)
+        return True
 
-def create_discord_client_from_env() -> DiscordClient:
+
+def create_discord_client_from_env(webhook_url: Optional[str] = None, asynchronous: bool = False) -> DiscordClient:
     """
     Create Discord client from environment variables
-    
+
+    Args:
+        webhook_url: Discord webhook URL (optional, overrides DISCORD_WEBHOOK_URL)
+        asynchronous: Create an AsyncDiscordClient for the asyncio handler
+
     Returns:
         DiscordClient
     """
-    webhook_url = os.environ.get('DISCORD_WEBHOOK_URL')
+    webhook_url = webhook_url or os.environ.get('DISCORD_WEBHOOK_URL')
     if not webhook_url:
         raise ValueError("Environment variable 'DISCORD_WEBHOOK_URL' is not set")
-        
-    return DiscordClient(webhook_url)
+
+    try:
+        connect_timeout = float(os.environ.get('DISCORD_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT))
+        read_timeout = float(os.environ.get('DISCORD_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))
+        max_retries = int(os.environ.get('DISCORD_MAX_RETRIES', DEFAULT_MAX_RETRIES))
+    except ValueError:
+        raise ValueError("DISCORD_CONNECT_TIMEOUT, DISCORD_READ_TIMEOUT and DISCORD_MAX_RETRIES must be numbers")
+
+    client_class = AsyncDiscordClient if asynchronous else DiscordClient
+    return client_class(webhook_url, connect_timeout, read_timeout, max_retries)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Exchange rate providers for converting billing costs to display currencies
+"""
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 12 * 60 * 60
+DEFAULT_CACHE_PATH = '/tmp/exchange_rates.json'  # Lambda's writable directory
+DEFAULT_TIMEOUT = (3.05, 5.0)
+
+
+class RateProvider(ABC):
+    """
+    Source of exchange rates from a base currency
+    """
+    @abstractmethod
+    def get_rates(self, base: str) -> Dict[str, float]:
+        """
+        Get the rates from a base currency
+
+        Args:
+            base: Currency code, e.g. 'USD'
+
+        Returns:
+            Dictionary mapping currency code to the amount of it per unit of base
+        """
+
+
+class StaticRateProvider(RateProvider):
+    """
+    Fixed rates, e.g. an override from the environment
+    """
+    def __init__(self, rates: Dict[str, Dict[str, float]]):
+        """
+        Initialize
+
+        Args:
+            rates: Base currency -> {currency: rate}
+        """
+        self.rates = _parse_rates(rates)
+
+    def get_rates(self, base: str) -> Dict[str, float]:
+        rates = self.rates.get(base)
+        if rates is None:
+            raise ValueError(f"No exchange rates configured for {base}")
+        return rates
+
+
+class FileRateProvider(RateProvider):
+    """
+    Rates read once from a JSON file of base currency -> {currency: rate}
+    """
+    def __init__(self, path: str):
+        """
+        Initialize
+
+        Args:
+            path: Path of the JSON file
+        """
+        self.path = path
+        self._rates: Optional[Dict[str, Dict[str, float]]] = None
+
+    def get_rates(self, base: str) -> Dict[str, float]:
+        if self._rates is None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._rates = _parse_rates(json.load(f))
+        rates = self._rates.get(base)
+        if rates is None:
+            raise ValueError(f"No exchange rates for {base} in {self.path}")
+        return rates
+
+
+class HttpRateProvider(RateProvider):
+    """
+    Rates fetched from an HTTP API answering {"rates": {currency: rate}}
+    (or "conversion_rates") for a base currency
+    """
+    def __init__(self, url: str, timeout: Tuple[float, float] = DEFAULT_TIMEOUT):
+        """
+        Initialize
+
+        Args:
+            url: URL with a '{base}' placeholder, e.g. 'https://open.er-api.com/v6/latest/{base}'
+            timeout: (connect, read) timeouts in seconds
+        """
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def get_rates(self, base: str) -> Dict[str, float]:
+        response = self.session.get(self.url.format(base=base), timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        rates = body.get('rates') or body.get('conversion_rates')
+        if not isinstance(rates, dict):
+            raise ValueError(f"Exchange rate response for {base} has no rates")
+        return {currency: float(rate) for currency, rate in rates.items()}
+
+
+class CachedRateProvider(RateProvider):
+    """
+    TTL cache in front of another provider, in memory and on disk
+
+    The in-memory tier serves warm invocations without any I/O; the on-disk
+    tier survives container restarts on the same host's /tmp. When a
+    refresh fails, the last cached rates are used however old they are.
+    """
+    def __init__(self, provider: RateProvider, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 cache_path: Optional[str] = DEFAULT_CACHE_PATH):
+        """
+        Initialize
+
+        Args:
+            provider: Provider fetching fresh rates
+            ttl_seconds: Seconds cached rates are used before refreshing
+            cache_path: File of the on-disk tier (None disables it)
+        """
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        # base -> {'fetched_at': epoch seconds, 'rates': {currency: rate}}
+        self._memory: Dict[str, Dict[str, Any]] = {}
+
+    def get_rates(self, base: str) -> Dict[str, float]:
+        with self._lock:
+            entry = self._memory.get(base)
+            if entry is None:
+                entry = self._read_disk().get(base)
+                if entry is not None:
+                    self._memory[base] = entry
+            if entry is not None and time.time() - entry['fetched_at'] < self.ttl_seconds:
+                return entry['rates']
+
+            try:
+                rates = self.provider.get_rates(base)
+            except Exception as e:
+                if entry is None:
+                    raise
+                logger.warning(f"Failed to refresh {base} exchange rates: {str(e)}. Using cached rates.")
+                return entry['rates']
+
+            self._memory[base] = {'fetched_at': time.time(), 'rates': rates}
+            self._write_disk()
+            return rates
+
+    def _read_disk(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Read the on-disk tier (empty when missing or unreadable)
+        """
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_disk(self) -> None:
+        """
+        Write the in-memory tier to disk atomically, keeping other bases already on disk
+        """
+        if not self.cache_path:
+            return
+        entries = dict(self._read_disk(), **self._memory)
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to write exchange rate cache {self.cache_path}: {str(e)}")
+
+
+def _parse_rates(rates: Any) -> Dict[str, Dict[str, float]]:
+    """
+    Validate base currency -> {currency: rate} mappings
+    """
+    if not isinstance(rates, dict) or not all(isinstance(value, dict) for value in rates.values()):
+        raise ValueError("Exchange rates must map base currencies to {currency: rate} objects")
+    try:
+        return {
+            base: {currency: float(rate) for currency, rate in quotes.items()}
+            for base, quotes in rates.items()
+        }
+    except (TypeError, ValueError):
+        raise ValueError("Exchange rates must be numbers")
+
+
+def parse_currencies(value: Optional[str]) -> List[str]:
+    """
+    Parse a comma-separated list of display currencies ('JPY' when empty)
+    """
+    currencies = [currency.strip().upper() for currency in (value or '').split(',') if currency.strip()]
+    return currencies or ['JPY']
+
+
+def create_rate_provider_from_env() -> Optional[RateProvider]:
+    """
+    Create the exchange rate provider from environment variables
+
+    EXCHANGE_RATES (JSON override) takes precedence over EXCHANGE_RATE_FILE,
+    which takes precedence over EXCHANGE_RATE_URL. HTTP rates are cached for
+    EXCHANGE_RATE_TTL seconds in memory and in EXCHANGE_RATE_CACHE_PATH.
+
+    Returns:
+        RateProvider, or None if no source is configured
+    """
+    override = os.environ.get('EXCHANGE_RATES')
+    if override:
+        try:
+            return StaticRateProvider(json.loads(override))
+        except json.JSONDecodeError:
+            raise ValueError("Invalid EXCHANGE_RATES JSON in environment variable")
+
+    path = os.environ.get('EXCHANGE_RATE_FILE')
+    if path:
+        return FileRateProvider(path)
+
+    url = os.environ.get('EXCHANGE_RATE_URL')
+    if url:
+        try:
+            ttl_seconds = float(os.environ.get('EXCHANGE_RATE_TTL', DEFAULT_TTL_SECONDS))
+        except ValueError:
+            raise ValueError("Environment variable 'EXCHANGE_RATE_TTL' must be a number")
+        cache_path = os.environ.get('EXCHANGE_RATE_CACHE_PATH', DEFAULT_CACHE_PATH)
+        return CachedRateProvider(HttpRateProvider(url), ttl_seconds, cache_path or None)
+    return None
@@ -3,97 +3,488 @@
 Formatter for converting billing information to Discord message format
 """
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from exchange_rate import RateProvider
 
 logger = logging.getLogger(__name__)
 
+# Discord embed limits (characters unless noted)
+MAX_TITLE_LENGTH = 256
+MAX_DESCRIPTION_LENGTH = 4096
+MAX_FIELD_NAME_LENGTH = 256
+MAX_FIELD_VALUE_LENGTH = 1024
+MAX_FIELDS_PER_EMBED = 25
+MAX_EMBED_TOTAL_LENGTH = 6000
+MAX_EMBEDS_PER_MESSAGE = 10
+# The 6000 character limit also applies to the sum of all embeds in one message
+MAX_MESSAGE_EMBEDS_LENGTH = 6000
+
+FOOTER_TEXT = "GCP Billing Notifier"
+CONTINUED_SUFFIX = " (continued)"
+
+# Anomalous services listed before the rest are summarized
+MAX_ANOMALIES_SHOWN = 10
+
+CURRENCY_SYMBOLS = {'JPY': '¥', 'USD': '$', 'EUR': '€', 'GBP': '£', 'KRW': '₩', 'INR': '₹'}
+ZERO_DECIMAL_CURRENCIES = {'JPY', 'KRW'}
+
+# Non-breaking spaces, since Discord strips leading regular spaces
+DRILLDOWN_INDENT = "\u00a0\u00a0\u00a0"
+
+
 class DiscordMessageFormatter:
     """
     Discord message formatter class
     """
-    
-    def __init__(self, exchange_rate: float = 150.0):
+
+    def __init__(self, exchange_rate: float = 150.0, top_n: Optional[int] = None, drilldown_top_n: int = 3,
+                 rate_provider: Optional[RateProvider] = None, currencies: Optional[List[str]] = None):
         """
         Initialize
-        
+
         Args:
-            exchange_rate: USD to JPY exchange rate (default: 150.0)
+            exchange_rate: Fallback rate to JPY when no provider rate is available (default: 150.0)
+            top_n: Show only the N most expensive services plus one aggregated
+                   remainder field in paginated output (optional, all services otherwise)
+            drilldown_top_n: Top contributors shown per drill-down level (default: 3)
+            rate_provider: Source of exchange rates (optional, exchange_rate only otherwise)
+            currencies: Display currencies, primary first (default: ['JPY'])
         """
         self.exchange_rate = exchange_rate
+        self.top_n = top_n
+        self.drilldown_top_n = drilldown_top_n
+        self.rate_provider = rate_provider
+        self.currencies = currencies or ['JPY']
+
     def format_billing_data(self, billing_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Format billing information to Discord embed message format
-        
+
+        Fits in a single embed: when there are more services than fields,
+        the most expensive ones are shown and the rest are aggregated.
+
         Args:
             billing_data: Billing information
-            
+
         Returns:
             Dictionary in Discord embed message format
         """
+        # Fields left after the anomaly field; one of them is kept for the aggregated remainder
+        analysis = billing_data.get('analysis')
+        service_fields = MAX_FIELDS_PER_EMBED - (1 if analysis and analysis['anomalies'] else 0)
+        top_n = None if len(billing_data['services']) <= service_fields else service_fields - 1
+        pages = self.format_billing_data_pages(billing_data, top_n=top_n)
+        if len(pages) > 1 or len(pages[0]) > 1:
+            logger.warning("Billing data exceeds a single embed. Use format_billing_data_pages to send all of it.")
+        return pages[0][0]
+
+    def format_billing_data_pages(self, billing_data: Dict[str, Any],
+                                  top_n: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Format billing information into as few embeds and messages as Discord's limits allow
+
+        Field sizes are computed once from the strings themselves, and fields
+        are packed greedily into embeds (25 fields / 6000 characters each) and
+        messages (10 embeds / 6000 characters each).
+
+        Args:
+            billing_data: Billing information
+            top_n: Override of the formatter's top_n (optional)
+
+        Returns:
+            List of messages, each a list of Discord embeds
+        """
         year = billing_data['year']
         month = billing_data['month']
         total_cost = billing_data['total_cost']
-        currency = billing_data['currency']
+        # Rates are looked up once per report and applied while the fields are built
+        conversions = self._conversions(billing_data['currency'])
         services = billing_data['services']
-        
-        # Use as-is if currency is JPY, convert if USD
-        if currency == 'JPY':
-            total_cost_display = total_cost
-        else:
-            total_cost_display = total_cost * self.exchange_rate
-        
-        title = f"{year}年{month}月 GCP Billing Information"
-        description = f"Total amount: **¥{total_cost_display:,.0f}**"
-        
-        fields = []
-        if services:
-            for service in services:
-                if currency == 'JPY':
-                    service_cost_display = service['cost']
-                else:
-                    service_cost_display = service['cost'] * self.exchange_rate
-                fields.append({
-                    "name": service['name'],
-                    "value": f"¥{service_cost_display:,.0f}",
-                    "inline": True 
-                })
-        else:
-            fields.append({
-                "name": "No service usage",
-                "value": "No billing information found.",
-                "inline": False
-            })
-            
-        # Adjust if too many fields (Discord limit is 25 fields)
-        if len(fields) > 25:
-            logger.warning(f"Too many fields for Discord embed ({len(fields)}). Truncating to 25.")
-            fields = fields[:24] 
-            fields.append({
-                "name": "Others",
-                "value": "Many more services used...",
+        top_n = self.top_n if top_n is None else top_n
+
+        title = _truncate(f"{year}年{month}月 GCP Billing Information", MAX_TITLE_LENGTH)
+        description = f"Total amount: **{self._money(total_cost, conversions)}**"
+        history = billing_data.get('history')
+        if history:
+            description += self._history_lines(history, conversions)
+        if billing_data.get('credits_total'):
+            description += "\n" + self._credit_breakdown(billing_data, conversions)
+        analysis = billing_data.get('analysis')
+        if analysis:
+            forecast = analysis['forecast']
+            description += (
+                f"\nForecast ({forecast['month']} month end): "
+                f"**{self._money(forecast['total'], self._conversions(analysis['currency']))}**"
+            )
+        description = _truncate(description, MAX_DESCRIPTION_LENGTH)
+
+        previous_run = (history or {}).get('previous_run')
+        fields = self._service_fields(services, conversions, top_n, previous_run)
+        if analysis and analysis['anomalies']:
+            fields.insert(0, self._anomaly_field(analysis))
+        return _paginate(title, description, fields)
+
+    def format_alert(self, alert: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Format newly crossed budget thresholds to a Discord embed
+
+        Args:
+            alert: Result of ThresholdAlerter.check with at least one crossing
+
+        Returns:
+            Dictionary in Discord embed message format
+        """
+        conversions = self._conversions(alert['currency'])
+        embed, _ = _new_embed(
+            _truncate(f"{alert['year']}年{alert['month']}月 GCP Budget Alert", MAX_TITLE_LENGTH),
+            f"Month-to-date total: **{self._money(alert['total_cost'], conversions)}**"
+        )
+        embed["color"] = 0xEA4335  # Google Red
+        for crossing in alert['crossings'][:MAX_FIELDS_PER_EMBED]:
+            scope = "Total" if crossing['scope'] == 'total' else crossing['scope']
+            embed["fields"].append({
+                "name": _truncate(f"{scope} exceeded {self._money(crossing['threshold'], conversions)}",
+                                  MAX_FIELD_NAME_LENGTH),
+                "value": f"{self._money(crossing['cost'], conversions)}",
                 "inline": False
             })
+        return embed
 
-        embed = {
-            "title": title,
-            "description": description,
-            "color": 0x4285F4,  # Google Blue
-            "fields": fields,
-            "footer": {
-                "text": "GCP Billing Notifier"
-            }
-        }
-        
+    def format_backfill_summary(self, reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Condense the reports of many months into one embed, one line per month
+
+        Args:
+            reports: Billing information of each month, oldest first
+
+        Returns:
+            Dictionary in Discord embed message format
+        """
+        conversions = self._conversions(reports[0]['currency'])
+        first, last = reports[0], reports[-1]
+        lines = []
+        for report in reports:
+            line = f"**{report['year']}-{report['month']:02d}**: {self._money(report['total_cost'], conversions)}"
+            if report['services']:
+                top = max(report['services'], key=lambda service: service['cost'])
+                line += f" (top: {top['name']} {self._money(top['cost'], conversions)})"
+            lines.append(line)
+        total_cost = sum(report['total_cost'] for report in reports)
+        lines.append(f"\nTotal of {len(reports)} months: **{self._money(total_cost, conversions)}**")
+
+        embed, _ = _new_embed(
+            _truncate(
+                f"{first['year']}年{first['month']}月〜{last['year']}年{last['month']}月 GCP Billing Information",
+                MAX_TITLE_LENGTH
+            ),
+            _truncate("\n".join(lines), MAX_DESCRIPTION_LENGTH)
+        )
         return embed
 
-def create_formatter(exchange_rate: float = 150.0) -> DiscordMessageFormatter:
+    def _credit_breakdown(self, billing_data: Dict[str, Any], conversions: List[Tuple[str, float]]) -> str:
+        """
+        Render gross cost, credits by type and net cost below the total
+
+        Args:
+            billing_data: Billing information with gross_cost, credits_total and credits
+            conversions: Display currencies and rates from _conversions
+
+        Returns:
+            Multi-line text
+        """
+        lines = [f"Gross: {self._money(billing_data.get('gross_cost', 0.0), conversions)}"]
+        for credit_type, amount in billing_data.get('credits', {}).items():
+            lines.append(f"└ {credit_type.replace('_', ' ').title()}: {self._money(amount, conversions)}")
+        lines.append(f"Credits: {self._money(billing_data['credits_total'], conversions)}")
+        lines.append(f"Net: {self._money(billing_data['total_cost'], conversions)}")
+        return "\n".join(lines)
+
+    def _history_lines(self, history: Dict[str, Any], conversions: List[Tuple[str, float]]) -> str:
+        """
+        Render the total's deltas against earlier runs, one line each
+
+        Args:
+            history: Comparisons from run_history.compare_with_history
+            conversions: Display currencies and rates from _conversions
+
+        Returns:
+            Text starting with a newline, empty without comparisons
+        """
+        lines = []
+        previous_run = history.get('previous_run')
+        if previous_run:
+            lines.append(f"{_since_label(previous_run)}: **{self._signed_money(previous_run['delta'], conversions)}**")
+        previous_month = history.get('previous_month')
+        if previous_month:
+            label = "vs last month at this point" if previous_month['month_to_date'] else "vs last month"
+            lines.append(f"{label}: **{self._signed_money(previous_month['delta'], conversions)}**")
+        return "".join(f"\n{line}" for line in lines)
+
+    def _anomaly_field(self, analysis: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """
+        Build the embed field listing the anomalous services, with its character count
+
+        Args:
+            analysis: Analysis from CostAnalyzer.analyze
+
+        Returns:
+            (field, length) tuple
+        """
+        conversions = self._conversions(analysis['currency'])
+        anomalies = analysis['anomalies']
+        lines = []
+        for anomaly in anomalies[:MAX_ANOMALIES_SHOWN]:
+            z = "flat baseline" if anomaly['z'] is None else f"z {anomaly['z']:+.1f}"
+            lines.append(
+                f"⚠ {anomaly['name']}: {self._money(anomaly['cost'], conversions)} "
+                f"(expected {self._money(anomaly['expected'], conversions)}, {z})"
+            )
+        if len(anomalies) > MAX_ANOMALIES_SHOWN:
+            lines.append(f"+{len(anomalies) - MAX_ANOMALIES_SHOWN} more")
+        name = _truncate(f"Anomalies on {analysis['date']}", MAX_FIELD_NAME_LENGTH)
+        value = _truncate("\n".join(lines), MAX_FIELD_VALUE_LENGTH)
+        return {"name": name, "value": value, "inline": False}, len(name) + len(value)
+
+    def _service_fields(self, services: List[Dict[str, Any]], conversions: List[Tuple[str, float]],
+                        top_n: Optional[int],
+                        previous_run: Optional[Dict[str, Any]] = None) -> List[Tuple[Dict[str, Any], int]]:
+        """
+        Build the embed fields for the services, each with its character count
+
+        Args:
+            services: Services sorted by cost in descending order
+            conversions: Display currencies and rates from _conversions
+            top_n: Number of services shown before aggregating the rest (optional)
+            previous_run: Comparison with an earlier run whose per-service deltas are shown (optional)
+
+        Returns:
+            List of (field, length) tuples
+        """
+        if not services:
+            field = {
+                "name": "No service usage",
+                "value": "No billing information found.",
+                "inline": False
+            }
+            return [(field, len(field['name']) + len(field['value']))]
+
+        shown = services if top_n is None or len(services) <= top_n else services[:top_n]
+        fields = []
+        for service in shown:
+            name = _truncate(service['name'] or 'Unknown Service', MAX_FIELD_NAME_LENGTH)
+            value = f"{self._money(service['cost'], conversions)}"
+            if service.get('credits'):
+                value += f" (credits {self._money(service['credits'], conversions)})"
+            delta = previous_run['services'].get(service['name'] or '') if previous_run else None
+            if delta and round(delta, 2):
+                value += f"\n{self._signed_money(delta, conversions)} {_since_label(previous_run)}"
+            children = service.get('children')
+            if children:
+                value = "\n".join([value] + self._drilldown_lines(children, conversions, 0))
+            value = _truncate(value, MAX_FIELD_VALUE_LENGTH)
+            fields.append(({"name": name, "value": value, "inline": not children}, len(name) + len(value)))
+
+        remainder = services[len(shown):]
+        if remainder:
+            remainder_cost = sum(service['cost'] for service in remainder)
+            name = f"Others ({len(remainder)} services)"
+            value = f"{self._money(remainder_cost, conversions)}"
+            fields.append(({"name": name, "value": value, "inline": False}, len(name) + len(value)))
+        return fields
+
+    def _drilldown_lines(self, children: List[Dict[str, Any]], conversions: List[Tuple[str, float]],
+                         depth: int) -> List[str]:
+        """
+        Render the top contributors of each drill-down level as indented lines
+
+        Args:
+            children: Drill-down entries sorted by cost in descending order
+            conversions: Display currencies and rates from _conversions
+            depth: Nesting level
+
+        Returns:
+            List of lines
+        """
+        indent = DRILLDOWN_INDENT * depth
+        lines = []
+        for child in children[:self.drilldown_top_n]:
+            lines.append(f"{indent}└ {child['name']}: {self._money(child['cost'], conversions)}")
+            if child.get('children'):
+                lines.extend(self._drilldown_lines(child['children'], conversions, depth + 1))
+        if len(children) > self.drilldown_top_n:
+            lines.append(f"{indent}└ +{len(children) - self.drilldown_top_n} more")
+        return lines
+
+    def prefetch_rates(self, currency: str) -> None:
+        """
+        Warm the rate provider's cache for costs in currency, e.g. while the billing query runs
+
+        Args:
+            currency: Expected currency of the costs
+        """
+        self._conversions(currency)
+
+    def _conversions(self, currency: str) -> List[Tuple[str, float]]:
+        """
+        Look up the rate from the billing currency to each display currency
+
+        Display currencies without a rate are left out; when none has one,
+        costs are shown in the billing currency.
+
+        Args:
+            currency: Currency of the costs
+
+        Returns:
+            List of (display currency, rate), primary display currency first
+        """
+        rates: Optional[Dict[str, float]] = None
+        if self.rate_provider is not None and any(target != currency for target in self.currencies):
+            try:
+                rates = self.rate_provider.get_rates(currency)
+            except Exception as e:
+                logger.warning(f"Failed to get {currency} exchange rates: {str(e)}")
+
+        conversions = []
+        for target in self.currencies:
+            if target == currency:
+                conversions.append((target, 1.0))
+            elif rates is not None and target in rates:
+                conversions.append((target, rates[target]))
+            elif target == 'JPY':
+                # Fixed fallback rate
+                conversions.append((target, self.exchange_rate))
+            else:
+                logger.warning(f"No exchange rate from {currency} to {target}. Not shown.")
+        return conversions or [(currency, 1.0)]
+
+    def _money(self, cost: float, conversions: List[Tuple[str, float]]) -> str:
+        """
+        Render a cost in the primary display currency, followed by the others in parentheses
+        """
+        amounts = [_format_amount(cost * rate, target) for target, rate in conversions]
+        if len(amounts) == 1:
+            return amounts[0]
+        return f"{amounts[0]} ({', '.join(amounts[1:])})"
+
+    def _signed_money(self, delta: float, conversions: List[Tuple[str, float]]) -> str:
+        """
+        Render a cost difference with an explicit sign, e.g. '+¥1,234 (+$8.23)'
+        """
+        sign = '-' if delta < 0 else '+'
+        amounts = [sign + _format_amount(abs(delta) * rate, target) for target, rate in conversions]
+        if len(amounts) == 1:
+            return amounts[0]
+        return f"{amounts[0]} ({', '.join(amounts[1:])})"
+
+
+def _since_label(previous_run: Dict[str, Any]) -> str:
+    """
+    Name the earlier run a delta refers to
+    """
+    return "vs yesterday" if previous_run['days_ago'] == 1 else f"vs {previous_run['run_date']}"
+
+
+def _format_amount(amount: float, currency: str) -> str:
+    """
+    Format an amount with its currency symbol, without decimals for currencies that have none
+    """
+    decimals = 0 if currency in ZERO_DECIMAL_CURRENCIES else 2
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    if symbol is None:
+        return f"{amount:,.{decimals}f} {currency}"
+    return f"{symbol}{amount:,.{decimals}f}"
+
+
+def _truncate(text: str, limit: int) -> str:
+    """
+    Shorten text to limit characters, marking the cut with an ellipsis
+    """
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1] + '…'
+
+
+def _new_embed(title: str, description: Optional[str]) -> Tuple[Dict[str, Any], int]:
+    """
+    Create an empty embed and its character count
+    """
+    embed = {"title": title}
+    length = len(title) + len(FOOTER_TEXT)
+    if description is not None:
+        embed["description"] = description
+        length += len(description)
+    embed["color"] = 0x4285F4  # Google Blue
+    embed["fields"] = []
+    embed["footer"] = {
+        "text": FOOTER_TEXT
+    }
+    return embed, length
+
+
+def _paginate(title: str, description: str,
+              fields: List[Tuple[Dict[str, Any], int]]) -> List[List[Dict[str, Any]]]:
+    """
+    Pack fields into embeds and embeds into messages within Discord's limits
+
+    Args:
+        title: Title of the first embed (continuation embeds get a suffix)
+        description: Description of the first embed
+        fields: List of (field, length) tuples
+
+    Returns:
+        List of messages, each a list of embeds
+    """
+    continued_title = _truncate(title, MAX_TITLE_LENGTH - len(CONTINUED_SUFFIX)) + CONTINUED_SUFFIX
+
+    embed, embed_length = _new_embed(title, description)
+    message = [embed]
+    message_length = embed_length
+    messages = [message]
+
+    for field, field_length in fields:
+        fits_embed = (
+            len(embed['fields']) < MAX_FIELDS_PER_EMBED
+            and embed_length + field_length <= MAX_EMBED_TOTAL_LENGTH
+            and message_length + field_length <= MAX_MESSAGE_EMBEDS_LENGTH
+        )
+        if not fits_embed:
+            embed, embed_length = _new_embed(continued_title, None)
+            fits_message = (
+                len(message) < MAX_EMBEDS_PER_MESSAGE
+                and message_length + embed_length + field_length <= MAX_MESSAGE_EMBEDS_LENGTH
+            )
+            if fits_message:
+                message.append(embed)
+                message_length += embed_length
+            else:
+                message = [embed]
+                message_length = embed_length
+                messages.append(message)
+
+        embed['fields'].append(field)
+        embed_length += field_length
+        message_length += field_length
+
+    if len(messages) > 1 or len(message) > 1:
+        logger.info(f"Billing data split into {sum(len(m) for m in messages)} embeds in {len(messages)} messages")
+    return messages
+
+
+def create_formatter(exchange_rate: float = 150.0, top_n: Optional[int] = None, drilldown_top_n: int = 3,
+                     rate_provider: Optional[RateProvider] = None,
+                     currencies: Optional[List[str]] = None) -> DiscordMessageFormatter:
     """
     Create DiscordMessageFormatter instance
-    
+
     Args:
-        exchange_rate: USD to JPY exchange rate (default: 150.0)
-    
+        exchange_rate: Fallback rate to JPY when no provider rate is available (default: 150.0)
+        top_n: Show only the N most expensive services in paginated output (optional)
+        drilldown_top_n: Top contributors shown per drill-down level (default: 3)
+        rate_provider: Source of exchange rates (optional)
+        currencies: Display currencies, primary first (default: ['JPY'])
+
     Returns:
         DiscordMessageFormatter
     """
-    return DiscordMessageFormatter(exchange_rate)
+    return DiscordMessageFormatter(exchange_rate, top_n, drilldown_top_n, rate_provider, currencies)
@@ -1,26 +1,80 @@
 #!/usr/bin/env python3
 """
 Client for retrieving billing information using GCP Billing API
+
+The google-* libraries are imported lazily where they are first needed,
+since importing them dominates Lambda cold start time.
 """
 import json
 import logging
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import google.auth
-from google.auth.transport.requests import Request
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from google.cloud import bigquery
+import metrics
+from billing_model import CostNode, ServiceCost, node_name, sort_children
 
 logger = logging.getLogger(__name__)
 
+# Default partitioning column of the Cloud Billing export tables
+DEFAULT_PARTITION_COLUMN = '_PARTITIONTIME'
+
+# Drill-down dimensions: name -> (result column, export table expression)
+DIMENSION_COLUMNS = {
+    'project': ('project_id', 'project.id'),
+    'sku': ('sku_description', 'sku.description'),
+    'location': ('location', 'location.location'),
+}
+LABEL_DIMENSION_PREFIX = 'label:'
+
+# Credit types of the billing export's credits.type field, summed into credit_<type> columns;
+# credits of any other type are reported in an OTHER bucket
+CREDIT_TYPES = (
+    'SUSTAINED_USAGE_DISCOUNT',
+    'COMMITTED_USAGE_DISCOUNT',
+    'COMMITTED_USAGE_DISCOUNT_DOLLAR_BASE',
+    'DISCOUNT',
+    'FREE_TIER',
+    'PROMOTION',
+    'SUBSCRIPTION_BENEFIT',
+    'RESELLER_MARGIN',
+    'FEE_UTILIZATION_OFFSET',
+)
+
+# Drill-down dimensions kept in the daily summary table
+SUMMARY_DIMENSIONS = ('project',)
+SUMMARY_TABLE_SUFFIX = '_daily_summary'
+
+# Bumped whenever the shape or meaning of query results changes, so cached results are not mixed
+QUERY_VERSION = 3
+
+
+class QueryTooExpensiveError(Exception):
+    """
+    Raised when a dry run estimates more bytes than the configured ceiling
+    """
+    def __init__(self, estimated_bytes: int, max_bytes_billed: int):
+        self.estimated_bytes = estimated_bytes
+        self.max_bytes_billed = max_bytes_billed
+        super().__init__(
+            f"Query would process {estimated_bytes:,} bytes, "
+            f"which exceeds the limit of {max_bytes_billed:,} bytes"
+        )
+
+
 class GCPBillingClient:
     """
     GCP Billing API client class
     """
-    def __init__(self, billing_account_id: str, bigquery_project_id: str, bigquery_table_id: str, credentials=None):
+    def __init__(self, billing_account_id: str, bigquery_project_id: str, bigquery_table_id: str, credentials=None,
+                 bigquery_client=None, build_billing_api: bool = False,
+                 partition_column: Optional[str] = DEFAULT_PARTITION_COLUMN,
+                 partition_late_days: Optional[int] = None, max_bytes_billed: Optional[int] = None,
+                 daily_cache=None, page_size: Optional[int] = None, use_storage_api: bool = False,
+                 dimensions: Optional[List[str]] = None, summary_table_id: Optional[str] = None,
+                 summary_start: Optional[str] = None, summary_refresh: bool = True,
+                 summary_late_days: int = 3, result_cache=None):
         """
         Initialize
         
@@ -29,18 +83,65 @@ class GCPBillingClient:
             bigquery_project_id: BigQuery project ID
             bigquery_table_id: BigQuery table ID
             credentials: GCP credentials object (optional)
+            bigquery_client: BigQuery client to reuse (optional, created on first query otherwise)
+            build_billing_api: Build the Cloud Billing API client now instead of on first access
+            partition_column: Partitioning column used to prune the scan (None disables pruning)
+            partition_late_days: Days after a period's end whose partitions are still scanned
+                                 for late-exported rows (None scans every later partition)
+            max_bytes_billed: Abort queries whose dry run estimate exceeds this many bytes (optional)
+            daily_cache: DailyAggregateCache enabling incremental month-to-date queries (optional)
+            page_size: Rows fetched per result page (optional, BigQuery default otherwise)
+            use_storage_api: Read results through the BigQuery Storage Read API when installed
+            dimensions: Drill-down dimensions below service, outermost first: 'project', 'sku',
+                        'location' or 'label:<key>' (optional)
+            summary_table_id: Daily per-service/per-project summary table in the export's dataset;
+                              reports over periods from summary_start on read it instead of the
+                              export when their dimensions are kept there (optional)
+            summary_start: First usage day held by the summary table as 'YYYY-MM-DD'
+            summary_refresh: Merge new and late-arriving days into the summary table before
+                             the first read of each run
+            summary_late_days: Usage days before today that are merged again on refresh
+            result_cache: MonthResultCache serving finalized months without a query (optional)
         """
         self.billing_account_id = billing_account_id
         self.bigquery_project_id = bigquery_project_id
         self.bigquery_table_id = bigquery_table_id
+        self._bigquery_client = bigquery_client
+        self._bigquery_client_lock = threading.Lock()
+        self._billing_api_client = None
+        self.partition_column = partition_column
+        self.partition_late_days = partition_late_days
+        self.max_bytes_billed = max_bytes_billed
+        self.daily_cache = daily_cache
+        self.page_size = page_size
+        self.use_storage_api = use_storage_api
+        self.dimensions = parse_dimensions(dimensions or [])
+        if summary_table_id and not summary_start:
+            raise ValueError("A summary table requires the first usage day it holds (summary_start)")
+        self.summary_table_id = summary_table_id
+        self.summary_start = summary_start
+        self.summary_refresh = summary_refresh
+        self.summary_late_days = summary_late_days
+        self.result_cache = result_cache
+        self._summary_lock = threading.Lock()
+        self._summary_table_created = False
+        self._summary_refreshed = False
+        self.dry_run = False
+        self.query_stats = _empty_query_stats()
+        # Queries of one run may execute on several threads (e.g. report and analysis overlapped)
+        self._stats_lock = threading.Lock()
 
         if credentials:
             self.credentials = credentials
         else:
             # Get credentials from ADC
+            import google.auth
+            import google.auth.exceptions
+
             scopes = ['https://www.googleapis.com/auth/cloud-billing']
             try:
-                self.credentials, project = google.auth.default(scopes=scopes)
+                with metrics.span('credentials'):
+                    self.credentials, project = google.auth.default(scopes=scopes)
                 logger.info(f"Successfully obtained ADC credentials for project: {project}")
             except google.auth.exceptions.DefaultCredentialsError as e:
                 logger.error(
@@ -49,9 +150,65 @@ class GCPBillingClient:
                 )
                 raise e
         
-        # Build Cloud Billing API client
-        self.client = build('cloudbilling', 'v1', credentials=self.credentials)
+        if build_billing_api:
+            _ = self.client  # Build eagerly
+
+    @property
+    def client(self):
+        """
+        Cloud Billing API client, built on first access
+
+        Billing data is read from the BigQuery export, so the discovery
+        client is not needed for reports and is not built by default.
+        """
+        if self._billing_api_client is None:
+            from googleapiclient.discovery import build
+
+            self._billing_api_client = build('cloudbilling', 'v1', credentials=self.credentials)
+        return self._billing_api_client
+
+    @property
+    def bigquery_client(self):
+        """
+        BigQuery client, created once and reused for every query of this instance
+        """
+        with self._bigquery_client_lock:
+            if self._bigquery_client is None:
+                from google.cloud import bigquery
+
+                with metrics.span('bigquery_client'):
+                    self._bigquery_client = bigquery.Client(
+                        project=self.bigquery_project_id, credentials=self.credentials
+                    )
+        return self._bigquery_client
+
+    def refresh_credentials_if_expired(self) -> bool:
+        """
+        Refresh the cached OAuth access token when it has expired
+
+        Returns:
+            True if the token was refreshed, False if it was still usable
+        """
+        if not getattr(self.credentials, 'expired', False):
+            return False
+        from google.auth.transport.requests import Request
+
+        logger.info("GCP access token expired. Refreshing.")
+        with metrics.span('credentials_refresh'):
+            self.credentials.refresh(Request())
+        return True
         
+    def start_run(self, dry_run: bool = False) -> None:
+        """
+        Reset per-invocation state of a (possibly cached) client
+
+        Args:
+            dry_run: Only estimate bytes processed instead of executing queries
+        """
+        self.dry_run = dry_run
+        self.query_stats = _empty_query_stats()
+        self._summary_refreshed = False
+
     def get_cost_for_month(self, year: int, month: int) -> Dict[str, Any]:
         """
         Get billing information for specified month
@@ -64,29 +221,51 @@ class GCPBillingClient:
             Dictionary containing billing information
         """
         logger.info(f"Getting billing data for {year}-{month}")
-        
-        # Calculate start and end dates for the period
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
-        else:
-            end_date = datetime(year, month + 1, 1)
-        
-        # Create filter conditions for Cloud Billing API
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-        
-        billing_data = self._fetch_billing_data(start_date_str, end_date_str)
-        cost_summary = self._summarize_billing_data(billing_data)
-        
+        return self.get_cost_for_months([(year, month)])[0]
+
+    def get_cost_for_months(self, months: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """
+        Get billing information for several months with a single BigQuery query
+
+        Finalized months found in the result cache are not queried.
+
+        Args:
+            months: List of (year, month)
+
+        Returns:
+            List of billing information dictionaries, in the same order as months
+        """
+        results = {}
+        if self.result_cache is not None:
+            for year, month in months:
+                cached = self.result_cache.get(self._result_cache_fields(year, month))
+                if cached is not None:
+                    results[(year, month)] = cached
+            if results:
+                logger.info(f"Using cached results of {len(results)} finalized months")
+
+        pending = {f"{year}-{month:02d}": (year, month) for year, month in months if (year, month) not in results}
+        summaries = self.get_costs_for_periods([
+            (label, *_month_range(year, month)) for label, (year, month) in pending.items()
+        ])
+
+        for label, (year, month) in pending.items():
+            results[(year, month)] = {'year': year, 'month': month, **summaries[label]}
+            if self.result_cache is not None and not self.dry_run:
+                self.result_cache.put(self._result_cache_fields(year, month), results[(year, month)], year, month)
+        return [results[(year, month)] for year, month in months]
+
+    def _result_cache_fields(self, year: int, month: int) -> Dict[str, Any]:
+        """
+        Everything a month's result depends on, addressing it in the result cache
+        """
         return {
-            'year': year,
-            'month': month,
-            'start_date': start_date_str,
-            'end_date': end_date_str,
-            'total_cost': cost_summary['total_cost'],
-            'currency': cost_summary['currency'],
-            'services': cost_summary['services']
+            'account': self.billing_account_id,
+            'table': f"{self.bigquery_project_id}.{self.bigquery_table_id}",
+            'period': f"{year}-{month:02d}",
+            'query_version': QUERY_VERSION,
+            'dimensions': [dimension['name'] for dimension in self.dimensions],
+            'partition': [self.partition_column, self.partition_late_days]
         }
     
     def get_cost_for_previous_month(self) -> Dict[str, Any]:
@@ -109,10 +288,60 @@ class GCPBillingClient:
         """
         Get billing information from the 1st of this month to today
         
+        Returns:
+            Dictionary containing billing information
+        """
+        if self.daily_cache is not None:
+            return self._get_cost_for_current_month_to_date_incremental()
+        return self.get_cost_for_current_month_to_date_with_comparisons(compare=False)['current']
+
+    def _get_cost_for_current_month_to_date_incremental(self) -> Dict[str, Any]:
+        """
+        Get month-to-date billing information, querying only days that are not finalized in the daily cache
+
         Returns:
             Dictionary containing billing information
         """
         today = datetime.now()
+        month_start = today.date().replace(day=1)
+        end_date = today.date() + timedelta(days=1)  # Include until end of today
+
+        variant = ','.join([f"v{QUERY_VERSION}"] + [dimension['name'] for dimension in self.dimensions])
+        state = self.daily_cache.load(self.billing_account_id, self.bigquery_table_id, month_start, variant)
+        query_start = self.daily_cache.first_day_to_query(state, month_start)
+        logger.info(f"Querying daily aggregates from {query_start} (finalized through {state.get('finalized_through')})")
+
+        rows = self._fetch_billing_data_for_periods(
+            [(query_start.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))], daily=True
+        )[0]
+        state = self.daily_cache.merge(state, query_start, rows, today.date(), month_start)
+        if not self.dry_run:
+            self.daily_cache.save(self.billing_account_id, self.bigquery_table_id, month_start, state, variant)
+
+        cost_summary = self._summarize_billing_data(self.daily_cache.rows(state))
+        return {
+            'year': today.year,
+            'month': today.month,
+            'start_date': month_start.strftime('%Y-%m-%d'),
+            'end_date': today.strftime('%Y-%m-%d'),  # Display today's date
+            **cost_summary
+        }
+
+    def get_cost_for_current_month_to_date_with_comparisons(self, compare: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Get month-to-date billing information together with the previous month
+        and the previous month up to the same day, using a single table scan
+
+        Args:
+            compare: Also fetch the previous month periods
+
+        Returns:
+            Dictionary with 'current', and when compare is True also 'previous_month'
+            and 'previous_month_to_date', each containing billing information. The
+            month-to-date periods end on their last usage day (inclusive end_date),
+            'previous_month' on the first day of the next month, as monthly reports do
+        """
+        today = datetime.now()
         year = today.year
         month = today.month
         
@@ -122,100 +351,916 @@ class GCPBillingClient:
         
         start_date_str = start_date.strftime('%Y-%m-%d')
         end_date_str = end_date.strftime('%Y-%m-%d')
-        
-        billing_data = self._fetch_billing_data(start_date_str, end_date_str)
-        cost_summary = self._summarize_billing_data(billing_data)
-        
+
+        periods = [('current', start_date_str, end_date_str)]
+        previous_year, previous_month = (year - 1, 12) if month == 1 else (year, month - 1)
+        if compare:
+            previous_start_str, previous_end_str = _month_range(previous_year, previous_month)
+            # Same day of the previous month, clamped to its length
+            previous_start = datetime.strptime(previous_start_str, '%Y-%m-%d')
+            previous_length = (datetime.strptime(previous_end_str, '%Y-%m-%d') - previous_start).days
+            same_day_end = previous_start + timedelta(days=min(today.day, previous_length))
+            periods.append(('previous_month', previous_start_str, previous_end_str))
+            periods.append(('previous_month_to_date', previous_start_str, same_day_end.strftime('%Y-%m-%d')))
+
+        summaries = self.get_costs_for_periods(periods)
+
+        results = {
+            'current': {
+                **summaries['current'],
+                'year': year,
+                'month': month,
+                'start_date': start_date_str,
+                'end_date': today.strftime('%Y-%m-%d'),  # Display today's date
+            }
+        }
+        if compare:
+            results['previous_month'] = dict(summaries['previous_month'], year=previous_year, month=previous_month)
+            results['previous_month_to_date'] = dict(
+                summaries['previous_month_to_date'], year=previous_year, month=previous_month,
+                end_date=(same_day_end - timedelta(days=1)).strftime('%Y-%m-%d')  # Display the same day
+            )
+        return results
+
+    def get_costs_for_periods(self, periods: List[Tuple[str, str, str]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get billing information for several periods with a single BigQuery query
+
+        Periods may overlap; every row is counted in each period it falls into.
+
+        Args:
+            periods: List of (label, start_date, end_date) with dates as 'YYYY-MM-DD',
+                     end_date exclusive
+
+        Returns:
+            Dictionary mapping each label to its billing information
+            (start_date, end_date, total_cost, gross_cost, credits_total, credits, currency, services)
+        """
+        if not periods:
+            return {}
+
+        # Rows are folded into per-period summaries as they are paged in
+        dimension_columns = [dimension['column'] for dimension in self.dimensions]
+        accumulators = [_CostAccumulator(dimension_columns) for _ in periods]
+        for period_index, row in self._stream_billing_rows([(start, end) for _, start, end in periods]):
+            accumulators[period_index].add(row)
+
+        results = {}
+        for index, (label, start_date, end_date) in enumerate(periods):
+            with metrics.span('summarize'):
+                cost_summary = accumulators[index].summary()
+            results[label] = {
+                'start_date': start_date,
+                'end_date': end_date,
+                **cost_summary
+            }
+        return results
+
+    def get_daily_cost_series(self, days: int) -> List[Dict[str, Any]]:
+        """
+        Get per-service daily costs of the trailing days up to today with a single query
+
+        Args:
+            days: Number of days including today
+
+        Returns:
+            List of rows with 'usage_date', 'service_name', cost and credit columns and 'currency'
+        """
+        today = datetime.now().date()
+        start_date = today - timedelta(days=days - 1)
+        end_date = today + timedelta(days=1)  # Include until end of today
+        logger.info(f"Getting daily cost series from {start_date} to {today}")
+        return self._fetch_billing_data_for_periods(
+            [(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))], daily=True, drilldown=False
+        )[0]
+
+    def get_cost_totals(self, start_date: str, finalize_before: str, end_date: str,
+                        services: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Get net cost totals of a usage range with a single one-row query
+
+        Only the partitions from start_date on are scanned. The totals are split
+        at finalize_before, so callers can keep the part that can no longer
+        change and start the next scan from there.
+
+        Args:
+            start_date: First usage day as 'YYYY-MM-DD'
+            finalize_before: Usage day from which costs are still open as 'YYYY-MM-DD'
+            end_date: Day after the last usage day as 'YYYY-MM-DD'
+            services: Services whose totals are also returned (optional)
+
+        Returns:
+            Dictionary with 'currency' (None without rows), and 'finalized' and 'open'
+            each holding 'total_cost' and 'services' mapping service name to cost
+        """
+        from google.cloud import bigquery
+
+        services = services or []
+        service_columns = "".join(
+            f"SUM(IF(service_name = @service_{index} AND usage_start_time < @finalize_before, net_cost, 0))"
+            f" as finalized_service_{index},\n                  "
+            f"SUM(IF(service_name = @service_{index} AND usage_start_time >= @finalize_before, net_cost, 0))"
+            f" as open_service_{index},\n                  "
+            for index in range(len(services))
+        )
+        query = f"""
+                SELECT
+                  SUM(IF(usage_start_time < @finalize_before, net_cost, 0)) as finalized_total,
+                  SUM(IF(usage_start_time >= @finalize_before, net_cost, 0)) as open_total,
+                  {service_columns}ANY_VALUE(currency) as currency
+                FROM (
+                  SELECT
+                    usage_start_time,
+                    service.description as service_name,
+                    cost + IFNULL((SELECT SUM(c.amount) FROM UNNEST(credits) AS c), 0) as net_cost,
+                    currency
+                  FROM
+                    {self._table_reference()}
+                  WHERE
+                    usage_start_time >= @scan_start
+                    AND usage_start_time < @scan_end
+                    {self._partition_filter()}
+                )
+            """
+        rows = self._run_query(query, [
+            *self._scan_parameters(start_date, end_date),
+            bigquery.ScalarQueryParameter('finalize_before', 'TIMESTAMP', _to_timestamp(finalize_before)),
+            *[
+                bigquery.ScalarQueryParameter(f"service_{index}", 'STRING', service)
+                for index, service in enumerate(services)
+            ]
+        ])
+        row = next(iter(rows), None) or {}
         return {
-            'year': year,
-            'month': month,
-            'start_date': start_date_str,
-            'end_date': today.strftime('%Y-%m-%d'),  # Display today's date
-            'total_cost': cost_summary['total_cost'],
-            'currency': cost_summary['currency'],
-            'services': cost_summary['services']
+            'currency': row.get('currency'),
+            'finalized': {
+                'total_cost': float(row.get('finalized_total') or 0.0),
+                'services': {
+                    service: float(row.get(f"finalized_service_{index}") or 0.0)
+                    for index, service in enumerate(services)
+                }
+            },
+            'open': {
+                'total_cost': float(row.get('open_total') or 0.0),
+                'services': {
+                    service: float(row.get(f"open_service_{index}") or 0.0)
+                    for index, service in enumerate(services)
+                }
+            }
         }
-    
+
     def _fetch_billing_data(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
         """
         Fetch billing data for specified period from BigQuery
         """
+        return self._fetch_billing_data_for_periods([(start_date, end_date)])[0]
+
+    def _fetch_billing_data_for_periods(self, periods: List[Tuple[str, str]], daily: bool = False,
+                                        drilldown: bool = True) -> List[List[Dict[str, Any]]]:
+        """
+        Fetch billing data for several periods from BigQuery in one scan
+
+        Args:
+            periods: List of (start_date, end_date) with dates as 'YYYY-MM-DD', end_date exclusive
+            daily: Also group by usage day (UTC), adding a 'usage_date' column
+            drilldown: Group by the drill-down dimensions (service-level rows only otherwise)
+
+        Returns:
+            List of row lists, in the same order as periods
+        """
+        result = [[] for _ in periods]
+        for period_index, row in self._stream_billing_rows(periods, daily=daily, drilldown=drilldown):
+            row = dict(row.items())
+            del row['period_index']
+            result[period_index].append(row)
+        return result
+
+    def _stream_billing_rows(self, periods: List[Tuple[str, str]], daily: bool = False,
+                             drilldown: bool = True) -> Iterator[Tuple[int, Any]]:
+        """
+        Stream billing rows for several periods from BigQuery in one scan
+
+        The table is read once over the union of the periods, and each row is
+        joined against the list of periods it falls into before grouping. The
+        daily summary table is read instead of the export when it covers the
+        query (see _billing_source).
+
+        Each row carries gross_cost, credits_total and one credit_<type> column
+        per credit type; the net cost is gross_cost + credits_total.
+
+        With drill-down dimensions, one GROUPING SETS query returns rows for
+        every level of the service > dimension hierarchy; grouping_<column>
+        is 1 on rows aggregated over that dimension. The dimension expressions
+        are projected in a subquery first, since BigQuery resolves neither
+        GROUPING() arguments nor grouping sets against aliases of the same
+        SELECT list.
+
+        Args:
+            periods: List of (start_date, end_date) with dates as 'YYYY-MM-DD', end_date exclusive
+            daily: Also group by usage day (UTC), adding a 'usage_date' column
+            drilldown: Group by the drill-down dimensions (service-level rows only otherwise)
+
+        Yields:
+            Tuples of (index into periods, row), read one result page at a time
+        """
         from google.cloud import bigquery
 
         try:
-            client = bigquery.Client(project=self.bigquery_project_id, credentials=self.credentials)
+            period_structs = [
+                bigquery.StructQueryParameter(
+                    None,
+                    bigquery.ScalarQueryParameter('period_index', 'INT64', index),
+                    bigquery.ScalarQueryParameter('start_time', 'TIMESTAMP', _to_timestamp(start)),
+                    bigquery.ScalarQueryParameter('end_time', 'TIMESTAMP', _to_timestamp(end))
+                )
+                for index, (start, end) in enumerate(periods)
+            ]
+            scan_start = min(start for start, _ in periods)
+            scan_end = max(end for _, end in periods)
+            dimensions = self.dimensions if drilldown else []
+
+            source = self._billing_source(scan_start, dimensions)
+
+            base_columns = ['period_index'] + (['usage_date'] if daily else []) + ['service_name', 'currency']
+            dimension_names = [dimension['column'] for dimension in dimensions]
+            day_column = f"{source['usage_date']} as usage_date,\n                    " if daily else ""
+            dimension_columns = "".join(
+                f"{source['dimensions'][index]} as {dimension['column']},\n                    "
+                for index, dimension in enumerate(dimensions)
+            )
+            credit_columns = "".join(
+                f"{source['credits'][credit_type]} as credit_{credit_type.lower()},\n                    "
+                for credit_type in CREDIT_TYPES
+            )
+            value_columns = ['gross_cost', 'credits_total'] + [f"credit_{t.lower()}" for t in CREDIT_TYPES]
+            output_columns = ",\n                  ".join(
+                base_columns + dimension_names
+                + [f"GROUPING({column}) as grouping_{column}" for column in dimension_names]
+                + [f"SUM({column}) as {column}" for column in value_columns]
+            )
+            # One grouping set per level of the hierarchy: service, service > dim1, ...
+            grouping_sets = ", ".join(
+                "(" + ", ".join(base_columns + dimension_names[:level]) + ")"
+                for level in range(len(dimensions) + 1)
+            )
+            group_by = f"GROUPING SETS ({grouping_sets})" if dimensions else ", ".join(base_columns)
+
             query = f"""
                 SELECT
-                  service.description as service_name,
-                  SUM(cost) as total_cost,
-                  currency
-                FROM
-                  `{self.bigquery_project_id}.cost_exporter.{self.bigquery_table_id}`
-                WHERE
-                  usage_start_time >= '{start_date}'
-                  AND usage_start_time < '{end_date}'
-                  AND cost > 0
-                GROUP BY service.description, currency
-                ORDER BY total_cost DESC
+                  {output_columns}
+                FROM (
+                  SELECT
+                    period.period_index as period_index,
+                    {day_column}{source['service_name']} as service_name,
+                    {dimension_columns}{source['gross_cost']} as gross_cost,
+                    {source['credits_total']} as credits_total,
+                    {credit_columns}currency
+                  FROM
+                    {source['table']}
+                  CROSS JOIN UNNEST(@periods) AS period
+                  WHERE
+                    {source['filter']}
+                    AND {source['period_filter']}
+                )
+                GROUP BY {group_by}
             """
-            query_job = client.query(query)  # API request
-            rows = query_job.result()  # Waits for query to finish
-            result = [dict(row.items()) for row in rows]
-            return result
+            label_parameters = [
+                bigquery.ScalarQueryParameter(dimension['parameter'], 'STRING', dimension['label_key'])
+                for dimension in dimensions if dimension.get('label_key') is not None
+            ]
+            rows = self._run_query(query, [
+                bigquery.ArrayQueryParameter('periods', 'STRUCT', period_structs),
+                *self._scan_parameters(scan_start, scan_end),
+                *label_parameters
+            ])
+            # Includes the time the consumer spends on each row between yields
+            with metrics.span('bigquery_rows'):
+                for row in self._iter_result_rows(rows):
+                    yield row['period_index'], row
 
         except Exception as e:
             logger.error(f"Error fetching billing data: {str(e)}")
             raise
 
-    def _summarize_billing_data(self, billing_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _billing_source(self, scan_start: str, dimensions: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Summarize billing data retrieved from BigQuery
+        SQL expressions reading per-service costs for a report query
+
+        The daily summary table is read when it is configured, holds the whole
+        scanned range and keeps every requested dimension; it is refreshed
+        first when that has not happened yet in this run. The export table is
+        read otherwise.
+
+        Args:
+            scan_start: First day of the scanned range as 'YYYY-MM-DD'
+            dimensions: Drill-down dimensions of the query
+
+        Returns:
+            Dictionary of expressions (see _export_source)
+        """
+        if self._reads_summary_table(scan_start, dimensions):
+            if self.dry_run and not self._summary_table_exists():
+                # A dry run only estimates the CREATE, so the table is still missing on the next one
+                logger.info("Dry run: estimating against the export table, the summary table does not exist yet")
+                return self._export_source(dimensions)
+            self._ensure_summary_table_fresh()
+            return self._summary_source(dimensions)
+        return self._export_source(dimensions)
+
+    def _export_source(self, dimensions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        SQL expressions reading the billing export table
+
+        Args:
+            dimensions: Drill-down dimensions of the query
+
+        Returns:
+            Dictionary with 'table', 'filter' (predicates on @scan_start and @scan_end),
+            'period_filter' (predicates on the UNNESTed period), 'usage_date', 'service_name',
+            the per-row values 'gross_cost' and 'credits_total', 'credits' mapping each credit
+            type to its per-row value, and 'dimensions' with one expression per dimension;
+            callers aggregate the values with SUM
+        """
+        return {
+            'table': self._table_reference(),
+            'filter': f"""usage_start_time >= @scan_start
+                  AND usage_start_time < @scan_end
+                  {self._partition_filter()}""",
+            'period_filter': """usage_start_time >= period.start_time
+                  AND usage_start_time < period.end_time""",
+            'usage_date': 'DATE(usage_start_time)',
+            'service_name': 'service.description',
+            'gross_cost': 'cost',
+            # Credits are negative amounts; refunds and credits are kept so the net matches the invoice
+            'credits_total': 'IFNULL((SELECT SUM(c.amount) FROM UNNEST(credits) AS c), 0)',
+            'credits': {
+                credit_type: f"IFNULL((SELECT SUM(c.amount) FROM UNNEST(credits) AS c "
+                             f"WHERE c.type = '{credit_type}'), 0)"
+                for credit_type in CREDIT_TYPES
+            },
+            'dimensions': [dimension['expression'] for dimension in dimensions]
+        }
+
+    def _summary_source(self, dimensions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        SQL expressions reading the daily summary table, whose columns carry the result names
+
+        Args:
+            dimensions: Drill-down dimensions of the query, all in SUMMARY_DIMENSIONS
+
+        Returns:
+            Dictionary of expressions (see _export_source)
         """
+        return {
+            'table': self._summary_table_reference(),
+            'filter': """usage_date >= DATE(@scan_start)
+                  AND usage_date < DATE(@scan_end)""",
+            'period_filter': """usage_date >= DATE(period.start_time)
+                  AND usage_date < DATE(period.end_time)""",
+            'usage_date': 'usage_date',
+            'service_name': 'service_name',
+            'gross_cost': 'gross_cost',
+            'credits_total': 'credits_total',
+            'credits': {credit_type: f"credit_{credit_type.lower()}" for credit_type in CREDIT_TYPES},
+            'dimensions': [dimension['column'] for dimension in dimensions]
+        }
+
+    def _reads_summary_table(self, scan_start: str, dimensions: List[Dict[str, Any]]) -> bool:
+        """
+        Check whether a query over the given range and dimensions can read the summary table
+        """
+        if not self.summary_table_id:
+            return False
+        if scan_start < self.summary_start:
+            logger.info(f"Reading the export table: {scan_start} is before the summary table "
+                        f"start {self.summary_start}")
+            return False
+        unsupported = [dimension['name'] for dimension in dimensions if dimension['name'] not in SUMMARY_DIMENSIONS]
+        if unsupported:
+            logger.info(f"Reading the export table: the summary table has no {', '.join(unsupported)} column")
+            return False
+        return True
+
+    def _ensure_summary_table_fresh(self) -> None:
+        """
+        Refresh the summary table once per run, before its first read
+
+        Queries running on several threads wait for the same refresh.
+        """
+        if not self.summary_refresh:
+            return
+        with self._summary_lock:
+            if not self._summary_refreshed:
+                self.refresh_summary_table()
+                self._summary_refreshed = True
+
+    def create_summary_table(self) -> None:
+        """
+        Create the daily summary table unless it exists, partitioned by usage day
+        """
+        if self._summary_table_created:
+            return
+        columns = ",\n                  ".join(
+            ['usage_date DATE', 'service_name STRING', 'project_id STRING', 'currency STRING',
+             'gross_cost FLOAT64', 'credits_total FLOAT64']
+            + [f"credit_{credit_type.lower()} FLOAT64" for credit_type in CREDIT_TYPES]
+            + ['refreshed_at TIMESTAMP']
+        )
+        query = f"""
+                CREATE TABLE IF NOT EXISTS {self._summary_table_reference()} (
+                  {columns}
+                )
+                PARTITION BY usage_date
+                CLUSTER BY service_name
+            """
+        self._run_query(query, [])
+        # In dry run mode the statement was only estimated
+        self._summary_table_created = not self.dry_run
+
+    def _summary_table_exists(self) -> bool:
+        """
+        Check whether the daily summary table exists, e.g. before a dry run reads it
+        """
+        from google.api_core.exceptions import NotFound
+
+        if self._summary_table_created:
+            return True
         try:
-            total_cost = 0.0
-            currency = 'JPY'  # Default currency
-            services = []
+            self.bigquery_client.get_table(self._summary_table_reference().strip('`'))
+        except NotFound:
+            return False
+        self._summary_table_created = True
+        return True
+
+    def refresh_summary_table(self, start_date: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Create the daily summary table if needed and merge usage days up to today into it
 
-            for row in billing_data:
-                service_name = row.get('service_name', 'Unknown Service')
-                service_cost = float(row.get('total_cost', 0.0))
-                currency = row.get('currency', currency)
+        Without start_date, the days after the last one in the table are merged
+        together with the last summary_late_days days, whose costs may still
+        change; an empty table is filled from summary_start. A dry run before
+        the table exists estimates the aggregation that would fill it.
 
-                total_cost += service_cost
+        Args:
+            start_date: First usage day to merge as 'YYYY-MM-DD', not before summary_start (optional)
 
-                services.append({
-                    'name': service_name,
-                    'cost': service_cost
-                })
+        Returns:
+            Tuple of (start_date, end_date) of the merged days as 'YYYY-MM-DD', end_date exclusive
+        """
+        if not self.summary_table_id:
+            raise ValueError("No summary table is configured")
+        self.create_summary_table()
 
-            # Sort services by cost in descending order (already done in query but just to be safe)
-            services = sorted(services, key=lambda x: x['cost'], reverse=True)
+        today = datetime.now().date()
+        if start_date is not None and start_date < self.summary_start:
+            raise ValueError(f"Summary table refresh start {start_date} is before its first day {self.summary_start}")
+        if start_date is None and self.dry_run and not self._summary_table_exists():
+            start_date = self.summary_start
+        if start_date is None:
+            last_day = self._summary_table_last_day()
+            if last_day is None:
+                start_date = self.summary_start
+            else:
+                reopened = min(last_day + timedelta(days=1), today - timedelta(days=self.summary_late_days))
+                start_date = max(reopened.strftime('%Y-%m-%d'), self.summary_start)
+        end_date = (today + timedelta(days=1)).strftime('%Y-%m-%d')  # Include until end of today
 
-            return {
-                'total_cost': total_cost,
-                'currency': currency,
-                'services': services
-            }
+        logger.info(f"Merging usage days {start_date} to {end_date} into {self.summary_table_id}")
+        with metrics.span('summary_refresh'):
+            self._merge_summary_days(start_date, end_date)
+        return start_date, end_date
+
+    def _summary_table_last_day(self) -> Optional[Any]:
+        """
+        Get the last usage day in the summary table
+
+        Returns:
+            datetime.date, or None when the table is empty
+        """
+        rows = self._run_query(f"SELECT MAX(usage_date) as last_day FROM {self._summary_table_reference()}", [])
+        row = next(iter(rows), None)
+        return row.get('last_day') if row else None
+
+    def _merge_summary_days(self, start_date: str, end_date: str) -> None:
+        """
+        Replace the summary rows of a usage range with aggregates of the export table
+
+        Rows are updated or inserted per day, service, project and currency;
+        summary rows of the range that no longer have export rows are deleted.
+        A dry run before the table exists estimates the aggregation alone,
+        since BigQuery rejects a MERGE into a missing table.
+
+        Args:
+            start_date: First usage day as 'YYYY-MM-DD'
+            end_date: Day after the last usage day as 'YYYY-MM-DD'
+        """
+        source = self._export_source(parse_dimensions(['project']))
+        value_columns = ['gross_cost', 'credits_total'] + [f"credit_{t.lower()}" for t in CREDIT_TYPES]
+        key_columns = ['usage_date', 'service_name', 'project_id', 'currency']
+        credit_columns = ",\n                    ".join(
+            f"SUM({source['credits'][credit_type]}) as credit_{credit_type.lower()}" for credit_type in CREDIT_TYPES
+        )
+        aggregation = f"""
+                  SELECT
+                    {source['usage_date']} as usage_date,
+                    {source['service_name']} as service_name,
+                    {source['dimensions'][0]} as project_id,
+                    currency,
+                    SUM({source['gross_cost']}) as gross_cost,
+                    SUM({source['credits_total']}) as credits_total,
+                    {credit_columns}
+                  FROM
+                    {source['table']}
+                  WHERE
+                    {source['filter']}
+                  GROUP BY usage_date, service_name, project_id, currency
+            """
+        if self.dry_run and not self._summary_table_exists():
+            self._run_query(aggregation, self._scan_parameters(start_date, end_date))
+            return
+        query = f"""
+                MERGE INTO {self._summary_table_reference()} AS T
+                USING ({aggregation}) AS S
+                ON T.usage_date = S.usage_date
+                  AND T.service_name = S.service_name
+                  AND IFNULL(T.project_id, '') = IFNULL(S.project_id, '')
+                  AND T.currency = S.currency
+                WHEN MATCHED THEN
+                  UPDATE SET {', '.join(f"{column} = S.{column}" for column in value_columns)},
+                    refreshed_at = CURRENT_TIMESTAMP()
+                WHEN NOT MATCHED BY TARGET THEN
+                  INSERT ({', '.join(key_columns + value_columns)}, refreshed_at)
+                  VALUES ({', '.join(f"S.{column}" for column in key_columns + value_columns)}, CURRENT_TIMESTAMP())
+                WHEN NOT MATCHED BY SOURCE
+                  AND T.usage_date >= DATE(@scan_start) AND T.usage_date < DATE(@scan_end) THEN
+                  DELETE
+            """
+        self._run_query(query, self._scan_parameters(start_date, end_date))
+
+    def _summary_table_reference(self) -> str:
+        """
+        Quoted reference to the daily summary table, next to the export table
+        """
+        return f"`{self.bigquery_project_id}.cost_exporter.{self.summary_table_id}`"
+
+    def _table_reference(self) -> str:
+        """
+        Quoted reference to the billing export table
+        """
+        return f"`{self.bigquery_project_id}.cost_exporter.{self.bigquery_table_id}`"
+
+    def _partition_filter(self) -> str:
+        """
+        Predicates restricting the scan to partitions that can hold rows of the scanned range
+
+        Rows are exported after their usage ends, so no partition before the
+        start of the range can contain them. Requires the @scan_start and
+        @scan_end parameters from _scan_parameters.
+        """
+        if not self.partition_column:
+            return ''
+        predicate = f"AND {self.partition_column} >= TIMESTAMP_TRUNC(@scan_start, DAY)"
+        if self.partition_late_days is not None:
+            predicate += (
+                f"\n                  AND {self.partition_column} < "
+                f"TIMESTAMP_ADD(@scan_end, INTERVAL {int(self.partition_late_days)} DAY)"
+            )
+        return predicate
+
+    def _scan_parameters(self, scan_start: str, scan_end: str) -> List[Any]:
+        """
+        Query parameters bounding the scanned usage range
+
+        Args:
+            scan_start: First day of the range as 'YYYY-MM-DD'
+            scan_end: Day after the range as 'YYYY-MM-DD'
+
+        Returns:
+            List of query parameters
+        """
+        from google.cloud import bigquery
+
+        return [
+            bigquery.ScalarQueryParameter('scan_start', 'TIMESTAMP', _to_timestamp(scan_start)),
+            bigquery.ScalarQueryParameter('scan_end', 'TIMESTAMP', _to_timestamp(scan_end))
+        ]
+
+    def _run_query(self, query: str, query_parameters: List[Any]) -> Any:
+        """
+        Run a parameterized query, checking its size with a dry run first when needed
+
+        A dry run is made when a byte ceiling is configured or the client is in
+        dry run mode. In dry run mode no query is executed and no rows are returned.
+
+        Args:
+            query: SQL query
+            query_parameters: BigQuery query parameters
+
+        Returns:
+            Iterable of result rows
+        """
+        from google.cloud import bigquery
+
+        client = self.bigquery_client
+        if self.dry_run or self.max_bytes_billed:
+            dry_run_config = bigquery.QueryJobConfig(
+                query_parameters=query_parameters, dry_run=True, use_query_cache=False
+            )
+            with metrics.span('bigquery_dry_run'):
+                estimated_bytes = client.query(query, job_config=dry_run_config).total_bytes_processed or 0
+            with self._stats_lock:
+                self.query_stats['estimated_bytes'] += estimated_bytes
+            logger.info(f"Dry run estimate: {estimated_bytes:,} bytes")
+            if self.dry_run:
+                return []
+            if self.max_bytes_billed and estimated_bytes > self.max_bytes_billed:
+                raise QueryTooExpensiveError(estimated_bytes, self.max_bytes_billed)
+
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=query_parameters, maximum_bytes_billed=self.max_bytes_billed
+        )
+        with metrics.span('bigquery_submit'):
+            query_job = client.query(query, job_config=job_config)  # API request
+        with metrics.span('bigquery_wait'):
+            rows = query_job.result(page_size=self.page_size)  # Waits for query to finish; rows are paged lazily
+        with self._stats_lock:
+            self.query_stats['queries'] += 1
+            self.query_stats['bytes_processed'] += query_job.total_bytes_processed or 0
+            self.query_stats['bytes_billed'] += query_job.total_bytes_billed or 0
+            self.query_stats['slot_millis'] += getattr(query_job, 'slot_millis', None) or 0
+        metrics.add('bigquery_queries', 1)
+        metrics.add('bigquery_bytes_processed', query_job.total_bytes_processed or 0, 'Bytes')
+        metrics.add('bigquery_bytes_billed', query_job.total_bytes_billed or 0, 'Bytes')
+        metrics.add('bigquery_slot_ms', getattr(query_job, 'slot_millis', None) or 0, 'Milliseconds')
+        logger.info(f"Query processed {query_job.total_bytes_processed or 0:,} bytes")
+        return rows
+
+    def _iter_result_rows(self, rows: Any) -> Iterator[Any]:
+        """
+        Iterate over query results without materializing them
+
+        Uses the BigQuery Storage Read API through Arrow record batches when
+        enabled and installed, and otherwise pages through the REST results.
+
+        Args:
+            rows: RowIterator returned by _run_query
+
+        Returns:
+            Iterator of rows supporting get() and items()
+        """
+        if self.use_storage_api and hasattr(rows, 'to_arrow_iterable'):
+            try:
+                from google.cloud import bigquery_storage
+            except ImportError:
+                logger.warning("google-cloud-bigquery-storage is not installed. Falling back to paged results.")
+            else:
+                storage_client = bigquery_storage.BigQueryReadClient(credentials=self.credentials)
+                return _iter_arrow_rows(rows.to_arrow_iterable(bqstorage_client=storage_client))
+        return iter(rows)
+
+    def _summarize_billing_data(self, billing_data: Iterable[Any]) -> Dict[str, Any]:
+        """
+        Summarize billing data retrieved from BigQuery
+
+        Args:
+            billing_data: Rows (lists, generators or result iterators are all consumed in one pass)
+        """
+        accumulator = _CostAccumulator([dimension['column'] for dimension in self.dimensions])
+        try:
+            with metrics.span('summarize'):
+                for row in billing_data:
+                    accumulator.add(row)
+                return accumulator.summary()
         except Exception as e:
             logger.error(f"Error summarizing billing data: {str(e)}")
             return {
                 'total_cost': 0.0,
-                'currency': currency,
+                'gross_cost': 0.0,
+                'credits_total': 0.0,
+                'credits': {},
+                'currency': accumulator.currency,
                 'services': []
             }
-        
 
-def create_gcp_client_from_env() -> GCPBillingClient:
+
+class _CostAccumulator:
+    """
+    Folds billing rows into a per-service summary one row at a time
+
+    Memory grows with the number of distinct services (and drill-down
+    combinations), not with the number of rows. Costs are net of credits.
+    Services and drill-down entries are accumulated directly as the
+    compact records of the summary (see billing_model).
+    """
+    def __init__(self, dimension_columns: Optional[List[str]] = None):
+        """
+        Initialize
+
+        Args:
+            dimension_columns: Result columns of the drill-down dimensions, outermost first (optional)
+        """
+        self.dimension_columns = dimension_columns or []
+        self.total_cost = 0.0
+        self.gross_cost = 0.0
+        self.credits_total = 0.0
+        self.credits_by_type: Dict[str, float] = {}
+        self.currency = 'JPY'  # Default currency
+        self.costs_by_service: Dict[str, ServiceCost] = {}
+        # service name -> drill-down tree root (its children map dimension values to CostNodes)
+        self.children_by_service: Dict[str, CostNode] = {}
+
+    def add(self, row: Any) -> None:
+        """
+        Add one row; rows of the same service (e.g. from different days or SKUs) are merged
+        """
+        service_name = row.get('service_name') or 'Unknown Service'
+        gross_cost, credits = row_costs(row)
+        net_cost = gross_cost + credits
+        self.currency = row.get('currency') or self.currency
+
+        path = self._drilldown_path(row)
+        if path:
+            node = self.children_by_service.get(service_name)
+            if node is None:
+                node = self.children_by_service[service_name] = CostNode(service_name)
+            for value in path:
+                node = node.child(value)
+            node.cost += net_cost
+            return
+
+        self.total_cost += net_cost
+        self.gross_cost += gross_cost
+        self.credits_total += credits
+        for credit_type in CREDIT_TYPES:
+            amount = row.get(f"credit_{credit_type.lower()}")
+            if amount:
+                self.credits_by_type[credit_type] = self.credits_by_type.get(credit_type, 0.0) + float(amount)
+
+        service = self.costs_by_service.get(service_name)
+        if service is None:
+            service = self.costs_by_service[service_name] = ServiceCost(node_name(service_name))
+        service.cost += net_cost
+        service.gross_cost += gross_cost
+        service.credits += credits
+
+    def _drilldown_path(self, row: Any) -> List[Any]:
+        """
+        Dimension values of a drill-down row, outermost first (empty for service-level rows)
+        """
+        path = []
+        for column in self.dimension_columns:
+            # GROUPING() is 1 when the row is aggregated over this dimension
+            if row.get(f"grouping_{column}", 1):
+                break
+            path.append(row.get(column))
+        return path
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Build the summary with services sorted by net cost in descending order
+
+        The services are the accumulated ServiceCost records themselves.
+        """
+        services = sorted(self.costs_by_service.values(), key=lambda service: service.cost, reverse=True)
+        for service in services:
+            root = self.children_by_service.get(service.name)
+            if root is not None:
+                service.children = sort_children(root.children)
+        credits_by_type = dict(self.credits_by_type)
+        # Credit types missing from CREDIT_TYPES only count in credits_total
+        other = self.credits_total - sum(credits_by_type.values())
+        if abs(other) >= 0.005:
+            credits_by_type['OTHER'] = other
+        return {
+            'total_cost': self.total_cost,
+            'gross_cost': self.gross_cost,
+            'credits_total': self.credits_total,
+            'credits': {
+                credit_type: amount for credit_type, amount in sorted(credits_by_type.items(), key=lambda x: x[1])
+            },
+            'currency': self.currency,
+            'services': services
+        }
+
+
+def row_costs(row: Any) -> Tuple[float, float]:
+    """
+    Gross cost and credits of a row
+
+    Rows without gross_cost (e.g. from older caches) are treated as net costs without credits.
+    """
+    gross_cost = row.get('gross_cost')
+    if gross_cost is None:
+        return float(row.get('total_cost') or 0.0), 0.0
+    return float(gross_cost), float(row.get('credits_total') or 0.0)
+
+
+def _iter_arrow_rows(record_batches: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the rows of Arrow record batches, holding one batch in memory at a time
+    """
+    for batch in record_batches:
+        columns = batch.to_pydict()
+        names = list(columns)
+        for values in zip(*(columns[name] for name in names)):
+            yield dict(zip(names, values))
+
+
+def parse_dimensions(names: List[str]) -> List[Dict[str, Any]]:
+    """
+    Resolve drill-down dimension names to query columns
+
+    Args:
+        names: Dimension names: 'project', 'sku', 'location' or 'label:<key>'
+
+    Returns:
+        List of dictionaries with 'name', 'column' and 'expression', plus
+        'parameter' and 'label_key' for label dimensions
+    """
+    dimensions = []
+    for index, name in enumerate(names):
+        name = name.strip()
+        if name in DIMENSION_COLUMNS:
+            column, expression = DIMENSION_COLUMNS[name]
+            dimensions.append({'name': name, 'column': column, 'expression': expression})
+        elif name.startswith(LABEL_DIMENSION_PREFIX) and len(name) > len(LABEL_DIMENSION_PREFIX):
+            parameter = f"label_key_{index}"
+            dimensions.append({
+                'name': name,
+                'column': f"label_{index}",
+                'expression': f"(SELECT l.value FROM UNNEST(labels) AS l WHERE l.key = @{parameter} LIMIT 1)",
+                'parameter': parameter,
+                'label_key': name[len(LABEL_DIMENSION_PREFIX):]
+            })
+        else:
+            raise ValueError(
+                f"Unknown group-by dimension '{name}'. "
+                f"Use {', '.join(DIMENSION_COLUMNS)} or {LABEL_DIMENSION_PREFIX}<key>"
+            )
+    if len({dimension['column'] for dimension in dimensions}) != len(dimensions):
+        raise ValueError("Group-by dimensions must not repeat")
+    return dimensions
+
+
+def _empty_query_stats() -> Dict[str, int]:
+    """
+    Counters of BigQuery usage for one invocation
+    """
+    return {
+        'queries': 0,
+        'bytes_processed': 0,
+        'bytes_billed': 0,
+        'estimated_bytes': 0,
+        'slot_millis': 0
+    }
+
+
+def _to_timestamp(date_str: str) -> datetime:
+    """
+    Convert 'YYYY-MM-DD' to a UTC datetime for TIMESTAMP query parameters
+    """
+    return datetime.strptime(date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+
+def _month_range(year: int, month: int) -> Tuple[str, str]:
+    """
+    Get the first day of a month and the first day of the next month
+
+    Args:
+        year: Year
+        month: Month
+
+    Returns:
+        Tuple of (start_date, end_date) as 'YYYY-MM-DD'
+    """
+    start_date = datetime(year, month, 1)
+    if month == 12:
+        end_date = datetime(year + 1, 1, 1)
+    else:
+        end_date = datetime(year, month + 1, 1)
+    return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+
+def create_gcp_client_from_env(billing_account_id: Optional[str] = None, bigquery_project_id: Optional[str] = None,
+                               bigquery_table_id: Optional[str] = None, credentials=None,
+                               bigquery_client=None) -> GCPBillingClient:
     """
     Create GCP client by getting credentials from environment variables
 
+    Args:
+        billing_account_id: GCP billing account ID (optional, overrides GCP_BILLING_ACCOUNT_ID)
+        bigquery_project_id: BigQuery project ID (optional, overrides BIGQUERY_PROJECT_ID)
+        bigquery_table_id: BigQuery table ID (optional, overrides BIGQUERY_TABLE_ID)
+        credentials: GCP credentials object (optional, overrides GCP_CREDENTIALS and ADC)
+        bigquery_client: BigQuery client to use, e.g. a local stand-in (optional)
+
     Returns:
         GCPBillingClient
     """
     # Get credentials and account ID from environment variables
-    billing_account_id = os.environ.get('GCP_BILLING_ACCOUNT_ID')
-    bigquery_project_id = os.environ.get('BIGQUERY_PROJECT_ID')
-    bigquery_table_id = os.environ.get('BIGQUERY_TABLE_ID')
+    billing_account_id = billing_account_id or os.environ.get('GCP_BILLING_ACCOUNT_ID')
+    bigquery_project_id = bigquery_project_id or os.environ.get('BIGQUERY_PROJECT_ID')
+    bigquery_table_id = bigquery_table_id or os.environ.get('BIGQUERY_TABLE_ID')
 
     if not billing_account_id:
         raise ValueError("Environment variable 'GCP_BILLING_ACCOUNT_ID' is not set")
@@ -226,14 +1271,89 @@ def create_gcp_client_from_env() -> GCPBillingClient:
 
     # Get GCP credentials from environment variables
     credentials_json = os.environ.get('GCP_CREDENTIALS')
-    credentials = None
-    if credentials_json:
+    if credentials is None and credentials_json:
+        from google.oauth2 import service_account
+
         try:
             credentials_info = json.loads(credentials_json)
-            credentials = service_account.Credentials.from_service_account_info(credentials_info)
+            with metrics.span('credentials'):
+                credentials = service_account.Credentials.from_service_account_info(credentials_info)
             logger.info("Successfully loaded GCP credentials from environment variable")
         except Exception as e:
             logger.error(f"Failed to load GCP credentials: {str(e)}")
             raise ValueError("Invalid GCP_CREDENTIALS JSON in environment variable")
 
-    return GCPBillingClient(billing_account_id, bigquery_project_id, bigquery_table_id, credentials)
+    # Scan size controls
+    partition_column = os.environ.get('BIGQUERY_PARTITION_COLUMN', DEFAULT_PARTITION_COLUMN) or None
+    partition_late_days = _int_from_env('BIGQUERY_PARTITION_LATE_DAYS')
+    max_bytes_billed = _int_from_env('BIGQUERY_MAX_BYTES_BILLED')
+
+    # Usage days whose costs may still change, for the daily cache and the summary table
+    late_arrival_days = _int_from_env('LATE_ARRIVAL_DAYS')
+    late_arrival_days = 3 if late_arrival_days is None else late_arrival_days
+
+    # Incremental month-to-date queries backed by the state store
+    daily_cache = None
+    if os.environ.get('INCREMENTAL_MONTH_TO_DATE', '').lower() == 'true':
+        from daily_cache import DailyAggregateCache
+        from state_store import create_state_store_from_env
+
+        store = create_state_store_from_env()
+        if store is None:
+            raise ValueError("Environment variable 'STATE_STORE_URL' is required when INCREMENTAL_MONTH_TO_DATE is true")
+        daily_cache = DailyAggregateCache(store, late_arrival_days)
+
+    # Daily per-service/per-project summary table read instead of the export
+    summary_table_id = None
+    summary_start = None
+    if os.environ.get('SUMMARY_TABLE', '').lower() == 'true':
+        summary_table_id = f"{bigquery_table_id}{SUMMARY_TABLE_SUFFIX}"
+        summary_start = os.environ.get('SUMMARY_TABLE_START')
+        if summary_start:
+            try:
+                summary_start = datetime.strptime(summary_start, '%Y-%m-%d').strftime('%Y-%m-%d')
+            except ValueError:
+                raise ValueError("Environment variable 'SUMMARY_TABLE_START' must be a date as YYYY-MM-DD")
+        else:
+            # The first day of the previous month covers every default report
+            today = datetime.now()
+            summary_start = _month_range(*((today.year - 1, 12) if today.month == 1
+                                           else (today.year, today.month - 1)))[0]
+
+    from result_cache import create_result_cache_from_env
+
+    return GCPBillingClient(
+        billing_account_id, bigquery_project_id, bigquery_table_id, credentials,
+        bigquery_client=bigquery_client,
+        partition_column=partition_column,
+        partition_late_days=partition_late_days,
+        max_bytes_billed=max_bytes_billed,
+        daily_cache=daily_cache,
+        page_size=_int_from_env('BIGQUERY_PAGE_SIZE'),
+        use_storage_api=os.environ.get('BIGQUERY_USE_STORAGE_API', '').lower() == 'true',
+        dimensions=[name for name in os.environ.get('GROUP_BY_DIMENSIONS', '').split(',') if name.strip()],
+        summary_table_id=summary_table_id,
+        summary_start=summary_start,
+        summary_refresh=os.environ.get('SUMMARY_TABLE_REFRESH', 'true').lower() != 'false',
+        summary_late_days=late_arrival_days,
+        result_cache=create_result_cache_from_env(late_arrival_days)
+    )
+
+
+def _int_from_env(name: str) -> Optional[int]:
+    """
+    Read an optional integer environment variable
+
+    Args:
+        name: Environment variable name
+
+    Returns:
+        Integer value, or None when not set
+    """
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Environment variable '{name}' must be an integer")
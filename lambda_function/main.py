@@ -2,14 +2,23 @@
 """
 Lambda function to retrieve GCP billing information and notify Discord
 """
+import asyncio
 import json
 import logging
 import os
-from typing import Any, Dict
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from discord_client import DiscordClient, create_discord_client_from_env
+import client_cache
+import metrics
+from accounts import (DEFAULT_DELIVERY_CONCURRENCY, DEFAULT_QUERY_CONCURRENCY, fan_out,
+                      load_account_configs_from_env)
+from billing_model import json_default
+from discord_client import AsyncDiscordClient, DiscordClient
+from exchange_rate import parse_currencies
 from formatter import DiscordMessageFormatter, create_formatter
-from gcp_client import GCPBillingClient, create_gcp_client_from_env
+from gcp_client import GCPBillingClient, QueryTooExpensiveError
+from report_messages import create_report_editor_from_env
 
 # Logger configuration
 logger = logging.getLogger()
@@ -35,75 +44,613 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         Lambda response
     """
     logger.info(f"Lambda function started. Event: {json.dumps(event)}")
+    metrics.recorder.reset()
+    started = time.perf_counter()
     
     try:
-        # Initialize clients and formatter
-        gcp_client: GCPBillingClient = create_gcp_client_from_env()
-        discord_client: DiscordClient = create_discord_client_from_env()
-        message_formatter: DiscordMessageFormatter = create_formatter()
-        
-        # Determine the month to get billing information from the event
-        use_previous_month = event.get('use_previous_month', False)
-        use_current_month = event.get('use_current_month', True)
-        year = event.get('year')
-        month = event.get('month')
-        
-        if use_current_month:
-            logger.info("Fetching billing data for the current month to date.")
-            billing_data = gcp_client.get_cost_for_current_month_to_date()
-        elif use_previous_month:
-            logger.info("Fetching billing data for the previous month.")
-            billing_data = gcp_client.get_cost_for_previous_month()
-        elif year and month:
-            logger.info(f"Fetching billing data for {year}-{month}.")
-            billing_data = gcp_client.get_cost_for_month(year, month)
-        else:
+        if event.get('alert'):
+            return _handle_alert(event, context)
+
+        if event.get('backfill'):
+            return _handle_backfill(event, context)
+
+        if not _has_valid_period(event):
             logger.error("Invalid event parameters: must specify use_current_month, use_previous_month, or provide 'year' and 'month'.")
             return {
                 'statusCode': 400,
                 'body': json.dumps({'error': "Invalid event parameters"})
             }
-            
-        logger.info(f"Billing data fetched: {json.dumps(billing_data, indent=2)}")
-        
-        # Format billing information to Discord message format
-        discord_embed = message_formatter.format_billing_data(billing_data)
-        logger.debug(f"Formatted Discord embed: {json.dumps(discord_embed, indent=2)}")
-        
-        # Send message to Discord
-        if billing_data['start_date'] == f"{billing_data['year']}-{billing_data['month']:02d}-01" and billing_data['end_date'] != f"{billing_data['year']}-{billing_data['month']:02d}-01":
-            # Up to the middle of this month
-            message_content = f"{billing_data['year']}年{billing_data['month']}月のGCP Billing Information ({billing_data['start_date']}〜{billing_data['end_date']})"
-        else:
-            # Entire month
-            message_content = f"{billing_data['year']}年{billing_data['month']}月のGCP Billing Information"
-        success = discord_client.send_message(message_content, embed=discord_embed)
+
+        accounts = load_account_configs_from_env()
+        if accounts:
+            return _handle_accounts(event, context, accounts)
+
+        # Initialize clients and formatter (clients are reused while the container is warm)
+        setup_started = time.perf_counter()
+        gcp_client: GCPBillingClient
+        discord_client: DiscordClient
+        gcp_client, gcp_reused = client_cache.get_gcp_client()
+        discord_client, discord_reused = client_cache.get_discord_client()
+        message_formatter: DiscordMessageFormatter = _create_formatter_from_env()
+        setup = {
+            'warm': gcp_reused and discord_reused,
+            'setup_ms': round((time.perf_counter() - setup_started) * 1000, 3)
+        }
+        logger.info(f"Client setup ({'warm' if setup['warm'] else 'cold'}) took {setup['setup_ms']} ms")
+
+        # Dry run only estimates the bytes the queries would process
+        dry_run = bool(event.get('dry_run', False))
+        gcp_client.start_run(dry_run=dry_run)
+        discord_client.start_run(context)
         
-        if success:
-            logger.info("Successfully sent billing information to Discord.")
+        billing_data = _fetch_billing_data_for_event(gcp_client, event)
+            
+        if dry_run:
+            return _dry_run_response(gcp_client, setup)
+
+        _add_run_history(gcp_client, billing_data)
+        _log_billing_data(billing_data)
+        success = _send_billing_data(discord_client, message_formatter, billing_data, gcp_client.billing_account_id)
+        return _report_response(gcp_client, setup, success)
+            
+    except Exception as e:
+        return _error_response(e)
+    finally:
+        metrics.add('handler_ms', (time.perf_counter() - started) * 1000, 'Milliseconds')
+        metrics.emit(context)
+
+
+async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Asynchronous variant of lambda_handler for single-account reports
+
+    The BigQuery report query runs on a worker thread (the client library
+    has no asyncio API), so the event loop stays free while the job
+    executes. Meanwhile the cost analysis query, the exchange rate lookup
+    and the Discord connection warm-up run concurrently, and the report is
+    sent through aiohttp, so the invocation takes about as long as its
+    slowest query. Alert checks and multi-account runs are delegated to
+    lambda_handler, which already overlaps their work on threads.
+
+    Args:
+        event: Lambda event
+        context: Lambda context
+
+    Returns:
+        Lambda response
+    """
+    loop = asyncio.get_running_loop()
+    if event.get('alert') or event.get('backfill') or os.environ.get('BILLING_ACCOUNTS'):
+        return await loop.run_in_executor(None, lambda_handler, event, context)
+
+    logger.info(f"Lambda function started (async). Event: {json.dumps(event)}")
+    metrics.recorder.reset()
+    started = time.perf_counter()
+
+    try:
+        if not _has_valid_period(event):
+            logger.error("Invalid event parameters: must specify use_current_month, use_previous_month, or provide 'year' and 'month'.")
             return {
-                'statusCode': 200,
-                'body': json.dumps({'message': 'Billing information sent successfully'})
+                'statusCode': 400,
+                'body': json.dumps({'error': "Invalid event parameters"})
             }
+
+        setup_started = time.perf_counter()
+        gcp_client: GCPBillingClient
+        discord_client: AsyncDiscordClient
+        gcp_client, gcp_reused = client_cache.get_gcp_client()
+        discord_client, discord_reused = client_cache.get_async_discord_client()
+        message_formatter: DiscordMessageFormatter = _create_formatter_from_env()
+        setup = {
+            'warm': gcp_reused and discord_reused,
+            'setup_ms': round((time.perf_counter() - setup_started) * 1000, 3)
+        }
+        logger.info(f"Client setup ({'warm' if setup['warm'] else 'cold'}) took {setup['setup_ms']} ms")
+
+        dry_run = bool(event.get('dry_run', False))
+        gcp_client.start_run(dry_run=dry_run)
+        discord_client.start_run(context)
+
+        # The report query is submitted first; everything else overlaps with it
+        report = loop.run_in_executor(None, _fetch_billing_data_for_event, gcp_client, event, False)
+        analyze = bool(event.get('use_current_month', True))
+        analysis = loop.run_in_executor(None, _analyze_costs, gcp_client) if analyze else None
+        side_tasks = []
+        if not dry_run:
+            billing_currency = os.environ.get('BILLING_CURRENCY', 'USD')
+            side_tasks.append(loop.run_in_executor(None, message_formatter.prefetch_rates, billing_currency))
+            # A task, so the warm-up starts now instead of when the side tasks are gathered
+            side_tasks.append(asyncio.ensure_future(discord_client.warm_up()))
+
+        try:
+            billing_data = await report
+            analysis_result = await analysis if analysis is not None else None
+        finally:
+            # Side tasks only warm caches; their failures are logged, not raised
+            await asyncio.gather(*side_tasks, *([analysis] if analysis is not None else []),
+                                 return_exceptions=True)
+        if analysis_result is not None:
+            billing_data['analysis'] = analysis_result
+
+        if dry_run:
+            return _dry_run_response(gcp_client, setup)
+
+        await loop.run_in_executor(None, _add_run_history, gcp_client, billing_data)
+        _log_billing_data(billing_data)
+        message_content, discord_pages = _format_billing_data(message_formatter, billing_data)
+        report_editor = create_report_editor_from_env()
+        if report_editor is not None:
+            # Edits go through the client's requests session, which returns the message IDs
+            success = await loop.run_in_executor(
+                None, report_editor.send, discord_client, gcp_client.billing_account_id,
+                message_content, discord_pages, billing_data
+            )
         else:
-            logger.error("Failed to send billing information to Discord.")
-            return {
-                'statusCode': 500,
-                'body': json.dumps({'error': 'Failed to send billing information to Discord'})
-            }
-            
-    except ValueError as ve:
-        logger.error(f"Configuration error: {str(ve)}")
+            success = await discord_client.send_embed_pages_async(message_content, discord_pages)
+        return _report_response(gcp_client, setup, success)
+
+    except Exception as e:
+        return _error_response(e)
+    finally:
+        metrics.add('handler_ms', (time.perf_counter() - started) * 1000, 'Milliseconds')
+        metrics.emit(context)
+
+
+# Reused across warm invocations so the aiohttp session of the cached Discord client stays open
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def async_entry_point(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Lambda function entry point running async_lambda_handler
+
+    Args:
+        event: Lambda event
+        context: Lambda context
+
+    Returns:
+        Lambda response
+    """
+    global _event_loop
+    if _event_loop is None or _event_loop.is_closed():
+        _event_loop = asyncio.new_event_loop()
+    return _event_loop.run_until_complete(async_lambda_handler(event, context))
+
+
+def _dry_run_response(gcp_client: GCPBillingClient, setup: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the response of a dry run from the estimated bytes
+    """
+    logger.info(f"Dry run finished. Estimated bytes: {gcp_client.query_stats['estimated_bytes']:,}")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Dry run completed',
+            'estimated_bytes': gcp_client.query_stats['estimated_bytes'],
+            'setup': setup
+        })
+    }
+
+
+def _report_response(gcp_client: GCPBillingClient, setup: Dict[str, Any], success: bool) -> Dict[str, Any]:
+    """
+    Build the response of a report from the outcome of sending it to Discord
+    """
+    if success:
+        logger.info("Successfully sent billing information to Discord.")
         return {
-            'statusCode': 400, # Bad Request (configuration error)
-            'body': json.dumps({'error': f"Configuration error: {str(ve)}"})
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Billing information sent successfully',
+                'bytes_processed': gcp_client.query_stats['bytes_processed'],
+                'setup': setup
+            })
         }
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {str(e)}", exc_info=True)
+    else:
+        logger.error("Failed to send billing information to Discord.")
         return {
             'statusCode': 500,
-            'body': json.dumps({'error': f"An unexpected error occurred: {str(e)}"})
+            'body': json.dumps({
+                'error': 'Failed to send billing information to Discord',
+                'bytes_processed': gcp_client.query_stats['bytes_processed'],
+                'setup': setup
+            })
+        }
+
+
+def _error_response(error: Exception) -> Dict[str, Any]:
+    """
+    Build the response of a failed invocation
+    """
+    if isinstance(error, QueryTooExpensiveError):
+        logger.error(f"Query aborted: {str(error)}")
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f"Query aborted: {str(error)}", 'estimated_bytes': error.estimated_bytes})
+        }
+    if isinstance(error, ValueError):
+        logger.error(f"Configuration error: {str(error)}")
+        return {
+            'statusCode': 400, # Bad Request (configuration error)
+            'body': json.dumps({'error': f"Configuration error: {str(error)}"})
+        }
+    logger.error(f"An unexpected error occurred: {str(error)}", exc_info=error)
+    return {
+        'statusCode': 500,
+        'body': json.dumps({'error': f"An unexpected error occurred: {str(error)}"})
+    }
+
+
+def _log_billing_data(billing_data: Dict[str, Any]) -> None:
+    """
+    Log a one-line summary of billing information, and the full dump at DEBUG level
+    """
+    logger.info(
+        f"Billing data fetched: {len(billing_data['services'])} services, "
+        f"total {billing_data['total_cost']:,.2f} {billing_data['currency']}"
+    )
+    # The full dump is only serialized when it is actually logged
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Billing data: {json.dumps(billing_data, indent=2, default=json_default)}")
+
+
+def _create_formatter_from_env() -> DiscordMessageFormatter:
+    """
+    Create the message formatter, limited to the top DISCORD_TOP_SERVICES services when set
+    and showing costs in DISPLAY_CURRENCIES
+    """
+    top_services = os.environ.get('DISCORD_TOP_SERVICES')
+    drilldown_top = os.environ.get('DRILLDOWN_TOP_N', '3')
+    try:
+        top_n = int(top_services) if top_services else None
+        drilldown_top_n = int(drilldown_top)
+    except ValueError:
+        raise ValueError("Environment variables 'DISCORD_TOP_SERVICES' and 'DRILLDOWN_TOP_N' must be integers")
+    rate_provider, _ = client_cache.get_rate_provider()
+    return create_formatter(
+        top_n=top_n, drilldown_top_n=drilldown_top_n, rate_provider=rate_provider,
+        currencies=parse_currencies(os.environ.get('DISPLAY_CURRENCIES'))
+    )
+
+
+def _event_flag(options: Dict[str, Any], name: str) -> bool:
+    """
+    Read an optional boolean event option, given as a JSON boolean or as 'true'/'false'
+    """
+    value = options.get(name, False)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    raise ValueError(f"Event option '{name}' must be true or false")
+
+
+def _has_valid_period(event: Dict[str, Any]) -> bool:
+    """
+    Check that the event selects a billing period
+    """
+    return bool(
+        event.get('use_current_month', True)
+        or event.get('use_previous_month', False)
+        or (event.get('year') and event.get('month'))
+    )
+
+
+def _fetch_billing_data_for_event(gcp_client: GCPBillingClient, event: Dict[str, Any],
+                                  analyze: bool = True) -> Dict[str, Any]:
+    """
+    Fetch billing information for the period selected by the event
+
+    Args:
+        gcp_client: GCP billing client
+        event: Lambda event
+        analyze: Add the cost analysis to current month reports (see _analyze_costs)
+
+    Returns:
+        Dictionary containing billing information
+    """
+    # Determine the month to get billing information from the event
+    use_previous_month = event.get('use_previous_month', False)
+    use_current_month = event.get('use_current_month', True)
+    year = event.get('year')
+    month = event.get('month')
+    
+    if use_current_month:
+        logger.info("Fetching billing data for the current month to date.")
+        billing_data = gcp_client.get_cost_for_current_month_to_date()
+        analysis = _analyze_costs(gcp_client) if analyze else None
+        if analysis is not None:
+            billing_data['analysis'] = analysis
+        return billing_data
+    elif use_previous_month:
+        logger.info("Fetching billing data for the previous month.")
+        return gcp_client.get_cost_for_previous_month()
+    else:
+        logger.info(f"Fetching billing data for {year}-{month}.")
+        return gcp_client.get_cost_for_month(year, month)
+
+
+def _analyze_costs(gcp_client: GCPBillingClient) -> Optional[Dict[str, Any]]:
+    """
+    Compute the month-end forecast and cost anomalies when ANOMALY_DETECTION is true
+
+    Args:
+        gcp_client: GCP billing client
+
+    Returns:
+        Analysis for the 'analysis' key of billing information, or None when disabled
+    """
+    if os.environ.get('ANOMALY_DETECTION', '').lower() != 'true':
+        return None
+    # NumPy is only imported when the analysis is enabled
+    from anomaly import create_cost_analyzer_from_env
+
+    analyzer = create_cost_analyzer_from_env()
+    with metrics.span('analysis'):
+        return analyzer.analyze(gcp_client)
+
+
+def _add_run_history(gcp_client: GCPBillingClient, billing_data: Dict[str, Any]) -> None:
+    """
+    Add deltas against earlier runs to billing information and record this run, when RUN_HISTORY_URL is set
+
+    The deltas come from the history store only, so they cost no BigQuery
+    query. A failing store is logged and the report is sent without them.
+
+    Args:
+        gcp_client: GCP billing client that produced the billing information
+        billing_data: Billing information; gets a 'history' key with the comparisons
+    """
+    from run_history import compare_with_history, create_run_history_from_env, run_record
+
+    try:
+        history = create_run_history_from_env()
+        if history is None:
+            return
+        with metrics.span('run_history'):
+            account_id = gcp_client.billing_account_id
+            billing_data['history'] = compare_with_history(history, account_id, billing_data)
+            history.append(run_record(account_id, billing_data, gcp_client.query_stats['bytes_processed']))
+    except Exception as e:
+        logger.warning(f"Run history is unavailable: {str(e)}")
+
+
+def _send_billing_data(discord_client: DiscordClient, message_formatter: DiscordMessageFormatter,
+                       billing_data: Dict[str, Any], account_id: str) -> bool:
+    """
+    Format billing information and send it to Discord
+
+    With DISCORD_EDIT_IN_PLACE, the period's earlier message is edited
+    instead, or left alone when the report did not change enough.
+
+    Args:
+        discord_client: Discord client
+        message_formatter: Message formatter
+        billing_data: Billing information
+        account_id: Billing account ID of the report
+
+    Returns:
+        True if successful, False if failed
+    """
+    message_content, discord_pages = _format_billing_data(message_formatter, billing_data)
+    report_editor = create_report_editor_from_env()
+    if report_editor is not None:
+        return report_editor.send(discord_client, account_id, message_content, discord_pages, billing_data)
+    return discord_client.send_embed_pages(message_content, discord_pages)
+
+
+def _format_billing_data(message_formatter: DiscordMessageFormatter,
+                         billing_data: Dict[str, Any]) -> Tuple[str, List[List[Dict[str, Any]]]]:
+    """
+    Format billing information to the Discord message text and pages of embeds
+
+    Args:
+        message_formatter: Message formatter
+        billing_data: Billing information
+
+    Returns:
+        Tuple of (message text, pages of embeds)
+    """
+    # Format billing information to Discord message format
+    with metrics.span('format'):
+        discord_pages = message_formatter.format_billing_data_pages(billing_data)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Formatted Discord embeds: {json.dumps(discord_pages, indent=2)}")
+    
+    if billing_data['start_date'] == f"{billing_data['year']}-{billing_data['month']:02d}-01" and billing_data['end_date'] != f"{billing_data['year']}-{billing_data['month']:02d}-01":
+        # Up to the middle of this month
+        message_content = f"{billing_data['year']}年{billing_data['month']}月のGCP Billing Information ({billing_data['start_date']}〜{billing_data['end_date']})"
+    else:
+        # Entire month
+        message_content = f"{billing_data['year']}年{billing_data['month']}月のGCP Billing Information"
+    return message_content, discord_pages
+
+
+def _handle_accounts(event: Dict[str, Any], context: Any, accounts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Report every configured billing account within one invocation
+
+    Args:
+        event: Lambda event
+        context: Lambda context
+        accounts: Account configurations from BILLING_ACCOUNTS
+
+    Returns:
+        Lambda response
+    """
+    dry_run = bool(event.get('dry_run', False))
+    message_formatter: DiscordMessageFormatter = _create_formatter_from_env()
+
+    def fetch(account: Dict[str, Any]) -> Dict[str, Any]:
+        gcp_client, _ = client_cache.get_gcp_client(account)
+        gcp_client.start_run(dry_run=dry_run)
+        billing_data = _fetch_billing_data_for_event(gcp_client, event)
+        if not dry_run:
+            _add_run_history(gcp_client, billing_data)
+        return {'billing_data': billing_data, 'query_stats': gcp_client.query_stats,
+                'account_id': gcp_client.billing_account_id}
+
+    def deliver(account: Dict[str, Any], fetched: Dict[str, Any]) -> Dict[str, Any]:
+        result = {
+            'bytes_processed': fetched['query_stats']['bytes_processed'],
+            'estimated_bytes': fetched['query_stats']['estimated_bytes']
+        }
+        if dry_run:
+            return dict(result, success=True)
+        discord_client, _ = client_cache.get_discord_client(account.get('discord_webhook_url'))
+        discord_client.start_run(context)
+        success = _send_billing_data(discord_client, message_formatter, fetched['billing_data'], fetched['account_id'])
+        return dict(result, success=success)
+
+    started = time.perf_counter()
+    results = fan_out(
+        accounts, fetch, deliver,
+        query_concurrency=int(os.environ.get('ACCOUNT_QUERY_CONCURRENCY', DEFAULT_QUERY_CONCURRENCY)),
+        delivery_concurrency=int(os.environ.get('DISCORD_DELIVERY_CONCURRENCY', DEFAULT_DELIVERY_CONCURRENCY))
+    )
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    failed = [result['account'] for result in results if not result['success']]
+    logger.info(f"Processed {len(accounts)} accounts in {elapsed_ms} ms ({len(failed)} failed)")
+    body = {
+        'message': 'Dry run completed' if dry_run else 'Billing information sent',
+        'accounts': results,
+        'bytes_processed': sum(result.get('bytes_processed', 0) for result in results),
+        'elapsed_ms': elapsed_ms
+    }
+    if failed:
+        body['error'] = f"Failed accounts: {', '.join(failed)}"
+    return {
+        'statusCode': 500 if failed else 200,
+        'body': json.dumps(body)
+    }
+
+
+def _handle_alert(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Check budget thresholds and notify Discord only about newly crossed ones
+
+    Every account runs one single-row query over the newest partitions;
+    the webhook is only called when a threshold was crossed since the last
+    notification.
+
+    Args:
+        event: Lambda event with 'alert' set
+        context: Lambda context
+
+    Returns:
+        Lambda response
+    """
+    from alerts import create_alerter_from_env
+
+    dry_run = bool(event.get('dry_run', False))
+    message_formatter: DiscordMessageFormatter = _create_formatter_from_env()
+
+    def check(account: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        alerter = create_alerter_from_env(account)
+        gcp_client, _ = client_cache.get_gcp_client(account)
+        gcp_client.start_run(dry_run=dry_run)
+        alert = alerter.check(gcp_client)
+        return {'alerter': alerter, 'alert': alert, 'query_stats': gcp_client.query_stats}
+
+    def deliver(account: Optional[Dict[str, Any]], checked: Dict[str, Any]) -> Dict[str, Any]:
+        alert = checked['alert']
+        result = {
+            'crossings': len(alert['crossings']),
+            'bytes_processed': checked['query_stats']['bytes_processed'],
+            'estimated_bytes': checked['query_stats']['estimated_bytes']
         }
+        if dry_run or not alert['crossings']:
+            return dict(result, success=True)
+        discord_client, _ = client_cache.get_discord_client((account or {}).get('discord_webhook_url'))
+        discord_client.start_run(context)
+        success = discord_client.send_message(
+            f"{alert['year']}年{alert['month']}月のGCP Budget Alert", message_formatter.format_alert(alert)
+        )
+        if success:
+            checked['alerter'].mark_notified(alert)
+        return dict(result, success=success)
+
+    accounts = load_account_configs_from_env()
+    if accounts:
+        results = fan_out(
+            accounts, check, deliver,
+            query_concurrency=int(os.environ.get('ACCOUNT_QUERY_CONCURRENCY', DEFAULT_QUERY_CONCURRENCY)),
+            delivery_concurrency=int(os.environ.get('DISCORD_DELIVERY_CONCURRENCY', DEFAULT_DELIVERY_CONCURRENCY))
+        )
+    else:
+        results = [deliver(None, check(None))]
+
+    failed = [result.get('account', 'default') for result in results if not result['success']]
+    crossings = sum(result.get('crossings', 0) for result in results)
+    logger.info(f"Alert check finished: {crossings} thresholds newly crossed, {len(failed)} failed")
+    body = {
+        'message': 'Dry run completed' if dry_run else 'Alert check completed',
+        'crossings': crossings,
+        'bytes_processed': sum(result.get('bytes_processed', 0) for result in results)
+    }
+    if accounts:
+        body['accounts'] = results
+    if failed:
+        body['error'] = f"Failed to notify: {', '.join(failed)}"
+    return {
+        'statusCode': 500 if failed else 200,
+        'body': json.dumps(body)
+    }
+
+
+def _handle_backfill(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Archive the reports of a range of closed months, computed with one grouped query
+
+    Args:
+        event: Lambda event with 'backfill': {'start': 'YYYY-MM', 'end': 'YYYY-MM'} and optionally
+               'format', 'batch_months', 'force' and 'notify'
+        context: Lambda context
+
+    Returns:
+        Lambda response
+    """
+    from backfill import create_report_archive_from_env, parse_month, run_backfill
+
+    options = event['backfill']
+    if not isinstance(options, dict) or not options.get('start') or not options.get('end'):
+        raise ValueError("Backfill events need 'backfill': {'start': 'YYYY-MM', 'end': 'YYYY-MM'}")
+    batch_months = options.get('batch_months')
+    if batch_months is not None and (type(batch_months) is not int or batch_months < 1):
+        raise ValueError("Backfill option 'batch_months' must be a positive integer")
+    force = _event_flag(options, 'force')
+    notify = _event_flag(options, 'notify')
+    dry_run = bool(event.get('dry_run', False))
+
+    gcp_client, _ = client_cache.get_gcp_client()
+    gcp_client.start_run(dry_run=dry_run)
+    archive = create_report_archive_from_env(archive_format=options.get('format'))
+    result = run_backfill(
+        gcp_client, archive, parse_month(options['start']), parse_month(options['end']),
+        batch_months, force
+    )
+    logger.info(f"Backfill finished: {len(result['queried'])} months queried, {len(result['skipped'])} skipped")
+
+    body = {
+        'message': 'Dry run completed' if dry_run else 'Backfill completed',
+        'queried': result['queried'],
+        'skipped': result['skipped'],
+        'bytes_processed': gcp_client.query_stats['bytes_processed'],
+        'estimated_bytes': gcp_client.query_stats['estimated_bytes']
+    }
+    if notify and result['reports']:
+        discord_client, _ = client_cache.get_discord_client()
+        discord_client.start_run(context)
+        embed = _create_formatter_from_env().format_backfill_summary(result['reports'])
+        if not discord_client.send_message("GCP Billing Backfill", embed):
+            body['error'] = 'Failed to send the backfill summary to Discord'
+            return {'statusCode': 500, 'body': json.dumps(body)}
+    return {
+        'statusCode': 200,
+        'body': json.dumps(body)
+    }
+
 
 if __name__ == '__main__':
     # Configuration for local testing (assuming environment variables are set)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Lightweight timing spans and counters emitted as CloudWatch Embedded Metric Format
+
+Spans and counters are accumulated per invocation in a module-level
+recorder (safe across the threads of a multi-account run) and written as
+one EMF JSON line at the end, which CloudWatch turns into metrics without
+any API call.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+DEFAULT_NAMESPACE = 'GCPBillingNotifier'
+
+
+class MetricsRecorder:
+    """
+    Accumulates span durations and counters of one invocation
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # metric name -> [value, unit]
+        self._values: Dict[str, list] = {}
+
+    def reset(self) -> None:
+        """
+        Drop the values of the previous invocation
+        """
+        with self._lock:
+            self._values = {}
+
+    def add(self, name: str, value: float, unit: str = 'Count') -> None:
+        """
+        Add value to a metric, summing repeated additions
+
+        Args:
+            name: Metric name
+            value: Value to add
+            unit: CloudWatch unit, e.g. 'Count', 'Bytes', 'Milliseconds'
+        """
+        with self._lock:
+            entry = self._values.setdefault(name, [0.0, unit])
+            entry[0] += value
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block into the '<name>_ms' metric
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{name}_ms", (time.perf_counter() - started) * 1000, 'Milliseconds')
+
+    def values(self) -> Dict[str, Tuple[float, str]]:
+        """
+        Snapshot of the metrics as name -> (value, unit)
+        """
+        with self._lock:
+            return {name: (value, unit) for name, (value, unit) in self._values.items()}
+
+    def emf(self, namespace: str = DEFAULT_NAMESPACE,
+            dimensions: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Build the Embedded Metric Format document of the recorded metrics
+
+        Args:
+            namespace: CloudWatch namespace
+            dimensions: Dimension name -> value (optional)
+
+        Returns:
+            EMF document
+        """
+        dimensions = dimensions or {}
+        values = self.values()
+        document: Dict[str, Any] = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': namespace,
+                    'Dimensions': [sorted(dimensions)],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in sorted(values.items())]
+                }]
+            }
+        }
+        document.update(dimensions)
+        document.update({name: round(value, 3) for name, (value, _) in values.items()})
+        return document
+
+
+# Survives between invocations while the Lambda container stays warm; reset per invocation
+recorder = MetricsRecorder()
+
+
+def span(name: str):
+    """
+    Time the enclosed block on the module recorder
+    """
+    return recorder.span(name)
+
+
+def add(name: str, value: float, unit: str = 'Count') -> None:
+    """
+    Add value to a metric of the module recorder
+    """
+    recorder.add(name, value, unit)
+
+
+def emit(context: Any = None, dimensions: Optional[Dict[str, str]] = None) -> None:
+    """
+    Write the recorded metrics as one EMF line to stdout, unless METRICS_ENABLED is false
+
+    Args:
+        context: Lambda context, adding the FunctionName dimension (optional)
+        dimensions: Additional dimensions (optional)
+    """
+    if os.environ.get('METRICS_ENABLED', 'true').lower() == 'false':
+        return
+    dimensions = dict(dimensions or {})
+    function_name = getattr(context, 'function_name', None) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+    if function_name:
+        dimensions['FunctionName'] = function_name
+    document = recorder.emf(os.environ.get('METRICS_NAMESPACE', DEFAULT_NAMESPACE), dimensions)
+    # EMF lines must be plain JSON, so they bypass the log formatter
+    sys.stdout.write(json.dumps(document, separators=(',', ':')) + '\n')
+    sys.stdout.flush()
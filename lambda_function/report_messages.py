@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Edit-in-place Discord reports: one message per period, updated instead of reposted
+
+The first report of a month is posted with ?wait=true and the returned
+message IDs (one per page of embeds) are kept in the state store. Later
+reports of the same month PATCH those messages. Nothing is sent when the
+message text and embeds hash to the ones last sent, or when no cost moved
+by at least the configured minimum since then.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from discord_client import DiscordClient
+from state_store import StateStore, create_state_store_from_env
+
+logger = logging.getLogger(__name__)
+
+
+class ReportMessageEditor:
+    """
+    Sends billing reports by editing the period's existing Discord messages
+
+    Per account, webhook and month the state store keeps 'message_ids',
+    'hash' (of the payloads last sent, None after a partial delivery),
+    'total_cost' and 'services' (service name -> cost last sent) and
+    'updated_at'.
+    """
+    def __init__(self, store: StateStore, min_delta: float = 0.0):
+        """
+        Initialize
+
+        Args:
+            store: State store holding the message IDs and the last sent report
+            min_delta: Smallest change of the total or of a service's cost, in the billing currency,
+                       that updates the message (0 updates on any change of the payloads)
+        """
+        self.store = store
+        self.min_delta = min_delta
+
+    @staticmethod
+    def key(account_id: str, webhook_url: str, year: int, month: int) -> str:
+        """
+        State key of a period's messages; the webhook URL is hashed so its token is not stored
+        """
+        webhook = hashlib.sha256(webhook_url.encode('utf-8')).hexdigest()[:16]
+        return f"messages/{account_id}/{webhook}/{year}-{month:02d}"
+
+    @staticmethod
+    def payloads_hash(payloads: List[Dict[str, Any]]) -> str:
+        """
+        Hash of webhook payloads (message text and embeds), independent of key order
+        """
+        encoded = json.dumps(payloads, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def send(self, discord_client: DiscordClient, account_id: str, message: str,
+             pages: List[List[Dict[str, Any]]], billing_data: Dict[str, Any]) -> bool:
+        """
+        Post, edit or skip the period's report messages
+
+        Args:
+            discord_client: Discord client of the webhook
+            account_id: Billing account ID
+            message: Message text, sent with the first page
+            pages: Pages of embeds from DiscordMessageFormatter.format_billing_data_pages
+            billing_data: Billing information the pages were formatted from
+
+        Returns:
+            True if the messages are up to date (sent, edited or unchanged), False if failed
+        """
+        key = self.key(account_id, discord_client.webhook_url, billing_data['year'], billing_data['month'])
+        state = self.store.get(key)
+        payloads = discord_client.page_payloads(message, pages)
+        payloads_hash = self.payloads_hash(payloads)
+        if state is not None:
+            reason = self._skip_reason(state, payloads_hash, billing_data)
+            if reason:
+                logger.info(f"Skipped Discord update of {key}: {reason}")
+                metrics.add('discord_skipped', 1)
+                return True
+
+        message_ids, delivered = self._deliver(discord_client, list(state['message_ids']) if state else [], payloads)
+        if not delivered:
+            # Keep the IDs of pages posted before the failure so the next run edits them instead of
+            # posting duplicates; without a hash, the next run sends the report again
+            if state is not None or message_ids:
+                self.store.put(key, dict(state or {}, message_ids=message_ids, hash=None))
+            return False
+        self.store.put(key, {
+            'message_ids': message_ids,
+            'hash': payloads_hash,
+            'currency': billing_data.get('currency'),
+            'total_cost': billing_data['total_cost'],
+            'services': _service_costs(billing_data),
+            'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds')
+        })
+        return True
+
+    def _skip_reason(self, state: Dict[str, Any], payloads_hash: str, billing_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Why the last sent report is still good enough, or None if the messages need updating
+        """
+        if state.get('hash') == payloads_hash:
+            return "message unchanged"
+        if state.get('hash') is None:
+            return None  # The last delivery did not complete
+        if self.min_delta <= 0 or state.get('currency') != billing_data.get('currency'):
+            return None
+        previous = state.get('services') or {}
+        current = _service_costs(billing_data)
+        deltas = [abs(billing_data['total_cost'] - state.get('total_cost', 0.0))]
+        deltas.extend(abs(cost - previous.get(name, 0.0)) for name, cost in current.items())
+        deltas.extend(abs(cost) for name, cost in previous.items() if name not in current)
+        largest = max(deltas)
+        if largest < self.min_delta:
+            return f"largest cost change {largest:,.2f} is below {self.min_delta:,.2f}"
+        return None
+
+    @staticmethod
+    def _deliver(discord_client: DiscordClient, message_ids: List[str],
+                 payloads: List[Dict[str, Any]]) -> Tuple[List[str], bool]:
+        """
+        Edit the existing messages page by page, posting pages that have none and deleting surplus ones
+
+        Returns:
+            Tuple of (message IDs, True if every page was delivered). After a failure, the IDs are
+            those of the pages delivered so far followed by the earlier IDs of the pages not reached.
+        """
+        sent: List[str] = []
+        for index, payload in enumerate(payloads):
+            if index < len(message_ids):
+                edited = discord_client.edit_message(message_ids[index], payload)
+                if edited:
+                    sent.append(message_ids[index])
+                    continue
+                if edited is False:
+                    return sent + message_ids[index:], False
+                # The message was deleted in Discord; post it again
+            message_id = discord_client.post_message(payload)
+            if message_id is None:
+                return sent + message_ids[index + 1:], False
+            sent.append(message_id)
+        for message_id in message_ids[len(payloads):]:
+            if not discord_client.delete_message(message_id):
+                logger.warning(f"Failed to delete surplus Discord message {message_id}")
+        return sent, True
+
+
+def _service_costs(billing_data: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Net cost per service name
+    """
+    return {service['name'] or '': service['cost'] for service in billing_data['services']}
+
+
+def create_report_editor_from_env() -> Optional[ReportMessageEditor]:
+    """
+    Create the report message editor when DISCORD_EDIT_IN_PLACE is 'true'
+
+    Returns:
+        ReportMessageEditor, or None when reports are posted as new messages
+    """
+    if os.environ.get('DISCORD_EDIT_IN_PLACE', 'false').lower() != 'true':
+        return None
+    store = create_state_store_from_env()
+    if store is None:
+        raise ValueError("Environment variable 'STATE_STORE_URL' is required for DISCORD_EDIT_IN_PLACE")
+    try:
+        min_delta = float(os.environ.get('DISCORD_MIN_UPDATE_DELTA', 0))
+    except ValueError:
+        raise ValueError("Environment variable 'DISCORD_MIN_UPDATE_DELTA' must be a number")
+    return ReportMessageEditor(store, min_delta)
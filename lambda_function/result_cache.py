@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Cache of monthly report results, immutable once a month is finalized
+
+A month's result can no longer change once the month has closed and the
+export's late-arrival window after it has passed. Entries are addressed
+by a hash of the billing account, table, month, query version and query
+shape, and kept in an in-process LRU (surviving warm Lambda invocations)
+and optionally in a state store (local directory or S3).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from billing_model import from_plain, to_plain
+from state_store import StateStore, create_state_store_from_env
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 32
+
+
+class MonthResultCache:
+    """
+    Two-tier cache of get_cost_for_month results
+
+    Entries written while the month can still change are kept but not
+    served: the month is queried again and the entry revalidated, until a
+    result computed after the late window is stored as immutable.
+    """
+    def __init__(self, store: Optional[StateStore] = None, late_arrival_days: int = 3,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Initialize
+
+        Args:
+            store: Persistent tier (optional, in-process only otherwise)
+            late_arrival_days: Days after a month's end during which exported rows may still arrive
+            max_entries: Entries kept in the in-process tier
+        """
+        self.store = store
+        self.late_arrival_days = late_arrival_days
+        self.max_entries = max_entries
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(fields: Dict[str, Any]) -> str:
+        """
+        Content address of a result
+
+        Args:
+            fields: Everything the result depends on, e.g. account, table, period and query version
+
+        Returns:
+            Key of the form 'results/<sha256>'
+        """
+        digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+        return f"results/{digest}"
+
+    def is_finalized(self, year: int, month: int, today: Optional[date] = None) -> bool:
+        """
+        Check whether a month has closed and its late-arrival window has passed
+        """
+        today = today or datetime.now(timezone.utc).date()
+        next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        return today >= next_month + timedelta(days=self.late_arrival_days)
+
+    def get(self, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Get a finalized result
+
+        Args:
+            fields: Key fields (see key)
+
+        Returns:
+            Copy of the billing information with the same service records as a queried result,
+            or None when the result is missing or may still change
+        """
+        entry = self._entry(self.key(fields))
+        if entry is None or not entry.get('immutable'):
+            return None
+        return from_plain(entry['billing_data'])
+
+    def put(self, fields: Dict[str, Any], billing_data: Dict[str, Any], year: int, month: int,
+            today: Optional[date] = None) -> None:
+        """
+        Store a freshly queried result, immutable when its month is finalized
+
+        Args:
+            fields: Key fields (see key)
+            billing_data: Billing information of the month
+            year: Year of the result
+            month: Month of the result
+            today: Current date (optional, for testing)
+        """
+        cache_key = self.key(fields)
+        billing_data = to_plain(billing_data)
+        previous = self._entry(cache_key)
+        if previous is not None:
+            unchanged = previous['billing_data'] == billing_data
+            logger.info(f"Revalidated {year}-{month:02d}: {'unchanged' if unchanged else 'changed'}")
+        entry = {
+            'fields': fields,
+            'immutable': self.is_finalized(year, month, today),
+            'computed_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'billing_data': billing_data
+        }
+        self._remember(cache_key, entry)
+        if self.store is not None:
+            try:
+                self.store.put(cache_key, entry)
+            except Exception as e:
+                logger.warning(f"Failed to persist result of {year}-{month:02d}: {str(e)}")
+
+    def _entry(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look an entry up in memory, then in the persistent tier
+        """
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry is not None:
+                self._memory.move_to_end(cache_key)
+                return entry
+        if self.store is None:
+            return None
+        try:
+            entry = self.store.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Failed to read cached result {cache_key}: {str(e)}")
+            return None
+        if entry is not None:
+            self._remember(cache_key, entry)
+        return entry
+
+    def _remember(self, cache_key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[cache_key] = entry
+            self._memory.move_to_end(cache_key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+
+def create_result_cache_from_env(late_arrival_days: int = 3) -> Optional[MonthResultCache]:
+    """
+    Create the result cache unless RESULT_CACHE is 'false'
+
+    The persistent tier is the state store of STATE_STORE_URL when set.
+
+    Args:
+        late_arrival_days: Days after a month's end during which exported rows may still arrive
+
+    Returns:
+        MonthResultCache, or None when disabled
+    """
+    if os.environ.get('RESULT_CACHE', 'true').lower() == 'false':
+        return None
+    max_entries = os.environ.get('RESULT_CACHE_SIZE')
+    try:
+        max_entries = int(max_entries) if max_entries else DEFAULT_MAX_ENTRIES
+    except ValueError:
+        raise ValueError("Environment variable 'RESULT_CACHE_SIZE' must be an integer")
+    return MonthResultCache(create_state_store_from_env(), late_arrival_days, max_entries)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Append-only history of report runs, for day-over-day and month-over-month deltas
+
+Every report run is recorded with its per-service totals, timestamp and
+bytes scanned, indexed by billing account and run date. The next run
+compares its totals with earlier runs instead of querying BigQuery again.
+History is kept in SQLite ('sqlite:///path/to/history.db') or in a state
+store (local directory or S3).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import closing
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from state_store import StateStore, create_state_store
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SCHEME = 'sqlite://'
+
+
+class RunHistory(ABC):
+    """
+    Base class for run history stores
+
+    Records are dictionaries from run_record: 'account_id', 'timestamp',
+    'run_date' and 'period' ('YYYY-MM' of the report), 'start_date',
+    'end_date', 'currency', 'total_cost', 'bytes_processed' and 'services'
+    mapping service name to cost.
+    """
+    @abstractmethod
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Record a run
+
+        Args:
+            record: Record from run_record
+        """
+
+    @abstractmethod
+    def latest(self, account_id: str, period: str, before: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the most recent run of a report period
+
+        Args:
+            account_id: Billing account ID
+            period: Report month as 'YYYY-MM'
+            before: Only consider runs dated before this day, 'YYYY-MM-DD' (optional)
+
+        Returns:
+            Record, or None if there is no such run
+        """
+
+
+class SqliteRunHistory(RunHistory):
+    """
+    Run history in a local SQLite database, one row per run
+    """
+    def __init__(self, path: str):
+        """
+        Initialize
+
+        Args:
+            path: Database file, created on first use
+        """
+        self.path = path
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per call, so accounts reported on several threads do not share one
+        with self._lock:
+            if not self._initialized:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path)
+            if not self._initialized:
+                with connection:
+                    connection.execute("""
+                        CREATE TABLE IF NOT EXISTS runs (
+                          id INTEGER PRIMARY KEY,
+                          account_id TEXT NOT NULL,
+                          run_date TEXT NOT NULL,
+                          timestamp TEXT NOT NULL,
+                          period TEXT NOT NULL,
+                          start_date TEXT,
+                          end_date TEXT,
+                          currency TEXT,
+                          total_cost REAL NOT NULL,
+                          bytes_processed INTEGER,
+                          services TEXT NOT NULL
+                        )
+                    """)
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS runs_account_date ON runs (account_id, run_date)"
+                    )
+                self._initialized = True
+        return connection
+
+    def append(self, record: Dict[str, Any]) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO runs (account_id, run_date, timestamp, period, start_date, end_date, currency, "
+                "total_cost, bytes_processed, services) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (record['account_id'], record['run_date'], record['timestamp'], record['period'],
+                 record['start_date'], record['end_date'], record['currency'], record['total_cost'],
+                 record['bytes_processed'], json.dumps(record['services'], separators=(',', ':')))
+            )
+
+    def latest(self, account_id: str, period: str, before: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        query = (
+            "SELECT account_id, run_date, timestamp, period, start_date, end_date, currency, total_cost, "
+            "bytes_processed, services FROM runs WHERE account_id = ? AND period = ?"
+        )
+        parameters: List[Any] = [account_id, period]
+        if before is not None:
+            query += " AND run_date < ?"
+            parameters.append(before)
+        query += " ORDER BY run_date DESC, timestamp DESC, id DESC LIMIT 1"
+        with closing(self._connect()) as connection:
+            row = connection.execute(query, parameters).fetchone()
+        if row is None:
+            return None
+        columns = ('account_id', 'run_date', 'timestamp', 'period', 'start_date', 'end_date', 'currency',
+                   'total_cost', 'bytes_processed', 'services')
+        record = dict(zip(columns, row))
+        record['services'] = json.loads(record['services'])
+        return record
+
+
+class StoreRunHistory(RunHistory):
+    """
+    Run history in a state store (local directory or S3)
+
+    Runs are appended to one document per account and run date,
+    'history/<account>/<YYYY-MM-DD>', and 'history/<account>/index' lists
+    the periods recorded on each date, so a lookup reads two documents.
+    """
+    def __init__(self, store: StateStore):
+        """
+        Initialize
+
+        Args:
+            store: State store holding the documents
+        """
+        self.store = store
+
+    def append(self, record: Dict[str, Any]) -> None:
+        account_id = record['account_id']
+        day_key = f"history/{account_id}/{record['run_date']}"
+        day = self.store.get(day_key) or {'runs': []}
+        day['runs'].append(record)
+        self.store.put(day_key, day)
+
+        index_key = f"history/{account_id}/index"
+        index = self.store.get(index_key) or {'dates': {}}
+        periods = index['dates'].setdefault(record['run_date'], [])
+        if record['period'] not in periods:
+            periods.append(record['period'])
+            self.store.put(index_key, index)
+
+    def latest(self, account_id: str, period: str, before: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        index = self.store.get(f"history/{account_id}/index") or {'dates': {}}
+        run_dates = sorted(
+            (run_date for run_date, periods in index['dates'].items()
+             if period in periods and (before is None or run_date < before)),
+            reverse=True
+        )
+        for run_date in run_dates:
+            day = self.store.get(f"history/{account_id}/{run_date}") or {'runs': []}
+            runs = [run for run in day['runs'] if run['period'] == period]
+            if runs:
+                return max(runs, key=lambda run: run['timestamp'])
+        return None
+
+
+def run_record(account_id: str, billing_data: Dict[str, Any], bytes_processed: int,
+               now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Build the history record of a report run
+
+    Args:
+        account_id: Billing account ID
+        billing_data: Billing information of the report
+        bytes_processed: BigQuery bytes processed by the run
+        now: Time of the run (optional, current UTC time otherwise)
+
+    Returns:
+        Record for RunHistory.append
+    """
+    now = now or datetime.now(timezone.utc)
+    return {
+        'account_id': account_id,
+        'timestamp': now.isoformat(timespec='seconds'),
+        'run_date': now.date().isoformat(),
+        'period': f"{billing_data['year']}-{billing_data['month']:02d}",
+        'start_date': billing_data.get('start_date'),
+        'end_date': billing_data.get('end_date'),
+        'currency': billing_data.get('currency'),
+        'total_cost': round(billing_data['total_cost'], 6),
+        'bytes_processed': bytes_processed,
+        'services': {service['name'] or '': round(service['cost'], 6) for service in billing_data['services']}
+    }
+
+
+def compare_with_history(history: RunHistory, account_id: str, billing_data: Dict[str, Any],
+                         today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Compute the deltas of a report against earlier runs
+
+    'previous_run' compares with the latest run of the same period on an
+    earlier day, with per-service deltas. 'previous_month' compares a
+    month-to-date report with the previous month's run on the same day of
+    the month or earlier, and a closed month with the previous month's
+    last run after it closed.
+
+    Args:
+        history: Run history
+        account_id: Billing account ID
+        billing_data: Billing information of the report
+        today: Run date (optional, current UTC date otherwise)
+
+    Returns:
+        Dictionary with 'previous_run' and 'previous_month' when found, each holding
+        'run_date', 'total_cost' (of the earlier run) and 'delta'; 'previous_run' also has
+        'days_ago' and 'services' (delta per service), 'previous_month' has 'month_to_date'
+    """
+    today = today or datetime.now(timezone.utc).date()
+    year, month = billing_data['year'], billing_data['month']
+    currency = billing_data.get('currency')
+    comparisons: Dict[str, Any] = {}
+
+    previous_run = history.latest(account_id, f"{year}-{month:02d}", before=today.isoformat())
+    if previous_run is not None and previous_run['currency'] == currency:
+        services = {
+            name: cost - previous_run['services'].get(name, 0.0)
+            for name, cost in ((service['name'] or '', service['cost']) for service in billing_data['services'])
+        }
+        for name, cost in previous_run['services'].items():
+            services.setdefault(name, -cost)
+        comparisons['previous_run'] = {
+            'run_date': previous_run['run_date'],
+            'days_ago': (today - date.fromisoformat(previous_run['run_date'])).days,
+            'total_cost': previous_run['total_cost'],
+            'delta': billing_data['total_cost'] - previous_run['total_cost'],
+            'services': services
+        }
+
+    previous_year, previous_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    previous_start = date(previous_year, previous_month, 1)
+    month_start = date(year, month, 1)
+    month_to_date = (today.year, today.month) == (year, month)
+    if month_to_date:
+        # Same day of the previous month, clamped to its length
+        same_day = previous_start + timedelta(days=min(today.day, (month_start - previous_start).days) - 1)
+        baseline = history.latest(account_id, f"{previous_year}-{previous_month:02d}",
+                                  before=(same_day + timedelta(days=1)).isoformat())
+    else:
+        baseline = history.latest(account_id, f"{previous_year}-{previous_month:02d}")
+        if baseline is not None and baseline['run_date'] < month_start.isoformat():
+            baseline = None  # Only runs made after the previous month closed cover all of it
+    if baseline is not None and baseline['currency'] == currency:
+        comparisons['previous_month'] = {
+            'run_date': baseline['run_date'],
+            'month_to_date': month_to_date,
+            'total_cost': baseline['total_cost'],
+            'delta': billing_data['total_cost'] - baseline['total_cost']
+        }
+    return comparisons
+
+
+def create_run_history(url: str) -> RunHistory:
+    """
+    Create a run history store
+
+    Args:
+        url: 'sqlite:///path/to/history.db', or a state store URL ('s3://bucket/prefix' or a directory)
+
+    Returns:
+        RunHistory
+    """
+    if url.startswith(SQLITE_SCHEME):
+        return SqliteRunHistory(url[len(SQLITE_SCHEME):])
+    return StoreRunHistory(create_state_store(url))
+
+
+def create_run_history_from_env() -> Optional[RunHistory]:
+    """
+    Create the run history store from the RUN_HISTORY_URL environment variable
+
+    Returns:
+        RunHistory, or None if RUN_HISTORY_URL is not set
+    """
+    url = os.environ.get('RUN_HISTORY_URL')
+    if not url:
+        return None
+    return create_run_history(url)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Pluggable key-value store for state persisted between Lambda invocations
+
+Values are JSON documents addressed by '/'-separated keys. A local directory
+is used for development, and any S3-compatible object store in production.
+"""
+import json
+import logging
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore(ABC):
+    """
+    Base class for state stores
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored document
+
+        Args:
+            key: Document key
+
+        Returns:
+            Stored document, or None if it does not exist
+        """
+
+    @abstractmethod
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a document, replacing any previous value
+
+        Args:
+            key: Document key
+            value: JSON-serializable document
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Delete a document if it exists
+
+        Args:
+            key: Document key
+        """
+
+
+class LocalFileStateStore(StateStore):
+    """
+    State store keeping one JSON file per key under a local directory
+    """
+    def __init__(self, root_dir: str):
+        """
+        Initialize
+
+        Args:
+            root_dir: Directory holding the documents
+        """
+        self.root_dir = root_dir
+
+    def _path(self, key: str) -> str:
+        parts = [part for part in key.split('/') if part not in ('', '.', '..')]
+        return os.path.join(self.root_dir, *parts) + '.json'
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial document
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3StateStore(StateStore):
+    """
+    State store keeping one JSON object per key in an S3-compatible bucket
+    """
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: Optional[str] = None):
+        """
+        Initialize
+
+        Args:
+            bucket: Bucket name
+            prefix: Key prefix for every document
+            endpoint_url: Endpoint of an S3-compatible service (optional, AWS S3 otherwise)
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.endpoint_url = endpoint_url
+        self._client = None
+
+    @property
+    def client(self):
+        """
+        boto3 S3 client, created on first use
+        """
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client('s3', endpoint_url=self.endpoint_url)
+        return self._client
+
+    def _object_key(self, key: str) -> str:
+        key = key.strip('/') + '.json'
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response['Body'].read())
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        body = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.client.put_object(
+            Bucket=self.bucket, Key=self._object_key(key), Body=body, ContentType='application/json'
+        )
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+
+def create_state_store(url: str) -> StateStore:
+    """
+    Create a state store from a URL
+
+    Args:
+        url: 's3://bucket/prefix', 'file:///path/to/dir' or a plain directory path
+
+    Returns:
+        StateStore
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        if not parsed.netloc:
+            raise ValueError(f"Invalid S3 state store URL: {url}")
+        return S3StateStore(parsed.netloc, parsed.path, os.environ.get('STATE_STORE_S3_ENDPOINT_URL') or None)
+    if parsed.scheme == 'file':
+        return LocalFileStateStore(parsed.path)
+    if parsed.scheme == '':
+        return LocalFileStateStore(url)
+    raise ValueError(f"Unsupported state store URL scheme: {parsed.scheme}")
+
+
+def create_state_store_from_env() -> Optional[StateStore]:
+    """
+    Create a state store from the STATE_STORE_URL environment variable
+
+    Returns:
+        StateStore, or None if STATE_STORE_URL is not set
+    """
+    url = os.environ.get('STATE_STORE_URL')
+    if not url:
+        return None
+    return create_state_store(url)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Set up and refresh the daily summary table that reports read when SUMMARY_TABLE is true
+
+The summary table, <BIGQUERY_TABLE_ID>_daily_summary next to the export,
+holds costs per usage day, service, project and currency, so report
+queries read kilobytes instead of scanning the export. The notifier
+merges new and late-arriving days into it before each report; 'setup'
+creates it and fills it from SUMMARY_TABLE_START (or --start), e.g. to
+cover the anomaly detection lookback before the first report.
+
+Usage:
+    python lambda_function/summary_table.py setup [--start 2024-01-01] [--dry-run]
+    python lambda_function/summary_table.py refresh [--dry-run]
+"""
+import argparse
+import logging
+import os
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=('setup', 'refresh'),
+                        help='setup: create and fill from the start day; refresh: merge new and late days')
+    parser.add_argument('--start', help='First usage day to merge on setup, YYYY-MM-DD (default: SUMMARY_TABLE_START)')
+    parser.add_argument('--dry-run', action='store_true', help='Only estimate the bytes the statements would process')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from gcp_client import create_gcp_client_from_env
+
+    gcp_client = create_gcp_client_from_env()
+    if not gcp_client.summary_table_id:
+        raise SystemExit("Set SUMMARY_TABLE=true (and SUMMARY_TABLE_START) to use the summary table")
+    gcp_client.start_run(dry_run=args.dry_run)
+    if args.command == 'setup':
+        start_date, end_date = gcp_client.refresh_summary_table(args.start or gcp_client.summary_start)
+    else:
+        start_date, end_date = gcp_client.refresh_summary_table()
+    print(f"Merged usage days {start_date} to {end_date} into {gcp_client.summary_table_id}. "
+          f"Bytes processed: {gcp_client.query_stats['bytes_processed']:,}, "
+          f"estimated: {gcp_client.query_stats['estimated_bytes']:,}")
+
+
+if __name__ == '__main__':
+    main()
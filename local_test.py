@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
 """
 Script for testing Lambda function in local environment
+
+With --offline, BigQuery is replaced by a DuckDB stand-in over a generated
+billing export and Discord by a local fake webhook, so no credentials are
+needed (requires duckdb):
+
+    python local_test.py --offline [--rows 1000] [--event '{"use_previous_month": true}']
 """
+import argparse
 import json
 import os
 import sys
@@ -40,8 +47,39 @@ def create_test_event(use_previous_month=True, year=None, month=None):
     
     return event
 
+def run_offline(event, rows):
+    """Run the Lambda function against local BigQuery and Discord stand-ins and print what was posted"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+    import fakes
+    import local_bigquery
+    from google.auth.credentials import AnonymousCredentials
+    import client_cache
+
+    os.environ.update({
+        'GCP_BILLING_ACCOUNT_ID': 'LOCAL-ACCOUNT',
+        'BIGQUERY_PROJECT_ID': 'local-project',
+        'BIGQUERY_TABLE_ID': 'gcp_billing_export_v1_LOCAL',
+    })
+    local_client = local_bigquery.LocalBigQueryClient()
+    # 70 days cover the current and previous month
+    local_client.create_export_table('gcp_billing_export_v1_LOCAL', rows, days=70)
+    client_cache.configure_gcp_clients(credentials=AnonymousCredentials(), bigquery_client=local_client)
+
+    with fakes.FakeWebhookServer() as webhook:
+        os.environ['DISCORD_WEBHOOK_URL'] = webhook.url
+        result = lambda_handler(event, None)
+    for request in webhook.requests:
+        print(f"Discord {request['method']}: {json.dumps(request['body'], ensure_ascii=False, indent=2)}")
+    return result
+
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Run the Lambda function locally")
+    parser.add_argument('--offline', action='store_true', help='Use local BigQuery and Discord stand-ins')
+    parser.add_argument('--rows', type=int, default=100, help='Service/SKU pairs of the offline billing export')
+    parser.add_argument('--event', help='Lambda event as JSON (overrides the test case below)')
+    args = parser.parse_args()
+
     # Set environment variables
     setup_env_vars()
     
@@ -58,11 +96,16 @@ def main():
     event = test_event1  # Current month's progress
     # event = test_event2  # Previous month
     # event = test_event3  # Specific month
+    if args.event:
+        event = json.loads(args.event)
     
     print(f"Test event: {json.dumps(event, indent=2)}")
     
     # Execute Lambda function
-    result = lambda_handler(event, None)
+    if args.offline:
+        result = run_offline(event, args.rows)
+    else:
+        result = lambda_handler(event, None)
     
     # Display results
     print(f"Status code: {result['statusCode']}")
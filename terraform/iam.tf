@@ -45,6 +45,43 @@ resource "aws_iam_role_policy_attachment" "lambda_logs" {
   policy_arn = aws_iam_policy.lambda_basic_execution.arn
 }
 
+# State store access (only when an S3 state store is configured)
+locals {
+  state_store_bucket = substr(var.state_store_url, 0, 5) == "s3://" ? split("/", replace(var.state_store_url, "s3://", ""))[0] : ""
+}
+
+resource "aws_iam_policy" "state_store" {
+  count       = local.state_store_bucket != "" ? 1 : 0
+  name        = "${var.lambda_role_name}-state-store"
+  description = "Read and write persistent state in the S3 state store"
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject",
+          "s3:DeleteObject"
+        ]
+        Effect   = "Allow"
+        Resource = "arn:aws:s3:::${local.state_store_bucket}/*"
+      },
+      {
+        Action   = ["s3:ListBucket"]
+        Effect   = "Allow"
+        Resource = "arn:aws:s3:::${local.state_store_bucket}"
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "state_store" {
+  count      = local.state_store_bucket != "" ? 1 : 0
+  role       = aws_iam_role.lambda_role.name
+  policy_arn = aws_iam_policy.state_store[0].arn
+}
+
 # Policy for EventBridge to invoke Lambda
 resource "aws_lambda_permission" "allow_eventbridge" {
   statement_id  = "AllowExecutionFromEventBridge"
@@ -53,3 +90,12 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.daily_schedule.arn
 }
+
+resource "aws_lambda_permission" "allow_eventbridge_alerts" {
+  count         = var.alert_thresholds != "" ? 1 : 0
+  statement_id  = "AllowExecutionFromEventBridgeAlerts"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.gcp_price_to_discord.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.alert_schedule[0].arn
+}
@@ -10,7 +10,7 @@ resource "aws_lambda_function" "gcp_price_to_discord" {
   function_name = var.lambda_function_name
   filename      = data.archive_file.lambda_zip.output_path
   role          = aws_iam_role.lambda_role.arn
-  handler       = "main.lambda_handler"
+  handler       = var.async_handler ? "main.async_entry_point" : "main.lambda_handler"
   runtime       = var.lambda_runtime
   timeout       = var.lambda_timeout
   memory_size   = var.lambda_memory_size
@@ -23,6 +23,28 @@ resource "aws_lambda_function" "gcp_price_to_discord" {
       BIGQUERY_PROJECT_ID    = var.bigquery_project_id
       BIGQUERY_TABLE_ID      = var.bigquery_table_id
       LOG_LEVEL              = var.log_level
+      BILLING_ACCOUNTS       = var.billing_accounts
+
+      BIGQUERY_PARTITION_COLUMN    = var.bigquery_partition_column
+      BIGQUERY_PARTITION_LATE_DAYS = var.bigquery_partition_late_days
+      BIGQUERY_MAX_BYTES_BILLED    = var.bigquery_max_bytes_billed
+
+      STATE_STORE_URL           = var.state_store_url
+      INCREMENTAL_MONTH_TO_DATE = var.incremental_month_to_date
+      LATE_ARRIVAL_DAYS         = var.late_arrival_days
+      RUN_HISTORY_URL           = var.run_history ? var.state_store_url : ""
+
+      SUMMARY_TABLE       = var.summary_table
+      SUMMARY_TABLE_START = var.summary_table_start
+
+      DISCORD_EDIT_IN_PLACE    = var.discord_edit_in_place
+      DISCORD_MIN_UPDATE_DELTA = var.discord_min_update_delta
+
+      ANOMALY_DETECTION = var.anomaly_detection
+      ALERT_THRESHOLDS  = var.alert_thresholds
+
+      DISPLAY_CURRENCIES = var.display_currencies
+      EXCHANGE_RATE_URL  = var.exchange_rate_url
     }
   }
 
@@ -59,3 +81,24 @@ resource "aws_cloudwatch_event_target" "lambda_target" {
     use_current_month = true
   })
 }
+
+# EventBridge rule (threshold alert checks, only when thresholds are configured)
+resource "aws_cloudwatch_event_rule" "alert_schedule" {
+  count               = var.alert_thresholds != "" ? 1 : 0
+  name                = "${var.eventbridge_rule_name}-alerts"
+  description         = "GCP budget threshold alert check schedule"
+  schedule_expression = var.alert_schedule_expression
+
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "alert_target" {
+  count     = var.alert_thresholds != "" ? 1 : 0
+  rule      = aws_cloudwatch_event_rule.alert_schedule[0].name
+  target_id = "InvokeLambdaAlert"
+  arn       = aws_lambda_function.gcp_price_to_discord.arn
+
+  input = jsonencode({
+    alert = true
+  })
+}
@@ -75,6 +75,30 @@ variable "schedule_expression" {
   default     = "cron(10 1 * * ? *)" # Daily at 10:10 AM (JST) = UTC 1:10
 }
 
+variable "display_currencies" {
+  description = "Currencies costs are shown in, primary first (comma-separated)"
+  type        = string
+  default     = "JPY"
+}
+
+variable "exchange_rate_url" {
+  description = "Exchange rate API URL with a {base} placeholder (empty uses the fixed JPY rate)"
+  type        = string
+  default     = ""
+}
+
+variable "alert_schedule_expression" {
+  description = "Budget threshold alert check schedule (used when alert_thresholds is set)"
+  type        = string
+  default     = "rate(1 hour)"
+}
+
+variable "alert_thresholds" {
+  description = "JSON budget thresholds in the billing currency, e.g. {\"total\": [100, 500], \"services\": {\"BigQuery\": 50}} (requires state_store_url)"
+  type        = string
+  default     = ""
+}
+
 # Logging configuration
 variable "log_level" {
   description = "Log level (DEBUG, INFO, WARNING, ERROR)"
@@ -82,6 +106,93 @@ variable "log_level" {
   default     = "INFO"
 }
 
+# BigQuery scan configuration
+variable "bigquery_partition_column" {
+  description = "Partition column used to prune billing export scans (empty disables pruning)"
+  type        = string
+  default     = "_PARTITIONTIME"
+}
+
+variable "bigquery_partition_late_days" {
+  description = "Days after a period whose partitions are still scanned for late rows (empty scans all later partitions)"
+  type        = string
+  default     = ""
+}
+
+variable "bigquery_max_bytes_billed" {
+  description = "Abort queries whose dry run estimate exceeds this many bytes (empty disables the check)"
+  type        = string
+  default     = ""
+}
+
+variable "billing_accounts" {
+  description = "JSON list of billing accounts reported in one invocation (empty uses the single account variables)"
+  type        = string
+  sensitive   = true
+  default     = ""
+}
+
+# Persistent state configuration
+variable "state_store_url" {
+  description = "State store URL (s3://bucket/prefix), empty disables persistent state"
+  type        = string
+  default     = ""
+}
+
+variable "incremental_month_to_date" {
+  description = "Cache daily aggregates in the state store and query only days not yet finalized"
+  type        = string
+  default     = "false"
+}
+
+variable "run_history" {
+  description = "Record every report run in the state store and show deltas against earlier runs (requires state_store_url)"
+  type        = bool
+  default     = false
+}
+
+variable "summary_table" {
+  description = "Read reports from a daily per-service/per-project summary table merged from the export"
+  type        = string
+  default     = "false"
+}
+
+variable "summary_table_start" {
+  description = "First usage day held by the summary table (YYYY-MM-DD), empty for the first day of the previous month"
+  type        = string
+  default     = ""
+}
+
+variable "discord_edit_in_place" {
+  description = "Post one Discord message per month and edit it on later reports (requires state_store_url)"
+  type        = string
+  default     = "false"
+}
+
+variable "discord_min_update_delta" {
+  description = "Smallest change of the total or a service's cost, in the billing currency, that edits the message"
+  type        = string
+  default     = "0"
+}
+
+variable "async_handler" {
+  description = "Use the asyncio handler, overlapping the BigQuery job with rate lookup and Discord warm-up"
+  type        = bool
+  default     = false
+}
+
+variable "anomaly_detection" {
+  description = "Add a month-end forecast and per-service cost anomalies to current month reports"
+  type        = string
+  default     = "false"
+}
+
+variable "late_arrival_days" {
+  description = "Days after which a usage day's aggregates are treated as final"
+  type        = string
+  default     = "3"
+}
+
 # Tag configuration
 variable "tags" {
   description = "Tags to apply to resources"